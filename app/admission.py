@@ -0,0 +1,220 @@
+"""Admission control: bounded concurrency, ingest-first priority and
+per-device rate limits.
+
+Without it, every request is handed to the threadpool straight away; when
+the backend falls behind they pile up there, time out on the client and
+come back as retries. ``AdmissionMiddleware`` sits in front of the routes
+instead and lets at most ``admission_max_concurrent`` ingest and read
+requests run at once:
+
+* requests over the limit wait in a short FIFO queue per class, at most
+  ``admission_max_queued`` deep and ``admission_queue_timeout_seconds``
+  long; past either they get 429 with Retry-After,
+* reads (GET /api/...) may hold at most ``admission_read_max_concurrent``
+  slots and only get a free slot when no ingest request is waiting for it,
+  so dashboards back off first under load.
+
+The live feed, /metrics and the status endpoints are not limited.
+
+``DeviceRateLimiter`` keeps a token bucket per device
+(``device_rate_limit_per_second``, ``device_rate_limit_burst``) so one
+chatty sensor cannot take the whole ingest budget; the ingest endpoints
+check it once the payload is parsed.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+
+from . import metrics
+from .config import settings
+
+INGEST = "ingest"
+READ = "read"
+CLASSES = (INGEST, READ)
+REASONS = ("queue_full", "timeout", "device_rate")
+
+INGEST_ROUTES = {("POST", "/api/readings"), ("POST", "/api/readings/batch")}
+UNLIMITED_PATHS = {"/api/stream", "/api/ingest/status", "/api/admission"}
+
+rejections = metrics.registry.counter(
+    "iot_admission_rejected_total",
+    "Requests turned away with 429, by request class and reason.",
+    ("class", "reason"),
+)
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    if (method, path) in INGEST_ROUTES:
+        return INGEST
+    if method == "GET" and path.startswith("/api/") and path not in UNLIMITED_PATHS:
+        return READ
+    return None
+
+
+class AdmissionController:
+    """Concurrency slots shared by ingest and reads, with ingest first.
+
+    Only used from the event loop, so it needs no locking.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = settings.admission_max_concurrent,
+        read_max_concurrent: int = settings.admission_read_max_concurrent,
+        max_queued: int = settings.admission_max_queued,
+        queue_timeout: float = settings.admission_queue_timeout_seconds,
+    ):
+        self.max_concurrent = max_concurrent
+        self.read_max_concurrent = read_max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight: Dict[str, int] = {cls: 0 for cls in CLASSES}
+        self._waiters: Dict[str, Deque[asyncio.Future]] = {cls: deque() for cls in CLASSES}
+
+    def waiting(self, cls: str) -> int:
+        return len(self._waiters[cls])
+
+    def _has_slot(self, cls: str) -> bool:
+        if sum(self.in_flight.values()) >= self.max_concurrent:
+            return False
+        if cls == READ:
+            return (
+                self.in_flight[READ] < self.read_max_concurrent
+                and not self._waiters[INGEST]
+            )
+        return True
+
+    async def acquire(self, cls: str) -> Optional[str]:
+        """Take a slot; returns the rejection reason if none was granted."""
+        waiters = self._waiters[cls]
+        if not waiters and self._has_slot(cls):
+            self.in_flight[cls] += 1
+            return None
+        if len(waiters) >= self.max_queued:
+            return self._reject(cls, "queue_full")
+
+        granted = asyncio.get_running_loop().create_future()
+        waiters.append(granted)
+        try:
+            await asyncio.wait((granted,), timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(cls, granted)
+            raise
+        if granted.done():
+            return None
+        self._abandon(cls, granted)
+        return self._reject(cls, "timeout")
+
+    def release(self, cls: str) -> None:
+        self.in_flight[cls] -= 1
+        self._wake()
+
+    def _abandon(self, cls: str, granted: asyncio.Future) -> None:
+        if granted.done():
+            # Handed a slot just as the caller gave up on it
+            self.release(cls)
+            return
+        granted.cancel()
+        self._waiters[cls].remove(granted)
+        # A queued ingest request may have been all that held reads back
+        self._wake()
+
+    def _wake(self) -> None:
+        for cls in CLASSES:
+            waiters = self._waiters[cls]
+            while waiters and self._has_slot(cls):
+                granted = waiters.popleft()
+                self.in_flight[cls] += 1
+                granted.set_result(None)
+
+    def _reject(self, cls: str, reason: str) -> str:
+        rejections.inc(cls, reason)
+        return reason
+
+
+class DeviceRateLimiter:
+    """Token bucket per device, refilled at ``device_rate_limit_per_second``.
+
+    A request is let through while the device has at least one token per
+    reading (or a full bucket, for batches larger than the burst) and is
+    charged one token per reading, so a large batch leaves the device in
+    debt until the bucket refills.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def check(self, counts: Mapping[str, int]) -> float:
+        """Charge each device its readings; returns 0.0 if allowed, else the
+        seconds until the request would be."""
+        rate = settings.device_rate_limit_per_second
+        if not rate:
+            return 0.0
+        burst = settings.device_rate_limit_burst
+        now = time.monotonic()
+        with self._lock:
+            refilled = {}
+            wait = 0.0
+            for device_id, count in counts.items():
+                tokens, last = self._buckets.get(device_id, (burst, now))
+                tokens = min(burst, tokens + (now - last) * rate)
+                needed = min(count, burst)
+                if tokens < needed:
+                    wait = max(wait, (needed - tokens) / rate)
+                refilled[device_id] = tokens - count
+            if wait:
+                rejections.inc(INGEST, "device_rate")
+                return wait
+            for device_id, tokens in refilled.items():
+                self._buckets[device_id] = (tokens, now)
+
+            # Buckets idle long enough to be full again carry no state
+            if now >= self._next_sweep:
+                self._next_sweep = now + burst / rate
+                for device_id, (tokens, last) in list(self._buckets.items()):
+                    if now - last >= (burst - tokens) / rate:
+                        del self._buckets[device_id]
+        return 0.0
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying ``controller`` to ingest and read routes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        cls = None
+        if scope["type"] == "http" and settings.admission_enabled:
+            cls = classify(scope["method"], scope["path"])
+        if cls is None:
+            await self.app(scope, receive, send)
+            return
+
+        reason = await controller.acquire(cls)
+        if reason is not None:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": f"Server busy ({reason}), retry later."},
+                headers={"Retry-After": str(settings.admission_retry_after_seconds)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            controller.release(cls)
+
+
+controller = AdmissionController()
+device_limiter = DeviceRateLimiter()
@@ -0,0 +1,209 @@
+"""Open/closed alert episodes per (device_id, alert_type).
+
+While an alert is open, readings that trigger it again only bump its
+``repeat_count`` and ``last_seen_at``; it closes once a reading is back past
+the rule's hysteresis band. If the same alert triggers again within
+``alert_suppression_seconds`` of closing, the closed alert is reopened
+instead of creating a new row, so a value flapping around a threshold still
+produces one episode.
+
+The table is small (one entry per device and alert type that is open or
+recently closed) and lives in memory; ``load`` rebuilds it from the
+``alerts`` table at startup. It is only mutated by ``alerts.evaluate_batch``
+under the ingest write lock, so it needs no locking of its own.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+Key = Tuple[str, str]
+
+
+class Episode:
+    __slots__ = ("alert_id", "closed_at", "row", "repeats", "last_seen_at")
+
+    def __init__(self, alert_id: Optional[int] = None, closed_at: Optional[datetime] = None):
+        # alert_id is None while the opening row is still pending insert
+        self.alert_id = alert_id
+        self.closed_at = closed_at
+        self.row: Optional[dict] = None
+        # Repeats and last sighting not yet written to the database
+        self.repeats = 0
+        self.last_seen_at: Optional[datetime] = None
+
+    @property
+    def open(self) -> bool:
+        return self.closed_at is None
+
+
+class Transition:
+    """What one batch did to the episodes; see ``AlertStateTable.apply``."""
+
+    def __init__(self):
+        # (reading index, row) for alerts that start a new episode
+        self.opened: List[Tuple[int, dict, Episode]] = []
+        # existing alerts whose counters or closed_at changed
+        self.touched: Dict[int, Episode] = {}
+        # alert types per reading that reopened a recently closed alert
+        self.reopened: List[Tuple[int, str]] = []
+        self.closed: List[Tuple[Key, int]] = []
+
+    def updates(self) -> List[dict]:
+        """Parameters for ``update_statement``, one set per touched alert."""
+        return [
+            {
+                "alert_id": alert_id,
+                "repeats": episode.repeats,
+                "last_seen": episode.last_seen_at,
+                "closed": episode.closed_at,
+            }
+            for alert_id, episode in self.touched.items()
+        ]
+
+
+def update_statement():
+    a = models.Alert.__table__
+    return (
+        update(a)
+        .where(a.c.id == bindparam("alert_id"))
+        .values(
+            repeat_count=a.c.repeat_count + bindparam("repeats"),
+            last_seen_at=func.coalesce(bindparam("last_seen"), a.c.last_seen_at),
+            closed_at=bindparam("closed"),
+        )
+    )
+
+
+class AlertStateTable:
+    def __init__(self):
+        self._episodes: Dict[Key, Episode] = {}
+        # Open episodes per device, for the device registry
+        self._open: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._episodes)
+
+    def get(self, device_id: str, alert_type: str) -> Optional[Episode]:
+        return self._episodes.get((device_id, alert_type))
+
+    def open_count(self, device_id: str) -> int:
+        return self._open.get(device_id, 0)
+
+    def clear(self) -> None:
+        self._episodes.clear()
+        self._open.clear()
+
+    def _count(self, device_id: str, delta: int) -> None:
+        self._open[device_id] = self._open.get(device_id, 0) + delta
+
+    def load(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Rebuild from open and recently closed alerts; returns entries loaded."""
+        now = now or datetime.utcnow()
+        horizon = now - timedelta(seconds=settings.alert_suppression_seconds)
+        a = models.Alert
+        rows = db.execute(
+            select(a.id, a.device_id, a.alert_type, a.closed_at)
+            .where(or_(a.closed_at.is_(None), a.closed_at >= horizon))
+            .order_by(a.id)
+        ).all()
+        self._episodes = {
+            (row.device_id, row.alert_type): Episode(row.id, row.closed_at)
+            for row in rows
+        }
+        self._open = {}
+        for (device_id, _), episode in self._episodes.items():
+            if episode.open:
+                self._count(device_id, 1)
+        return len(self._episodes)
+
+    def apply(
+        self,
+        readings: Iterable[models.Reading],
+        assessments: Iterable[Tuple[List[Tuple[str, str]], Set[str]]],
+        now: datetime,
+    ) -> Transition:
+        """Advance the episodes for a batch of assessed readings.
+
+        New episodes come back as pending rows; once they are inserted the
+        caller must hand the ids back with ``opened``.
+        """
+        window = timedelta(seconds=settings.alert_suppression_seconds)
+        change = Transition()
+
+        for idx, (reading, (triggered, cleared)) in enumerate(zip(readings, assessments)):
+            device_id = reading.device_id
+            for alert_type, msg in triggered:
+                key = (device_id, alert_type)
+                episode = self._episodes.get(key)
+                if episode is not None and not episode.open and now - episode.closed_at > window:
+                    episode = None
+
+                if episode is None:
+                    episode = Episode()
+                    episode.row = {
+                        "device_id": device_id,
+                        "location": reading.location,
+                        "alert_type": alert_type,
+                        "message": msg,
+                        "emailed": False,
+                        "repeat_count": 1,
+                        "last_seen_at": now,
+                        "closed_at": None,
+                    }
+                    self._episodes[key] = episode
+                    self._count(device_id, 1)
+                    change.opened.append((idx, episode.row, episode))
+                    continue
+
+                if not episode.open:
+                    change.reopened.append((idx, alert_type))
+                    self._count(device_id, 1)
+                    episode.closed_at = None
+                    if episode.row is not None:
+                        episode.row["closed_at"] = None
+                self._repeat(change, episode, now)
+
+            for alert_type in cleared:
+                key = (device_id, alert_type)
+                episode = self._episodes.get(key)
+                if episode is None or not episode.open:
+                    continue
+                episode.closed_at = now
+                self._count(device_id, -1)
+                if episode.row is not None:
+                    episode.row["closed_at"] = now
+                else:
+                    change.touched[episode.alert_id] = episode
+                change.closed.append((key, idx))
+
+        return change
+
+    @staticmethod
+    def _repeat(change: Transition, episode: Episode, now: datetime) -> None:
+        if episode.row is not None:
+            episode.row["repeat_count"] += 1
+            episode.row["last_seen_at"] = now
+            return
+        episode.repeats += 1
+        episode.last_seen_at = now
+        change.touched[episode.alert_id] = episode
+
+    def opened(self, change: Transition, alerts: List[models.Alert]) -> None:
+        """Record the ids of the rows inserted for ``change.opened``."""
+        for (_, _, episode), alert in zip(change.opened, alerts):
+            episode.alert_id = alert.id
+            episode.row = None
+
+    def written(self, change: Transition) -> None:
+        """Reset the pending counters once the updates have been executed."""
+        for episode in change.touched.values():
+            episode.repeats = 0
+            episode.last_seen_at = None
+
+
+table = AlertStateTable()
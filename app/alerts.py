@@ -1,108 +1,128 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Sequence
 
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
-from . import models
+from . import alert_state, anomaly, models, rules
 from .config import settings
+from .reading_log import reading_log
 
 import logging
-import smtplib
-from email.message import EmailMessage
 
 logger = logging.getLogger("iot_alerts")
 
 
-def _is_night(now: datetime) -> bool:
-    start = settings.night_start_hour
-    end = settings.night_end_hour
-    hour = now.hour
-
-    if start < end:
-        return start <= hour < end
-    # night crosses midnight (e.g. 22–06)
-    return hour >= start or hour < end
-
-
-def _send_alert_email(alert: models.Alert) -> None:
-    if not (settings.smtp_host and settings.email_from and settings.email_to):
-        raise RuntimeError("Email settings are incomplete.")
-
-    msg = EmailMessage()
-    msg["Subject"] = f"IoT Alert: {alert.alert_type}"
-    msg["From"] = settings.email_from
-    msg["To"] = settings.email_to
-    msg.set_content(f"{alert.message}\n\nTime: {alert.created_at}")
-
-    with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as server:
-        server.starttls()
-        if settings.smtp_username and settings.smtp_password:
-            server.login(settings.smtp_username, settings.smtp_password)
-        server.send_message(msg)
-
-
-def _create_alert(
-    db: Session,
-    reading: models.Reading,
-    alert_type: str,
-    message: str,
-) -> models.Alert:
-    alert = models.Alert(
-        device_id=reading.device_id,
-        location=reading.location,
-        alert_type=alert_type,
-        message=message,
-    )
-    db.add(alert)
-    db.commit()
-    db.refresh(alert)
-
-    logger.warning(f"ALERT [{alert.alert_type}] {alert.message}")
-
-    if settings.enable_email:
-        try:
-            _send_alert_email(alert)
-            alert.emailed = True
-            db.commit()
-        except Exception as exc:
-            logger.error(f"Failed to send alert email: {exc}")
-
-    return alert
-
-
 def evaluate_reading(db: Session, reading: models.Reading) -> List[models.Alert]:
-    alerts: List[models.Alert] = []
+    """Evaluate the rules for one flushed reading (see ``evaluate_batch``)."""
+    return evaluate_batch(db, [reading])[0]
 
-    # Temperature rule
-    if reading.temperature > settings.temp_high_threshold:
-        msg = (
-            f"High temperature {reading.temperature:.1f}°C at "
-            f"{reading.location} ({reading.device_id})"
-        )
-        alerts.append(_create_alert(db, reading, "HIGH_TEMP", msg))
-
-    # Humidity rule
-    if (
-        reading.humidity < settings.humidity_low_threshold
-        or reading.humidity > settings.humidity_high_threshold
-    ):
-        msg = (
-            f"Abnormal humidity {reading.humidity:.1f}% at "
-            f"{reading.location} ({reading.device_id})"
-        )
-        alerts.append(_create_alert(db, reading, "HUMIDITY", msg))
 
-    # Motion-at-night rule
+def evaluate_batch(
+    db: Session,
+    readings: Sequence[models.Reading],
+    updated: Optional[List[models.Alert]] = None,
+) -> List[List[models.Alert]]:
+    """Evaluate the rules for a whole batch of readings.
+
+    With ``alert_dedup_enabled`` each (device, alert_type) is an episode
+    (see ``alert_state``): only readings that open a new episode insert an
+    alert row, and only those are returned, logged as WARNING and emailed.
+    Repeats and clears become one UPDATE per touched alert.
+
+    New alerts are inserted with a single INSERT ... RETURNING statement and
+    nothing is committed; the caller owns the transaction. Returns one list
+    of alerts per reading, in the same order as ``readings``. If ``updated``
+    is given, existing alerts the batch changed (repeats, clears, reopens)
+    are appended to it as they are after the UPDATE.
+    """
+    plan = rules.get_plan()
     now = datetime.utcnow()
-    if reading.motion and _is_night(now):
-        msg = f"Motion detected at night at {reading.location} ({reading.device_id})"
-        alerts.append(_create_alert(db, reading, "MOTION_NIGHT", msg))
+    subjects = readings
+    if plan.uses_derived:
+        subjects = [anomaly.tracker.view(reading) for reading in readings]
+    assessments = [plan.assess(subject, now) for subject in subjects]
+    for reading, (triggered, _) in zip(readings, assessments):
+        if not triggered:
+            reading_log.record(reading)
+
+    if settings.alert_dedup_enabled:
+        return _apply_episodes(db, readings, assessments, now, updated)
+
+    owners: List[int] = []
+    rows: List[dict] = []
+    for idx, (reading, (triggered, _)) in enumerate(zip(readings, assessments)):
+        for alert_type, msg in triggered:
+            owners.append(idx)
+            rows.append(
+                {
+                    "device_id": reading.device_id,
+                    "location": reading.location,
+                    "alert_type": alert_type,
+                    "message": msg,
+                    "emailed": False,
+                    "last_seen_at": now,
+                }
+            )
+    return _insert_alerts(db, len(readings), owners, rows)
+
+
+def _insert_alerts(
+    db: Session, count: int, owners: List[int], rows: List[dict]
+) -> List[List[models.Alert]]:
+    results: List[List[models.Alert]] = [[] for _ in range(count)]
+    if not rows:
+        return results
+
+    created = db.scalars(insert(models.Alert).returning(models.Alert), rows).all()
+    # Rowids are assigned in VALUES order, so sorting by id restores the
+    # order of ``rows``.
+    created = sorted(created, key=lambda a: a.id)
+
+    for idx, alert in zip(owners, created):
+        logger.warning("ALERT [%s] %s", alert.alert_type, alert.message)
+        results[idx].append(alert)
+
+    return results
+
+
+def _apply_episodes(
+    db: Session,
+    readings: Sequence[models.Reading],
+    assessments: list,
+    now: datetime,
+    updated: Optional[List[models.Alert]] = None,
+) -> List[List[models.Alert]]:
+    change = alert_state.table.apply(readings, assessments, now)
+
+    results = _insert_alerts(
+        db,
+        len(readings),
+        [idx for idx, _, _ in change.opened],
+        [row for _, row, _ in change.opened],
+    )
+    alert_state.table.opened(
+        change, [alert for group in results for alert in group]
+    )
 
-    if not alerts:
+    params = change.updates()
+    if params:
+        db.execute(alert_state.update_statement(), params)
+        if updated is not None:
+            updated.extend(db.scalars(
+                select(models.Alert)
+                .where(models.Alert.id.in_(list(change.touched)))
+                .order_by(models.Alert.id)
+                .execution_options(populate_existing=True)
+            ))
+    alert_state.table.written(change)
+
+    for idx, alert_type in change.reopened:
         logger.info(
-            f"Reading OK from {reading.device_id} at {reading.location}: "
-            f"T={reading.temperature:.1f}°C, H={reading.humidity:.1f}%, "
-            f"MOTION={reading.motion}"
+            "ALERT [%s] re-triggered on %s within the suppression window; reopened",
+            alert_type, readings[idx].device_id,
         )
+    for (device_id, alert_type), _ in change.closed:
+        logger.info("ALERT [%s] cleared on %s", alert_type, device_id)
 
-    return alerts
+    return results
@@ -0,0 +1,295 @@
+"""Streaming anomaly metrics over rolling per-device windows.
+
+For each device and each of temperature/humidity the tracker keeps a
+fixed-size ring buffer of the last ``anomaly_window`` values together with
+their mean and variance, maintained incrementally (Welford's update, plus
+the matching downdate for the value that falls out of the window). Each
+reading therefore costs O(1) time and memory regardless of the window
+length, and yields derived metrics the rule engine can use like any other:
+
+* ``<metric>_rate``   change per minute since the device's previous reading;
+  ``None`` when both carry the same timestamp. ``created_at`` has one-second
+  resolution, so readings that arrive together (a batch, a group commit)
+  have no usable spacing between them
+* ``<metric>_zscore`` distance from the rolling mean, in rolling std devs,
+  measured against the window *before* the new value is added
+* ``<metric>_stuck``  how many consecutive readings had exactly this value
+
+Metrics without enough history are ``None`` and never trigger or clear an
+alert. Windows are checkpointed to the ``anomaly_state`` table every
+``anomaly_checkpoint_seconds`` (in the ingest transaction) and on shutdown,
+and loaded back on startup. Ingest brackets each batch with ``begin`` and
+``commit``/``rollback`` so a failed transaction leaves no trace in the
+windows either. Undo is a journal of the scalars each reading overwrote,
+one entry per track touched, so it stays O(1) per reading as well.
+"""
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+from .rollups import epoch_seconds
+
+TRACKED = ("temperature", "humidity")
+DERIVED_METRICS = tuple(
+    f"{metric}_{kind}" for metric in TRACKED for kind in ("rate", "zscore", "stuck")
+)
+
+
+class RollingWindow:
+    """Ring buffer of the last ``size`` values with windowed Welford stats."""
+
+    __slots__ = ("size", "values", "pos", "n", "mean", "m2")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values = [0.0] * size
+        self.pos = 0
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def push(self, x: float) -> None:
+        if self.n == self.size:
+            old = self.values[self.pos]
+            self.n -= 1
+            if self.n:
+                delta = old - self.mean
+                self.mean -= delta / self.n
+                self.m2 -= delta * (old - self.mean)
+            else:
+                self.mean = self.m2 = 0.0
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return max(0.0, self.m2 / (self.n - 1)) if self.n > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return self.variance ** 0.5
+
+    def ordered(self) -> List[float]:
+        """Values in the window, oldest first."""
+        if self.n < self.size:
+            return self.values[: self.n]
+        return self.values[self.pos:] + self.values[: self.pos]
+
+    @classmethod
+    def from_values(cls, size: int, values: Iterable[float]) -> "RollingWindow":
+        window = cls(size)
+        for value in list(values)[-size:]:
+            window.push(value)
+        return window
+
+
+class MetricTrack:
+    __slots__ = ("window", "last", "last_ts", "run")
+
+    def __init__(self, size: int):
+        self.window = RollingWindow(size)
+        self.last: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.run = 0
+
+    def observe(self, value: float, ts: float, min_samples: int) -> tuple:
+        """(rate per minute, z-score, run length) for a new value."""
+        window = self.window
+        zscore = None
+        if window.n >= min_samples:
+            std = window.std
+            if std > 0:
+                zscore = (value - window.mean) / std
+
+        rate = None
+        if self.last is not None and ts > self.last_ts:
+            elapsed = max(ts - self.last_ts, settings.anomaly_rate_min_seconds)
+            rate = (value - self.last) / elapsed * 60.0
+
+        self.run = self.run + 1 if value == self.last else 1
+        self.last, self.last_ts = value, ts
+        window.push(value)
+        return rate, zscore, self.run
+
+    def to_dict(self) -> dict:
+        return {
+            "values": self.window.ordered(),
+            "last": self.last,
+            "last_ts": self.last_ts,
+            "run": self.run,
+        }
+
+    def snapshot(self) -> tuple:
+        """What the next ``observe`` will overwrite, for ``restore``."""
+        window = self.window
+        return (
+            window.pos, window.values[window.pos], window.n, window.mean, window.m2,
+            self.last, self.last_ts, self.run,
+        )
+
+    def restore(self, state: tuple) -> None:
+        window = self.window
+        pos, slot, window.n, window.mean, window.m2, self.last, self.last_ts, self.run = state
+        window.pos = pos
+        window.values[pos] = slot
+
+    @classmethod
+    def from_dict(cls, size: int, data: dict) -> "MetricTrack":
+        track = cls(size)
+        track.window = RollingWindow.from_values(size, data.get("values", ()))
+        track.last = data.get("last")
+        track.last_ts = data.get("last_ts")
+        track.run = data.get("run", 0)
+        return track
+
+
+class MetricView:
+    """A reading with its derived metrics, as seen by the rule engine."""
+
+    __slots__ = ("reading", "derived")
+
+    def __init__(self, reading: models.Reading, derived: Dict[str, Optional[float]]):
+        self.reading = reading
+        self.derived = derived
+
+    def __getattr__(self, name):
+        derived = self.derived
+        if name in derived:
+            return derived[name]
+        return getattr(self.reading, name)
+
+
+class AnomalyTracker:
+    """Per-device rolling windows. Mutated only under the ingest write lock."""
+
+    def __init__(self, window: Optional[int] = None):
+        self.window = window or settings.anomaly_window
+        self._devices: Dict[str, Dict[str, MetricTrack]] = {}
+        self._dirty = set()
+        self._last_checkpoint = time.monotonic()
+        # Undo log of the open batch, None outside one: (device, track,
+        # snapshot) per observe, devices the batch created, and the dirty
+        # devices a checkpoint in the batch wrote
+        self._journal: Optional[list] = None
+        self._created: List[str] = []
+        self._checkpointed: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    def clear(self) -> None:
+        self._devices.clear()
+        self._dirty.clear()
+        self._journal = None
+
+    def begin(self) -> None:
+        """Start a batch: journal enough to undo it with ``rollback``."""
+        self._journal = []
+        self._created = []
+        self._checkpointed = set()
+
+    def commit(self) -> None:
+        self._journal = None
+
+    def rollback(self) -> None:
+        """Put the devices touched since ``begin`` back as they were."""
+        journal = self._journal
+        if journal is None:
+            return
+        self._journal = None
+        for device_id, track, state in reversed(journal):
+            track.restore(state)
+            self._dirty.add(device_id)
+        # A checkpoint in the rolled-back transaction did not persist either
+        self._dirty |= self._checkpointed
+        for device_id in self._created:
+            self._devices.pop(device_id, None)
+            self._dirty.discard(device_id)
+
+    def observe(self, reading: models.Reading) -> Dict[str, Optional[float]]:
+        device_id = reading.device_id
+        tracks = self._devices.get(device_id)
+        journal = self._journal
+        if tracks is None:
+            tracks = {metric: MetricTrack(self.window) for metric in TRACKED}
+            self._devices[device_id] = tracks
+            if journal is not None:
+                self._created.append(device_id)
+        self._dirty.add(device_id)
+
+        ts = epoch_seconds(reading.created_at)
+        min_samples = settings.anomaly_min_samples
+        derived: Dict[str, Optional[float]] = {}
+        for metric in TRACKED:
+            track = tracks[metric]
+            if journal is not None:
+                journal.append((device_id, track, track.snapshot()))
+            rate, zscore, run = track.observe(
+                getattr(reading, metric), ts, min_samples
+            )
+            derived[f"{metric}_rate"] = rate
+            derived[f"{metric}_zscore"] = zscore
+            derived[f"{metric}_stuck"] = run
+        return derived
+
+    def view(self, reading: models.Reading) -> MetricView:
+        return MetricView(reading, self.observe(reading))
+
+    def checkpoint_due(self) -> bool:
+        return (
+            bool(self._dirty)
+            and time.monotonic() - self._last_checkpoint >= settings.anomaly_checkpoint_seconds
+        )
+
+    def checkpoint(self, db: Session) -> int:
+        """Upsert the devices changed since the last checkpoint (no commit)."""
+        self._last_checkpoint = time.monotonic()
+        if not self._dirty:
+            return 0
+        rows = [
+            {
+                "device_id": device_id,
+                "state": json.dumps(
+                    {metric: track.to_dict() for metric, track in self._devices[device_id].items()}
+                ),
+            }
+            for device_id in self._dirty
+        ]
+        stmt = sqlite_insert(models.AnomalyState)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["device_id"],
+            set_={"state": stmt.excluded.state, "updated_at": func.now()},
+        )
+        db.execute(stmt, rows)
+        if self._journal is not None:
+            self._checkpointed |= self._dirty
+        self._dirty.clear()
+        return len(rows)
+
+    def load(self, db: Session) -> int:
+        """Restore every checkpointed device; returns how many were loaded."""
+        self._devices = {}
+        self._dirty.clear()
+        for device_id, state in db.execute(
+            select(models.AnomalyState.device_id, models.AnomalyState.state)
+        ):
+            data = json.loads(state)
+            self._devices[device_id] = {
+                metric: MetricTrack.from_dict(self.window, data.get(metric, {}))
+                for metric in TRACKED
+            }
+        self._last_checkpoint = time.monotonic()
+        return len(self._devices)
+
+
+tracker = AnomalyTracker()
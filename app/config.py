@@ -1,21 +1,143 @@
 from pydantic import EmailStr
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Literal, Optional
 
 
 class Settings(BaseSettings):
     app_name: str = "IoT Alert System (Local Simulation)"
     database_url: str = "sqlite:///./iot_alerts.db"
 
+    # SQLite storage profile, applied to every new connection
+    sqlite_tuned: bool = True
+    sqlite_journal_mode: Literal["DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL"] = "WAL"
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    sqlite_cache_size_kib: int = 65536
+    sqlite_mmap_size: int = 268_435_456
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_temp_store: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+
+    # Connection pool
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 30.0
+
     # Thresholds
     temp_high_threshold: float = 28.0
     humidity_low_threshold: float = 30.0
     humidity_high_threshold: float = 70.0
+    # Hysteresis bands: how far back inside a threshold a value must get
+    # before an open alert closes
+    temp_hysteresis: float = 1.0
+    humidity_hysteresis: float = 2.0
+
+    # Alert episodes: while an alert is open, repeats bump its repeat_count
+    # instead of creating rows. An alert that re-triggers within the
+    # suppression window after closing is reopened rather than duplicated.
+    alert_dedup_enabled: bool = True
+    alert_suppression_seconds: float = 300.0
 
     # Night-time for motion alerts (22:00–06:00 by default)
     night_start_hour: int = 22
     night_end_hour: int = 6
 
+    # Extra alert rules (JSON list, see app/rules.py) and whether the
+    # built-in threshold rules above are kept alongside them
+    rules_file: Optional[str] = None
+    rules_include_defaults: bool = True
+
+    # Streaming anomaly detection (app/anomaly.py). Rolling windows are
+    # kept per device; rules can use the derived metrics (e.g.
+    # temperature_zscore) whether or not the built-in anomaly rules are on.
+    anomaly_rules_enabled: bool = False
+    anomaly_window: int = 60
+    anomaly_min_samples: int = 10
+    anomaly_zscore_threshold: float = 4.0
+    # Max change per minute before a RAPID_* alert
+    anomaly_temp_rate_per_minute: float = 2.0
+    anomaly_humidity_rate_per_minute: float = 10.0
+    # Identical consecutive values before a STUCK_SENSOR alert
+    anomaly_stuck_count: int = 30
+    # Readings closer together than this count as this far apart for rates
+    anomaly_rate_min_seconds: float = 1.0
+    anomaly_checkpoint_seconds: float = 30.0
+
+    # Ingest
+    batch_max_readings: int = 1000
+    # "buffered" queues readings for a writer thread that stores them in
+    # group commits (app/write_buffer.py). With "enqueue" durability the
+    # endpoints answer 202 as soon as the readings are queued; with
+    # "commit" they answer once the group holding them has committed.
+    ingest_mode: Literal["sync", "buffered"] = "sync"
+    ingest_durability: Literal["enqueue", "commit"] = "enqueue"
+    # Readings the buffer holds before requests get 503
+    ingest_buffer_rows: int = 10000
+    # A group is written after this long or once it reaches max rows
+    ingest_flush_interval_ms: float = 50.0
+    ingest_flush_max_rows: int = 500
+    ingest_commit_timeout_seconds: float = 30.0
+
+    # Admission control (app/admission.py). Ingest and read requests beyond
+    # max_concurrent wait in a short queue per class and get 429 with
+    # Retry-After once it is full or the wait times out. Reads get at most
+    # read_max_concurrent slots and only when no ingest request is waiting.
+    admission_enabled: bool = True
+    admission_max_concurrent: int = 32
+    admission_read_max_concurrent: int = 16
+    admission_max_queued: int = 64
+    admission_queue_timeout_seconds: float = 2.0
+    admission_retry_after_seconds: int = 1
+    # Per-device token bucket on ingest (readings per second, bucket size);
+    # None turns it off
+    device_rate_limit_per_second: Optional[float] = None
+    device_rate_limit_burst: float = 20.0
+
+    # Device registry: a device not heard from for this long is stale
+    device_stale_seconds: float = 300.0
+
+    # Live feed (/api/stream, app/events.py)
+    stream_max_clients: int = 100
+    # Events buffered per client before it is dropped as too slow
+    stream_client_buffer: int = 1000
+    # Most rows replayed on resume before sending a reset instead
+    stream_replay_max: int = 5000
+    stream_keepalive_seconds: float = 15.0
+    stream_retry_ms: int = 3000
+
+    # Time series (/api/readings/series)
+    series_default_hours: float = 24.0
+    series_max_raw_rows: int = 200_000
+
+    # Minute/hour rollups, maintained during ingest. After turning this back
+    # on, run `python -m app.rollups rebuild` to backfill the gap.
+    rollups_enabled: bool = True
+
+    # Retention (app/retention.py). TTLs in days; None keeps data forever.
+    retention_enabled: bool = False
+    retention_interval_minutes: float = 60.0
+    retention_raw_days: Optional[int] = 7
+    retention_alert_days: Optional[int] = 90
+    retention_minute_rollup_days: Optional[int] = 90
+    retention_hour_rollup_days: Optional[int] = None
+    retention_archive_dir: str = "archive"
+    retention_chunk_rows: int = 5000
+    retention_chunk_pause_seconds: float = 0.05
+
+    # "Reading OK" log lines for readings without alerts (app/reading_log.py):
+    # "all", "sample" (every Nth per device), "summary" (one line per device
+    # per interval) or "off". Alerts are always logged.
+    reading_log_mode: Literal["all", "sample", "summary", "off"] = "summary"
+    reading_log_sample_every: int = 100
+    reading_log_summary_seconds: float = 60.0
+
+    # Cache for the list endpoints (app/response_cache.py). Dropped on every
+    # commit; the TTL bounds staleness after writes from other processes.
+    response_cache_enabled: bool = True
+    response_cache_max_bytes: int = 32 * 1024 * 1024
+    response_cache_ttl_seconds: float = 30.0
+
+    # Prometheus-text metrics on GET /metrics (app/metrics.py)
+    metrics_enabled: bool = True
+
     # Email settings (optional)
     enable_email: bool = False
     smtp_host: str = "smtp.example.com"
@@ -24,6 +146,17 @@ class Settings(BaseSettings):
     smtp_password: Optional[str] = None
     email_from: Optional[EmailStr] = None
     email_to: Optional[EmailStr] = None
+    smtp_starttls: bool = True
+    smtp_timeout_seconds: float = 10.0
+    # Pooled SMTP connections idle for longer than this are reopened
+    smtp_idle_timeout_seconds: float = 60.0
+
+    # Background email dispatch
+    email_workers: int = 2
+    email_queue_size: int = 1000
+    email_max_retries: int = 5
+    email_retry_backoff_seconds: float = 1.0
+    email_retry_backoff_max_seconds: float = 60.0
 
     class Config:
         env_file = ".env"
@@ -1,14 +1,62 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from .config import settings
 
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False}, 
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _is_sqlite_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+        cursor.execute(f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{int(settings.sqlite_cache_size_kib)}")
+        cursor.execute(f"PRAGMA mmap_size = {int(settings.sqlite_mmap_size)}")
+        cursor.execute(f"PRAGMA temp_store = {settings.sqlite_temp_store}")
+    finally:
+        cursor.close()
+
+
+def create_db_engine(
+    database_url: str = settings.database_url,
+    tuned: bool = settings.sqlite_tuned,
+) -> Engine:
+    """Build the engine, applying the SQLite storage profile from settings.
+
+    With ``tuned=False`` the engine uses SQLite's and SQLAlchemy's defaults
+    (rollback journal, FULL sync, default pool), which is what the
+    concurrency benchmark compares against.
+    """
+    if not database_url.startswith("sqlite"):
+        return create_engine(database_url)
+
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if tuned and not _is_sqlite_memory(database_url):
+        kwargs.update(
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+        )
+
+    db_engine = create_engine(database_url, **kwargs)
+    if tuned:
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+
+engine = create_db_engine()
+
+# Objects are serialized after commit; keeping them loaded avoids a SELECT per
+# row when building responses.
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
 
 Base = declarative_base()
 
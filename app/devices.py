@@ -0,0 +1,129 @@
+"""The device registry: one row per device with its latest state.
+
+``apply_readings`` upserts the devices touched by an ingest batch in the
+same transaction (one row per device, however many readings it sent), so
+fleet status is a read of ``devices`` rather than a scan of ``readings``.
+A device is stale once nothing has been heard from it for
+``device_stale_seconds``.
+
+``open_alert_count`` comes from the in-memory alert episodes. Without
+``alert_dedup_enabled`` there are no episodes and alerts never close, so it
+is kept incrementally like ``reading_count``: the alerts raised for the
+device since it was registered (retention does not lower either count).
+"""
+from datetime import datetime, timedelta
+from collections import Counter
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+from . import alert_state, models
+from .config import settings
+
+
+def apply_readings(
+    db: Session,
+    readings: Iterable[models.Reading],
+    new_alerts: Iterable[models.Alert] = (),
+) -> None:
+    """Upsert the latest state of every device in a flushed batch.
+
+    ``new_alerts`` are the alert rows the batch inserted.
+    """
+    latest: Dict[str, dict] = {}
+    for reading in readings:
+        row = latest.get(reading.device_id)
+        if row is None:
+            row = latest[reading.device_id] = {
+                "device_id": reading.device_id,
+                "first_seen_at": reading.created_at,
+                "reading_count": 0,
+            }
+        row.update(
+            location=reading.location,
+            last_seen_at=reading.created_at,
+            last_reading_id=reading.id,
+            temperature=reading.temperature,
+            humidity=reading.humidity,
+            motion=reading.motion,
+        )
+        row["reading_count"] += 1
+
+    if not latest:
+        return
+
+    episodes = settings.alert_dedup_enabled
+    if episodes:
+        counts = {
+            device_id: alert_state.table.open_count(device_id) for device_id in latest
+        }
+    else:
+        counts = Counter(alert_obj.device_id for alert_obj in new_alerts)
+    for device_id, row in latest.items():
+        row["open_alert_count"] = counts.get(device_id, 0)
+
+    table = models.Device.__table__
+    stmt = sqlite_insert(table)
+    excluded = stmt.excluded
+    open_alert_count = excluded.open_alert_count
+    if not episodes:
+        open_alert_count = table.c.open_alert_count + open_alert_count
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["device_id"],
+        set_={
+            "location": excluded.location,
+            "last_seen_at": excluded.last_seen_at,
+            "last_reading_id": excluded.last_reading_id,
+            "temperature": excluded.temperature,
+            "humidity": excluded.humidity,
+            "motion": excluded.motion,
+            "reading_count": table.c.reading_count + excluded.reading_count,
+            "open_alert_count": open_alert_count,
+        },
+    )
+    db.execute(stmt, list(latest.values()))
+
+
+def stale_cutoff(now: Optional[datetime] = None) -> datetime:
+    now = now or datetime.utcnow()
+    return now - timedelta(seconds=settings.device_stale_seconds)
+
+
+def devices_query(
+    db: Session,
+    location: Optional[str] = None,
+    stale: Optional[bool] = None,
+    now: Optional[datetime] = None,
+) -> Query:
+    d = models.Device
+    query = db.query(d)
+    if location:
+        query = query.filter(d.location == location)
+    if stale is not None:
+        cutoff = stale_cutoff(now)
+        query = query.filter(d.last_seen_at < cutoff if stale else d.last_seen_at >= cutoff)
+    return query.order_by(d.device_id)
+
+
+def backfill(conn: Connection) -> None:
+    """Migration step: build the registry for a database that predates it."""
+    conn.execute(text(
+        "INSERT OR IGNORE INTO devices (device_id, location, first_seen_at, "
+        "last_seen_at, last_reading_id, temperature, humidity, motion, "
+        "reading_count, open_alert_count) "
+        "SELECT r.device_id, r.location, agg.first_seen, r.created_at, r.id, "
+        "r.temperature, r.humidity, r.motion, agg.n, 0 "
+        "FROM readings r JOIN ("
+        "  SELECT device_id, MIN(created_at) AS first_seen, MAX(id) AS last_id, "
+        "  COUNT(*) AS n FROM readings WHERE device_id IS NOT NULL "
+        "  GROUP BY device_id"
+        ") agg ON r.id = agg.last_id"
+    ))
+    conn.execute(text(
+        "UPDATE devices SET open_alert_count = ("
+        "  SELECT COUNT(*) FROM alerts WHERE alerts.device_id = devices.device_id "
+        "  AND alerts.closed_at IS NULL)"
+    ))
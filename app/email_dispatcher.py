@@ -0,0 +1,239 @@
+import logging
+import queue
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from typing import List, Optional, Sequence
+
+from sqlalchemy import update
+
+from . import metrics, models
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger("iot_alerts.email")
+
+_STOP = object()
+
+
+@dataclass
+class EmailJob:
+    alert_id: int
+    subject: str
+    body: str
+    attempts: int = 0
+
+
+def build_job(alert: models.Alert) -> EmailJob:
+    return EmailJob(
+        alert_id=alert.id,
+        subject=f"IoT Alert: {alert.alert_type}",
+        body=f"{alert.message}\n\nTime: {alert.created_at}",
+    )
+
+
+class _PooledConnection:
+    """One SMTP session owned by a worker and reused across messages."""
+
+    def __init__(self):
+        self._smtp: Optional[smtplib.SMTP] = None
+        self._last_used = 0.0
+
+    def get(self) -> smtplib.SMTP:
+        now = time.monotonic()
+        if self._smtp is not None and now - self._last_used > settings.smtp_idle_timeout_seconds:
+            self.close()
+        if self._smtp is None:
+            smtp = smtplib.SMTP(
+                settings.smtp_host,
+                settings.smtp_port,
+                timeout=settings.smtp_timeout_seconds,
+            )
+            if settings.smtp_starttls:
+                smtp.starttls()
+            if settings.smtp_username and settings.smtp_password:
+                smtp.login(settings.smtp_username, settings.smtp_password)
+            self._smtp = smtp
+        self._last_used = now
+        return self._smtp
+
+    def close(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            pass
+        self._smtp = None
+
+
+class EmailDispatcher:
+    """Delivers alert emails from a bounded queue on a pool of worker threads.
+
+    Each worker keeps its SMTP connection open between messages. Failed
+    deliveries are retried with exponential backoff; ``Alert.emailed`` is set
+    once a message has been accepted by the relay.
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.email_workers,
+        queue_size: int = settings.email_queue_size,
+        max_retries: int = settings.email_max_retries,
+        backoff_seconds: float = settings.email_retry_backoff_seconds,
+        backoff_max_seconds: float = settings.email_retry_backoff_max_seconds,
+    ):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, name=f"email-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Deliver what is queued (without further retries) and stop."""
+        if not self._threads:
+            return
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        self._threads = []
+
+    def submit(self, alerts: Sequence[models.Alert]) -> int:
+        """Queue emails for committed alerts; returns how many were queued.
+
+        Never blocks: when the queue is full the email is dropped and logged,
+        so a stalled relay cannot back up into ingest.
+        """
+        queued = 0
+        for alert in alerts:
+            try:
+                self._queue.put_nowait(build_job(alert))
+                queued += 1
+            except queue.Full:
+                self.dropped += 1
+                logger.error("Email queue full, dropping email for alert %s", alert.id)
+        return queued
+
+    def join(self, timeout: float = 10.0) -> bool:
+        """Wait until every queued email is delivered or given up on."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _backoff(self, attempts: int) -> float:
+        return min(
+            self.backoff_max_seconds, self.backoff_seconds * (2 ** (attempts - 1))
+        )
+
+    def _run(self) -> None:
+        conn = _PooledConnection()
+        try:
+            while True:
+                job = self._queue.get()
+                try:
+                    if job is _STOP:
+                        return
+                    self._deliver(conn, job)
+                finally:
+                    self._queue.task_done()
+        finally:
+            conn.close()
+
+    def _deliver(self, conn: _PooledConnection, job: EmailJob) -> None:
+        if not (settings.smtp_host and settings.email_from and settings.email_to):
+            self.failed += 1
+            logger.error("Failed to send alert email: Email settings are incomplete.")
+            return
+
+        msg = EmailMessage()
+        msg["Subject"] = job.subject
+        msg["From"] = settings.email_from
+        msg["To"] = settings.email_to
+        msg.set_content(job.body)
+
+        while True:
+            job.attempts += 1
+            start = time.perf_counter()
+            try:
+                conn.get().send_message(msg)
+            except Exception as exc:
+                metrics.smtp_send(time.perf_counter() - start, ok=False)
+                permanent = (
+                    isinstance(exc, smtplib.SMTPResponseException)
+                    and exc.smtp_code >= 500
+                )
+                if isinstance(exc, smtplib.SMTPResponseException):
+                    try:
+                        conn.get().rset()
+                    except Exception:
+                        conn.close()
+                else:
+                    conn.close()
+
+                if permanent or job.attempts > self.max_retries or self._stopping.is_set():
+                    self.failed += 1
+                    logger.error(
+                        "Failed to send email for alert %s after %d attempt(s): %s",
+                        job.alert_id, job.attempts, exc,
+                    )
+                    return
+                delay = self._backoff(job.attempts)
+                logger.warning(
+                    "Email for alert %s failed (%s), retrying in %.1fs",
+                    job.alert_id, exc, delay,
+                )
+                self._stopping.wait(delay)
+                continue
+
+            metrics.smtp_send(time.perf_counter() - start, ok=True)
+            self.sent += 1
+            self._mark_emailed(job.alert_id)
+            return
+
+    def _mark_emailed(self, alert_id: int) -> None:
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(models.Alert)
+                .where(models.Alert.id == alert_id)
+                .values(emailed=True)
+            )
+            db.commit()
+        except Exception as exc:
+            logger.error("Failed to mark alert %s as emailed: %s", alert_id, exc)
+        finally:
+            db.close()
+
+
+dispatcher = EmailDispatcher()
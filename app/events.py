@@ -0,0 +1,270 @@
+"""Live feed of committed readings and alerts (``GET /api/stream``, SSE).
+
+``ingest_readings`` publishes every batch to the ``broker`` right after its
+commit. Each connected client has a small bounded buffer; the publisher
+never blocks on a client, and a client whose buffer fills up is sent an
+``overflow`` event and disconnected, so one slow consumer cannot hold
+memory or slow down ingest. When nobody is connected publishing costs one
+length check.
+
+Event ids are cursors of the form ``<last reading id>.<last alert id>``.
+A client reconnecting with ``Last-Event-ID`` (or ``?after=``) first gets
+what it missed from the database, then the live feed; if it missed more
+than ``stream_replay_max`` rows it gets a ``reset`` event instead and
+should reload from the list endpoints.
+
+With alert episodes an alert row also changes in place: a repeat bumps
+``repeat_count``, a clear sets ``closed_at``, a reopen clears it. Those are
+sent as ``alert_update`` events carrying the whole row. They do not move
+the cursor and are not replayed, so a client that reconnects should
+refetch the alerts it shows.
+"""
+import asyncio
+import threading
+from collections import deque
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models, schemas
+from .config import settings
+
+READING = "reading"
+ALERT = "alert"
+ALERT_UPDATE = "alert_update"
+
+
+class Event:
+    __slots__ = ("kind", "id", "device_id", "data")
+
+    def __init__(self, kind: str, id: int, device_id: Optional[str], data: str):
+        self.kind = kind
+        self.id = id
+        self.device_id = device_id
+        self.data = data
+
+
+def reading_event(reading: models.Reading) -> Event:
+    return Event(
+        READING, reading.id, reading.device_id,
+        schemas.ReadingOut.model_validate(reading).model_dump_json(),
+    )
+
+
+def alert_event(alert: models.Alert, kind: str = ALERT) -> Event:
+    return Event(
+        kind, alert.id, alert.device_id,
+        schemas.AlertOut.model_validate(alert).model_dump_json(),
+    )
+
+
+def parse_cursor(value: str) -> Tuple[int, int]:
+    """``"<reading id>.<alert id>"`` -> ids; raises ValueError if malformed."""
+    reading_id, _, alert_id = value.strip().partition(".")
+    cursor = int(reading_id), int(alert_id or 0)
+    if min(cursor) < 0:
+        raise ValueError("negative id")
+    return cursor
+
+
+def format_cursor(cursor: Tuple[int, int]) -> str:
+    return f"{cursor[0]}.{cursor[1]}"
+
+
+class Subscriber:
+    """One client's filter and bounded buffer.
+
+    ``offer`` runs on ingest threads; ``wait``/``drain`` on the event loop.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        device_ids: Optional[Set[str]] = None,
+        alerts_only: bool = False,
+        buffer_size: Optional[int] = None,
+    ):
+        self.loop = loop
+        self.device_ids = device_ids or None
+        self.alerts_only = alerts_only
+        self.buffer_size = buffer_size or settings.stream_client_buffer
+        self.overflowed = False
+        self._buffer: Deque[Event] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = asyncio.Event()
+        self._wake_pending = False
+
+    def wants(self, event: Event) -> bool:
+        if self.alerts_only and event.kind == READING:
+            return False
+        return self.device_ids is None or event.device_id in self.device_ids
+
+    def offer(self, events: Iterable[Event]) -> None:
+        with self._lock:
+            if self.overflowed:
+                return
+            for event in events:
+                if not self.wants(event):
+                    continue
+                if len(self._buffer) >= self.buffer_size:
+                    self.overflowed = True
+                    self._buffer.clear()
+                    break
+                self._buffer.append(event)
+            if self._wake_pending or not (self._buffer or self.overflowed):
+                return
+            self._wake_pending = True
+        try:
+            self.loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            # Loop already closed: the client is gone
+            pass
+
+    def _wake(self) -> None:
+        self._wakeup.set()
+
+    async def wait(self, timeout: float) -> bool:
+        """Wait until events are buffered; False on timeout."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def drain(self) -> List[Event]:
+        with self._lock:
+            events = list(self._buffer)
+            self._buffer.clear()
+            self._wake_pending = False
+            self._wakeup.clear()
+        return events
+
+
+class EventBroker:
+    def __init__(self):
+        self._subscribers: Tuple[Subscriber, ...] = ()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped_clients = 0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, subscriber: Subscriber) -> Subscriber:
+        with self._lock:
+            self._subscribers = self._subscribers + (subscriber,)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscriber)
+            if subscriber.overflowed:
+                self.dropped_clients += 1
+
+    def publish(
+        self,
+        results: Sequence[Tuple[models.Reading, Sequence[models.Alert]]],
+        updated: Sequence[models.Alert] = (),
+    ) -> None:
+        """Fan a committed ingest batch, and the existing alerts it changed,
+        out to the connected clients."""
+        subscribers = self._subscribers
+        if not subscribers:
+            return
+        events: List[Event] = []
+        for reading, alerts in results:
+            events.append(reading_event(reading))
+            events.extend(alert_event(alert) for alert in alerts)
+        events.extend(alert_event(alert, ALERT_UPDATE) for alert in updated)
+        self.published += len(events)
+        for subscriber in subscribers:
+            subscriber.offer(events)
+
+
+def latest_cursor(db: Session) -> Tuple[int, int]:
+    return (
+        db.execute(select(func.max(models.Reading.id))).scalar() or 0,
+        db.execute(select(func.max(models.Alert.id))).scalar() or 0,
+    )
+
+
+def replay(
+    db: Session,
+    cursor: Tuple[int, int],
+    device_ids: Optional[Set[str]] = None,
+    alerts_only: bool = False,
+    limit: Optional[int] = None,
+) -> Optional[List[Event]]:
+    """Committed events after ``cursor``, or None if there are over ``limit``."""
+    limit = limit or settings.stream_replay_max
+    kinds = [(1, models.Alert, cursor[1], alert_event)]
+    if not alerts_only:
+        kinds.insert(0, (0, models.Reading, cursor[0], reading_event))
+
+    found: list = []
+    for order, model, after_id, to_event in kinds:
+        query = select(model).where(model.id > after_id)
+        if device_ids:
+            query = query.where(model.device_id.in_(device_ids))
+        rows = db.scalars(query.order_by(model.id).limit(limit + 1)).all()
+        if len(rows) > limit:
+            return None
+        found.extend((row.created_at, order, row.id, to_event(row)) for row in rows)
+    # Oldest first, readings before the alerts they raised
+    found.sort(key=lambda item: item[:3])
+    return [item[3] for item in found]
+
+
+def _frame(event: str, data: str, event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n"
+
+
+async def sse_stream(
+    subscriber: Subscriber,
+    broker: EventBroker,
+    cursor: Tuple[int, int],
+    backlog: Optional[List[Event]],
+    keepalive_seconds: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Frames for one client: the replayed backlog, then live events."""
+    keepalive_seconds = keepalive_seconds or settings.stream_keepalive_seconds
+    reading_id, alert_id = cursor
+    try:
+        yield f"retry: {int(settings.stream_retry_ms)}\n\n"
+        if backlog is None:
+            yield _frame("reset", "{}")
+            backlog = []
+        for event in backlog:
+            if event.kind == READING:
+                reading_id = max(reading_id, event.id)
+            else:
+                alert_id = max(alert_id, event.id)
+            yield _frame(event.kind, event.data, format_cursor((reading_id, alert_id)))
+        yield _frame("ready", "{}", format_cursor((reading_id, alert_id)))
+
+        while True:
+            if not subscriber.overflowed and not await subscriber.wait(keepalive_seconds):
+                yield ": keepalive\n\n"
+                continue
+            if subscriber.overflowed:
+                yield _frame("overflow", "{}")
+                return
+            for event in subscriber.drain():
+                # Skip what the replay already delivered
+                if event.kind == READING:
+                    if event.id <= reading_id:
+                        continue
+                    reading_id = event.id
+                elif event.kind == ALERT:
+                    if event.id <= alert_id:
+                        continue
+                    alert_id = event.id
+                yield _frame(event.kind, event.data, format_cursor((reading_id, alert_id)))
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+broker = EventBroker()
@@ -0,0 +1,99 @@
+"""The ingest unit of work shared by the single and batch endpoints."""
+import logging
+import threading
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import alert_state, alerts, anomaly, devices, events, metrics, models, rollups, schemas
+from .config import settings
+from .email_dispatcher import dispatcher as email_dispatcher
+
+# SQLite has a single writer anyway; serializing ingest in-process also
+# keeps the in-memory alert episodes in step with what gets committed.
+# Taken before the first write, so it never waits while holding the
+# database write lock.
+write_lock = threading.Lock()
+
+logger = logging.getLogger("iot_alerts.ingest")
+
+# Set when the alert episodes could not be reloaded after a rollback; the
+# next ingest retries before it uses them
+_reload_alert_state = False
+
+
+def _reload_after_rollback(db: Session) -> None:
+    """Bring the in-memory alert episodes back in line with the database.
+
+    Never raises, so the error that caused the rollback is the one the
+    caller sees.
+    """
+    global _reload_alert_state
+    try:
+        alert_state.table.load(db)
+        db.commit()
+        _reload_alert_state = False
+    except Exception as exc:
+        db.rollback()
+        _reload_alert_state = True
+        logger.error("Failed to reload alert state after a rollback: %s", exc)
+
+
+def ingest_readings(
+    db: Session, payloads: Sequence[schemas.ReadingCreate]
+) -> List[Tuple[models.Reading, List[models.Alert]]]:
+    """Store readings, evaluate rules and update devices and rollups in one
+    transaction.
+
+    Readings and alerts are inserted with INSERT ... RETURNING, so ids and
+    created_at come back without a refresh, and the whole batch costs a
+    single commit. Alert emails are queued, and the batch is published to the
+    live feed, only after the commit.
+    """
+    with write_lock:
+        if _reload_alert_state:
+            _reload_after_rollback(db)
+            if _reload_alert_state:
+                raise RuntimeError("Alert state is out of sync with the database.")
+        anomaly.tracker.begin()
+        try:
+            readings = db.scalars(
+                insert(models.Reading).returning(models.Reading),
+                [item.model_dump() for item in payloads],
+            ).all()
+            # Rowids are assigned in VALUES order; sort to line up with the payload.
+            readings = sorted(readings, key=lambda r: r.id)
+
+            # Alerts changed in place only matter to live feed clients
+            updated_alerts = [] if events.broker.client_count else None
+            generated_alerts = alerts.evaluate_batch(db, readings, updated_alerts)
+            devices.apply_readings(
+                db, readings, [alert_obj for group in generated_alerts for alert_obj in group]
+            )
+            if settings.rollups_enabled:
+                rollups.apply_readings(db, readings)
+            if anomaly.tracker.checkpoint_due():
+                anomaly.tracker.checkpoint(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            anomaly.tracker.rollback()
+            # The episodes may already reflect the rolled-back alerts
+            _reload_after_rollback(db)
+            raise
+        anomaly.tracker.commit()
+
+        results = list(zip(readings, generated_alerts))
+        metrics.readings_ingested.inc(amount=len(readings))
+        for group in generated_alerts:
+            metrics.alerts_created(group)
+        # Still under the lock, so the feed sees batches in commit order
+        events.broker.publish(results, updated_alerts or ())
+
+    if settings.enable_email:
+        email_dispatcher.submit(
+            [alert_obj for group in generated_alerts for alert_obj in group]
+        )
+
+    return results
@@ -1,19 +1,48 @@
-from typing import List, Optional
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from collections import Counter
+from typing import List, Literal, Optional
 
+import atexit
 import logging
+import math
 import os
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-from fastapi import Depends, FastAPI, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
-from . import alerts, models, schemas
+from . import admission, alert_state, anomaly, devices, events, ingest, metrics, migrations, models, queries, response_cache, retention, rules, schemas, timeseries, write_buffer
 from .config import settings
-from .database import Base, engine, get_db
+from .database import Base, SessionLocal, engine, get_db
+from .email_dispatcher import dispatcher as email_dispatcher
+from .reading_log import reading_log
 
 
 
-def setup_logging() -> None:
+class _DeferredQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them.
+
+    The stock QueueHandler formats in the caller so records can be pickled;
+    the queue here is in-process, so formatting is left to the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def setup_logging() -> QueueListener:
+    """Log to logs/system.log from a background thread.
+
+    Callers only enqueue records; formatting, writing and rotation happen on
+    the listener's thread, so a slow disk or a rollover does not add to
+    request latency.
+    """
     os.makedirs("logs", exist_ok=True)
     handler = RotatingFileHandler("logs/system.log", maxBytes=1_000_000, backupCount=3)
     formatter = logging.Formatter(
@@ -21,18 +50,120 @@ def setup_logging() -> None:
     )
     handler.setFormatter(formatter)
 
+    log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
     root = logging.getLogger()
     root.setLevel(logging.INFO)
-    root.addHandler(handler)
+    root.addHandler(_DeferredQueueHandler(log_queue))
+    return listener
 
 
-setup_logging()
+log_listener = setup_logging()
 logger = logging.getLogger("main")
 
 Base.metadata.create_all(bind=engine)
+migrations.run_migrations(engine)
+response_cache.watch(SessionLocal)
+
+_READINGS = TypeAdapter(List[schemas.ReadingOut])
+_ALERTS = TypeAdapter(List[schemas.AlertOut])
+_EMAIL_LOG = TypeAdapter(List[schemas.EmailRecordOut])
+
+
+retention_worker = retention.RetentionWorker(
+    settings.retention_interval_minutes * 60
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    rules.reload_plan()
+    db = SessionLocal()
+    try:
+        alert_state.table.load(db)
+        anomaly.tracker.load(db)
+    finally:
+        db.close()
+    if settings.enable_email:
+        email_dispatcher.start()
+    if settings.retention_enabled:
+        retention_worker.start()
+    if settings.ingest_mode == "buffered":
+        write_buffer.buffer.start()
+    yield
+    # Drain buffered readings first: they may still queue alert emails
+    write_buffer.buffer.stop()
+    retention_worker.stop()
+    email_dispatcher.stop()
+    _checkpoint_anomaly_state()
+    reading_log.flush()
+
 
+def _checkpoint_anomaly_state() -> None:
+    db = SessionLocal()
+    try:
+        with ingest.write_lock:
+            anomaly.tracker.checkpoint(db)
+            db.commit()
+    except Exception as exc:
+        logger.error("Failed to checkpoint anomaly state: %s", exc)
+    finally:
+        db.close()
 
-app = FastAPI(title=settings.app_name)
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+# Added before the metrics middleware so that one wraps it and counts the
+# 429s too
+app.add_middleware(admission.AdmissionMiddleware)
+
+if settings.metrics_enabled:
+    metrics.instrument_engine(engine)
+    app.add_middleware(metrics.MetricsMiddleware)
+    metrics.registry.gauge(
+        "iot_email_queue_depth", "Alert emails waiting for delivery.",
+        email_dispatcher.depth,
+    )
+    metrics.registry.gauge(
+        "iot_emails_sent_total", "Alert emails delivered since startup.",
+        lambda: email_dispatcher.sent, kind="counter",
+    )
+    metrics.registry.gauge(
+        "iot_emails_failed_total", "Alert emails given up on since startup.",
+        lambda: email_dispatcher.failed, kind="counter",
+    )
+    metrics.registry.gauge(
+        "iot_emails_dropped_total", "Alert emails dropped because the queue was full.",
+        lambda: email_dispatcher.dropped, kind="counter",
+    )
+    metrics.registry.gauge(
+        "iot_ingest_buffer_depth", "Readings waiting in the write-behind buffer.",
+        write_buffer.buffer.depth,
+    )
+    metrics.registry.gauge(
+        "iot_ingest_group_commits_total", "Group commits by the ingest writer since startup.",
+        lambda: write_buffer.buffer.groups_written, kind="counter",
+    )
+    metrics.registry.gauge(
+        "iot_ingest_buffer_failed_readings_total",
+        "Buffered readings that could not be stored and were dropped.",
+        lambda: write_buffer.buffer.failed_readings, kind="counter",
+    )
+    for cls in admission.CLASSES:
+        metrics.registry.gauge(
+            f"iot_admission_{cls}_in_flight", f"Admitted {cls} requests running.",
+            lambda cls=cls: admission.controller.in_flight[cls],
+        )
+        metrics.registry.gauge(
+            f"iot_admission_{cls}_waiting", f"{cls.capitalize()} requests queued for a slot.",
+            lambda cls=cls: admission.controller.waiting(cls),
+        )
+    metrics.registry.gauge(
+        "iot_stream_clients", "Connected /api/stream clients.",
+        lambda: events.broker.client_count,
+    )
 
 
 @app.get("/")
@@ -40,82 +171,373 @@ def root():
     return {"message": "IoT Alert System is running", "app": settings.app_name}
 
 
-@app.post("/api/readings", response_model=schemas.ReadingWithAlerts)
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(
+        metrics.registry.render(), media_type=metrics.CONTENT_TYPE
+    )
+
+
+def _reading_with_alerts(
+    reading: models.Reading, generated_alerts: List[models.Alert]
+) -> schemas.ReadingWithAlerts:
+    return schemas.ReadingWithAlerts(
+        reading=schemas.ReadingOut.model_validate(reading),
+        alerts=[
+            schemas.AlertOut.model_validate(alert_obj)
+            for alert_obj in generated_alerts
+        ],
+    )
+
+
+def _rate_limit(payloads: List[schemas.ReadingCreate]) -> None:
+    wait = admission.device_limiter.check(Counter(p.device_id for p in payloads))
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Device rate limit exceeded.",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def _submit(payloads: List[schemas.ReadingCreate]) -> write_buffer.Entry:
+    try:
+        return write_buffer.buffer.submit(payloads)
+    except write_buffer.BufferFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Ingest buffer is full.",
+            headers={"Retry-After": "1"},
+        )
+    except write_buffer.BufferClosed:
+        raise HTTPException(
+            status_code=503,
+            detail="Ingest is shutting down.",
+            headers={"Retry-After": "1"},
+        )
+
+
+def _accepted(entry: write_buffer.Entry) -> JSONResponse:
+    return JSONResponse(
+        status_code=202,
+        content=schemas.IngestAccepted(
+            sequence=entry.sequence, count=len(entry.payloads)
+        ).model_dump(),
+    )
+
+
+def _await_commit(entry: write_buffer.Entry):
+    if not entry.wait(settings.ingest_commit_timeout_seconds):
+        raise HTTPException(
+            status_code=504,
+            detail=f"Readings queued as #{entry.sequence} but not committed yet.",
+        )
+    if entry.error is not None:
+        raise entry.error
+    return entry.results
+
+
+_ACCEPTED = {202: {"model": schemas.IngestAccepted}}
+
+
+@app.post(
+    "/api/readings", response_model=schemas.ReadingWithAlerts, responses=_ACCEPTED
+)
 def create_reading(
     payload: schemas.ReadingCreate,
     db: Session = Depends(get_db),
 ):
-    reading = models.Reading(**payload.model_dump())
-    db.add(reading)
-    db.commit()
-    db.refresh(reading)
-
-    generated_alerts = alerts.evaluate_reading(db, reading)
-
-    
-    reading_out = schemas.ReadingOut.model_validate(reading)
-    alerts_out = [
-        schemas.AlertOut.model_validate(alert_obj)
-        for alert_obj in generated_alerts
+    _rate_limit([payload])
+    if settings.ingest_mode == "buffered":
+        entry = _submit([payload])
+        if settings.ingest_durability == "enqueue":
+            return _accepted(entry)
+        [(reading, generated_alerts)] = _await_commit(entry)
+    else:
+        [(reading, generated_alerts)] = ingest.ingest_readings(db, [payload])
+    return _reading_with_alerts(reading, generated_alerts)
+
+
+@app.post(
+    "/api/readings/batch",
+    response_model=List[schemas.ReadingWithAlerts],
+    responses=_ACCEPTED,
+)
+def create_readings_batch(
+    payload: List[schemas.ReadingCreate],
+    db: Session = Depends(get_db),
+):
+    if not payload:
+        raise HTTPException(status_code=422, detail="Batch must not be empty.")
+    if len(payload) > settings.batch_max_readings:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds {settings.batch_max_readings} readings.",
+        )
+
+    _rate_limit(payload)
+    if settings.ingest_mode == "buffered":
+        entry = _submit(payload)
+        if settings.ingest_durability == "enqueue":
+            return _accepted(entry)
+        results = _await_commit(entry)
+    else:
+        results = ingest.ingest_readings(db, payload)
+    return [
+        _reading_with_alerts(reading, generated_alerts)
+        for reading, generated_alerts in results
     ]
 
-    return schemas.ReadingWithAlerts(reading=reading_out, alerts=alerts_out)
 
+@app.get("/api/ingest/status", response_model=schemas.IngestStatusOut)
+def ingest_status():
+    buffer = write_buffer.buffer
+    return schemas.IngestStatusOut(
+        mode=settings.ingest_mode,
+        durability=settings.ingest_durability,
+        depth=buffer.depth(),
+        capacity=buffer.capacity,
+        last_sequence=buffer.last_sequence,
+        committed_sequence=buffer.committed_sequence,
+        groups_written=buffer.groups_written,
+        rejected=buffer.rejected,
+        failed=buffer.failed,
+        failed_readings=buffer.failed_readings,
+        recent_failures=list(buffer.recent_failures),
+    )
+
+
+@app.get("/api/admission", response_model=schemas.AdmissionOut)
+def admission_status():
+    controller = admission.controller
+    limits = {
+        admission.INGEST: controller.max_concurrent,
+        admission.READ: min(controller.read_max_concurrent, controller.max_concurrent),
+    }
+    return schemas.AdmissionOut(
+        enabled=settings.admission_enabled,
+        max_concurrent=controller.max_concurrent,
+        max_queued=controller.max_queued,
+        queue_timeout_seconds=controller.queue_timeout,
+        device_rate_limit_per_second=settings.device_rate_limit_per_second,
+        device_rate_limit_burst=settings.device_rate_limit_burst,
+        classes={
+            cls: schemas.AdmissionClassOut(
+                in_flight=controller.in_flight[cls],
+                waiting=controller.waiting(cls),
+                max_concurrent=limits[cls],
+                rejected={
+                    reason: int(admission.rejections.value(cls, reason))
+                    for reason in admission.REASONS
+                },
+            )
+            for cls in admission.CLASSES
+        },
+    )
 
 
 @app.get("/api/readings", response_model=List[schemas.ReadingOut])
 def list_readings(
+    request: Request,
     db: Session = Depends(get_db),
     device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=0),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
     limit: int = Query(50, ge=1, le=500),
 ):
-    query = db.query(models.Reading).order_by(models.Reading.id.desc())
-    if device_id:
-        query = query.filter(models.Reading.device_id == device_id)
-    return query.limit(limit).all()
+    def compute(response: Response):
+        rows = (
+            queries.readings_query(
+                db, device_id, location, before_id, after_id, since, until
+            )
+            .limit(limit)
+            .all()
+        )
+        return queries.page(response, rows, limit, before_id, after_id)
+
+    return response_cache.cached_json(request, _READINGS, compute)
+
+
+def _latest_cursor():
+    db = SessionLocal()
+    try:
+        return events.latest_cursor(db)
+    finally:
+        db.close()
+
+
+def _stream_backlog(cursor, device_ids, alerts_only):
+    db = SessionLocal()
+    try:
+        backlog = events.replay(db, cursor, device_ids, alerts_only)
+        if backlog is None:
+            return events.latest_cursor(db), None
+        return cursor, backlog
+    finally:
+        db.close()
+
+
+@app.get("/api/stream")
+async def stream(
+    device_id: Optional[List[str]] = Query(None),
+    alerts_only: bool = False,
+    after: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """Server-Sent Events feed of new readings and alerts (see app/events.py)."""
+    resume = last_event_id or after
+    cursor = None
+    if resume:
+        try:
+            cursor = events.parse_cursor(resume)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid stream cursor.")
+    if events.broker.client_count >= settings.stream_max_clients:
+        raise HTTPException(status_code=503, detail="Too many stream clients.")
+
+    device_ids = set(device_id) if device_id else None
+    if cursor is None:
+        cursor = await run_in_threadpool(_latest_cursor)
+    # Subscribe before reading the backlog so nothing committed in between
+    # is missed; duplicates are skipped by id.
+    subscriber = events.broker.subscribe(
+        events.Subscriber(asyncio.get_running_loop(), device_ids, alerts_only)
+    )
+    try:
+        cursor, backlog = await run_in_threadpool(
+            _stream_backlog, cursor, device_ids, alerts_only
+        )
+    except Exception:
+        events.broker.unsubscribe(subscriber)
+        raise
+
+    return StreamingResponse(
+        events.sse_stream(subscriber, events.broker, cursor, backlog),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/api/readings/series", response_model=schemas.SeriesOut)
+def readings_series(
+    db: Session = Depends(get_db),
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    bucket_seconds: Optional[int] = Query(None, ge=1, le=7 * 86400),
+    points: int = Query(300, ge=3, le=5000),
+    mode: Literal["aggregate", "lttb"] = "aggregate",
+    metric: Literal["temperature", "humidity"] = "temperature",
+):
+    since, until = timeseries.resolve_range(
+        since, until, settings.series_default_hours
+    )
+    out = schemas.SeriesOut(
+        device_id=device_id, location=location, since=since, until=until, mode=mode
+    )
+
+    if mode == "lttb":
+        rows, out.truncated = timeseries.raw_series(
+            db, since, until, device_id, location, settings.series_max_raw_rows
+        )
+        xs = [row.created_at.timestamp() for row in rows]
+        ys = [getattr(row, metric) for row in rows]
+        out.points = [
+            schemas.SeriesPoint.model_validate(rows[i])
+            for i in timeseries.lttb(xs, ys, points)
+        ]
+        return out
+
+    out.bucket_seconds = bucket_seconds or timeseries.choose_bucket_seconds(
+        since, until, points
+    )
+    out.buckets = [
+        schemas.SeriesBucket(**bucket)
+        for bucket in timeseries.aggregate_series(
+            db, since, until, out.bucket_seconds, device_id, location
+        )
+    ]
+    return out
+
+
+@app.get("/api/devices", response_model=List[schemas.DeviceOut])
+def list_devices(
+    db: Session = Depends(get_db),
+    location: Optional[str] = None,
+    stale: Optional[bool] = None,
+):
+    now = datetime.utcnow()
+    cutoff = devices.stale_cutoff(now)
+    out = []
+    for device in devices.devices_query(db, location, stale, now).all():
+        item = schemas.DeviceOut.model_validate(device)
+        item.stale = device.last_seen_at < cutoff
+        out.append(item)
+    return out
 
 
 @app.get("/api/alerts", response_model=List[schemas.AlertOut])
 def list_alerts(
+    request: Request,
     db: Session = Depends(get_db),
     device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=0),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    updated_since: Optional[datetime] = None,
     limit: int = Query(50, ge=1, le=500),
 ):
-    query = db.query(models.Alert).order_by(models.Alert.id.desc())
-    if device_id:
-        query = query.filter(models.Alert.device_id == device_id)
-    return query.limit(limit).all()
+    def compute(response: Response):
+        rows = (
+            queries.alerts_query(
+                db, device_id, location, alert_type, before_id, after_id, since, until,
+                updated_since,
+            )
+            .limit(limit)
+            .all()
+        )
+        if updated_since is not None:
+            rows.sort(key=lambda row: row.id, reverse=True)
+        return queries.page(response, rows, limit, before_id, after_id)
+
+    return response_cache.cached_json(request, _ALERTS, compute)
 
 
 @app.get("/api/email-log", response_model=List[schemas.EmailRecordOut])
 def list_email_log(
+    request: Request,
     db: Session = Depends(get_db),
     limit: int = Query(50, ge=1, le=500),
 ):
-    
-    alert_rows = (
-        db.query(models.Alert)
-        .filter(models.Alert.emailed == True)  
-        .order_by(models.Alert.id.desc())
-        .limit(limit)
-        .all()
-    )
-
-    records: List[schemas.EmailRecordOut] = []
-
-    for a in alert_rows:
-        subject = f"IoT Alert: {a.alert_type}"
-        body = f"{a.message}\n\nTime: {a.created_at}"
-        to_addr = settings.email_to or "(not configured)"
-
-        records.append(
-            schemas.EmailRecordOut(
-                id=a.id,
-                to_address=to_addr,
-                subject=subject,
-                body=body,
-                sent_at=a.created_at,
+    def compute(response: Response):
+        alert_rows = queries.emailed_alerts_query(db).limit(limit).all()
+
+        records: List[schemas.EmailRecordOut] = []
+
+        for a in alert_rows:
+            subject = f"IoT Alert: {a.alert_type}"
+            body = f"{a.message}\n\nTime: {a.created_at}"
+            to_addr = settings.email_to or "(not configured)"
+
+            records.append(
+                schemas.EmailRecordOut(
+                    id=a.id,
+                    to_address=to_addr,
+                    subject=subject,
+                    body=body,
+                    sent_at=a.created_at,
+                )
             )
-        )
 
-    return records
+        return records
+
+    return response_cache.cached_json(request, _EMAIL_LOG, compute)
@@ -0,0 +1,308 @@
+"""In-process metrics served as Prometheus text on ``GET /metrics``.
+
+Counters and histograms are plain Python numbers behind one small lock per
+metric family; recording a sample is a dict lookup, a bisect and a few
+increments, so it is cheap enough for every request and every query.
+
+Sources:
+
+* ``MetricsMiddleware`` times each HTTP request per route template and
+  counts the database commits it made,
+* ``instrument_engine`` hooks SQLAlchemy's cursor events to time every
+  statement, grouped by shape (verb + table, e.g. ``INSERT readings``),
+* ingest and the email dispatcher call ``alerts_created`` / ``smtp_send``
+  directly,
+* gauges such as the email queue depth are read when /metrics is scraped.
+"""
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_label_text(self.labels, labels)} {_number(value)}"
+
+
+class Gauge:
+    """A value read from a callback at scrape time.
+
+    ``kind="counter"`` exposes a monotonic count kept elsewhere (such as the
+    email dispatcher's sent/failed totals) with counter semantics.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], float],
+                 kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {_number(self.read())}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last), sum, count]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]])
+                           for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                bucket_labels = _label_text(self.labels, labels, 'le="%s"' % le)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f"{self.name}_sum{_label_text(self.labels, labels)} {total!r}"
+            yield f"{self.name}_count{_label_text(self.labels, labels)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "iot_http_requests_total", "HTTP requests by route and status.",
+    ("method", "route", "status"),
+)
+http_latency = registry.histogram(
+    "iot_http_request_duration_seconds", "HTTP request latency by route.",
+    ("method", "route"),
+)
+commits_per_request = registry.histogram(
+    "iot_db_commits_per_request", "Database commits made while handling a request.",
+    ("method", "route"), buckets=COUNT_BUCKETS,
+)
+db_queries = registry.counter(
+    "iot_db_queries_total", "SQL statements executed, by statement shape.",
+    ("statement",),
+)
+db_query_latency = registry.histogram(
+    "iot_db_query_duration_seconds", "SQL statement execution time, by statement shape.",
+    ("statement",),
+)
+db_commits = registry.counter("iot_db_commits_total", "Database commits.")
+alerts_created_total = registry.counter(
+    "iot_alerts_created_total", "Alerts created, by alert type.", ("alert_type",),
+)
+readings_ingested = registry.counter("iot_readings_ingested_total", "Readings stored.")
+smtp_latency = registry.histogram(
+    "iot_smtp_send_duration_seconds", "Time to hand one email to the SMTP relay.",
+    ("outcome",),
+)
+
+# Commits of the request being handled; a one-element list shared with the
+# threadpool copies of the request's context.
+_request_commits: ContextVar[Optional[List[int]]] = ContextVar("request_commits", default=None)
+
+
+def alerts_created(alerts: Iterable) -> None:
+    for alert in alerts:
+        alerts_created_total.inc(alert.alert_type)
+
+
+def smtp_send(seconds: float, ok: bool) -> None:
+    smtp_latency.observe(seconds, "ok" if ok else "error")
+
+
+_VERB = re.compile(r"^\s*(\w+)", re.I)
+_TABLE = {
+    "SELECT": re.compile(r"\bFROM\s+[\"`]?(\w+)", re.I),
+    "INSERT": re.compile(r"\bINTO\s+[\"`]?(\w+)", re.I),
+    "UPDATE": re.compile(r"^\s*UPDATE\s+(?:OR\s+\w+\s+)?[\"`]?(\w+)", re.I),
+    "DELETE": re.compile(r"\bFROM\s+[\"`]?(\w+)", re.I),
+}
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """``INSERT INTO readings (...) VALUES ...`` -> ``INSERT readings``.
+
+    Keeps the label set small no matter how many distinct statements run;
+    SQLAlchemy reuses statement strings, so the cache hits almost always.
+    """
+    match = _VERB.match(statement)
+    if not match:
+        return "OTHER"
+    verb = match.group(1).upper()
+    table = _TABLE.get(verb)
+    found = table.search(statement) if table else None
+    return f"{verb} {found.group(1).lower()}" if found else verb
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("metrics_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    shape = statement_shape(statement)
+    db_queries.inc(shape)
+    db_query_latency.observe(elapsed, shape)
+
+
+def _on_commit(conn):
+    db_commits.inc()
+    commits = _request_commits.get()
+    if commits is not None:
+        commits[0] += 1
+
+
+def _on_error(context):
+    starts = context.connection.info.get("metrics_query_start") if context.connection else None
+    if starts:
+        starts.pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "commit", _on_commit)
+    event.listen(engine, "handle_error", _on_error)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and commits per route.
+
+    Requests are labelled with the matched route template (``/api/readings``
+    rather than the raw path) so the label set stays bounded; unmatched
+    paths are grouped as ``<unmatched>``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        commits = [0]
+        token = _request_commits.set(commits)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_commits.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            http_requests.inc(method, path, str(status[0]))
+            http_latency.observe(elapsed, method, path)
+            commits_per_request.observe(commits[0], method, path)
@@ -0,0 +1,139 @@
+"""Lightweight schema migrations for existing SQLite databases.
+
+``Base.metadata.create_all`` only creates missing tables, so changes to
+tables that already exist (new indexes, columns) are applied here. The
+schema version is kept in ``PRAGMA user_version``; each migration runs once,
+in its own transaction. Steps are written to be no-ops on a fresh database
+that ``create_all`` has already built from the current models.
+"""
+import logging
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from . import devices, rollups
+
+logger = logging.getLogger("iot_alerts.migrations")
+
+Step = Union[str, Callable[[Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (
+        1,
+        "composite and partial indexes for the list endpoints",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_readings_device_id_id "
+            "ON readings (device_id, id)",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_device_id_id "
+            "ON alerts (device_id, id)",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_emailed_id "
+            "ON alerts (id) WHERE emailed = 1",
+            # Superseded by the composite indexes above
+            "DROP INDEX IF EXISTS ix_readings_device_id",
+            "DROP INDEX IF EXISTS ix_alerts_device_id",
+            "ANALYZE",
+        ],
+    ),
+    (
+        2,
+        "location, alert_type and created_at indexes for keyset paging",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_readings_location_id "
+            "ON readings (location, id)",
+            "CREATE INDEX IF NOT EXISTS ix_readings_created_at "
+            "ON readings (created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_location_id "
+            "ON alerts (location, id)",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_alert_type_id "
+            "ON alerts (alert_type, id)",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_created_at "
+            "ON alerts (created_at)",
+            "DROP INDEX IF EXISTS ix_readings_location",
+            "DROP INDEX IF EXISTS ix_alerts_location",
+            "DROP INDEX IF EXISTS ix_alerts_alert_type",
+            "ANALYZE",
+        ],
+    ),
+    (
+        3,
+        "per-device time range index for the series endpoint",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_readings_device_id_created_at "
+            "ON readings (device_id, created_at)",
+        ],
+    ),
+    (
+        4,
+        "backfill reading_rollups from existing readings",
+        [rollups.backfill],
+    ),
+    (
+        5,
+        "alert episode columns (repeat_count, last_seen_at, closed_at)",
+        [
+            lambda conn: _add_column(
+                conn, "alerts", "repeat_count", "INTEGER NOT NULL DEFAULT 1"
+            ),
+            lambda conn: _add_column(conn, "alerts", "last_seen_at", "DATETIME"),
+            lambda conn: _add_column(conn, "alerts", "closed_at", "DATETIME"),
+            # Alerts from before episodes existed are one-offs: close them
+            "UPDATE alerts SET closed_at = created_at, last_seen_at = created_at "
+            "WHERE closed_at IS NULL AND last_seen_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_open "
+            "ON alerts (device_id, alert_type) WHERE closed_at IS NULL",
+        ],
+    ),
+    (
+        6,
+        "backfill the devices registry from existing readings",
+        [devices.backfill],
+    ),
+    (
+        7,
+        "alerts.updated_at for syncing changed alerts",
+        [
+            lambda conn: _add_column(conn, "alerts", "updated_at", "DATETIME"),
+            "UPDATE alerts SET updated_at = COALESCE(closed_at, last_seen_at, created_at) "
+            "WHERE updated_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS ix_alerts_updated_at ON alerts (updated_at)",
+        ],
+    ),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ALTER TABLE ... ADD COLUMN, skipped if ``create_all`` already added it."""
+    existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def current_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+
+def run_migrations(engine: Engine) -> int:
+    """Apply pending migrations and return the resulting schema version."""
+    if engine.dialect.name != "sqlite":
+        return 0
+
+    with engine.connect() as conn:
+        version = current_version(conn)
+
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info("Applying migration %s: %s", target, description)
+        with engine.begin() as conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(text(f"PRAGMA user_version = {int(target)}"))
+        version = target
+
+    return version
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Index, text
 from sqlalchemy.sql import func
 
 from .database import Base
@@ -6,10 +6,21 @@ from .database import Base
 
 class Reading(Base):
     __tablename__ = "readings"
+    # Fetch server defaults (created_at) with RETURNING on flush instead of
+    # a refresh after commit.
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        # device_id filter + ORDER BY id DESC without a sort step
+        Index("ix_readings_device_id_id", "device_id", "id"),
+        Index("ix_readings_location_id", "location", "id"),
+        Index("ix_readings_created_at", "created_at"),
+        # Per-device time ranges (/api/readings/series)
+        Index("ix_readings_device_id_created_at", "device_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    device_id = Column(String, index=True)
-    location = Column(String, index=True)
+    device_id = Column(String)
+    location = Column(String)
     temperature = Column(Float, nullable=False)
     humidity = Column(Float, nullable=False)
     motion = Column(Boolean, nullable=False)
@@ -18,11 +29,96 @@ class Reading(Base):
 
 class Alert(Base):
     __tablename__ = "alerts"
+    __mapper_args__ = {"eager_defaults": True}
+    __table_args__ = (
+        Index("ix_alerts_device_id_id", "device_id", "id"),
+        Index("ix_alerts_location_id", "location", "id"),
+        Index("ix_alerts_alert_type_id", "alert_type", "id"),
+        Index("ix_alerts_created_at", "created_at"),
+        # Dashboards sync alerts changed since their last refresh
+        Index("ix_alerts_updated_at", "updated_at"),
+        # Email log: only the (few) emailed alerts, newest first
+        Index("ix_alerts_emailed_id", "id", sqlite_where=text("emailed = 1")),
+        # Open episodes, loaded at startup to rebuild the alert state
+        Index(
+            "ix_alerts_open",
+            "device_id",
+            "alert_type",
+            sqlite_where=text("closed_at IS NULL"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    device_id = Column(String, index=True)
-    location = Column(String, index=True)
-    alert_type = Column(String, index=True)
+    device_id = Column(String)
+    location = Column(String)
+    alert_type = Column(String)
     message = Column(String)
     emailed = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Episode tracking: readings that re-triggered the alert while it was
+    # open, when it last did, and when it cleared (NULL while open)
+    repeat_count = Column(Integer, nullable=False, default=1, server_default="1")
+    last_seen_at = Column(DateTime(timezone=True))
+    closed_at = Column(DateTime(timezone=True))
+    # Bumped by every insert and update (episodes, emailed)
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+
+class Device(Base):
+    """Latest state ("shadow") of each device, upserted during ingest."""
+
+    __tablename__ = "devices"
+    __table_args__ = (
+        Index("ix_devices_location", "location"),
+        Index("ix_devices_last_seen_at", "last_seen_at"),
+    )
+
+    device_id = Column(String, primary_key=True)
+    location = Column(String)
+    first_seen_at = Column(DateTime(timezone=True), nullable=False)
+    last_seen_at = Column(DateTime(timezone=True), nullable=False)
+    last_reading_id = Column(Integer, nullable=False)
+    temperature = Column(Float, nullable=False)
+    humidity = Column(Float, nullable=False)
+    motion = Column(Boolean, nullable=False)
+    reading_count = Column(Integer, nullable=False, default=0)
+    # Open alert episodes (see app/alert_state.py)
+    open_alert_count = Column(Integer, nullable=False, default=0)
+
+
+class ReadingRollup(Base):
+    """Mergeable per-bucket stats for one device/location.
+
+    ``granularity`` is the bucket width in seconds (60 or 3600) and
+    ``bucket`` the bucket start as a Unix timestamp.
+    """
+
+    __tablename__ = "reading_rollups"
+    __table_args__ = (
+        Index("ix_reading_rollups_granularity_bucket", "granularity", "bucket"),
+    )
+
+    granularity = Column(Integer, primary_key=True)
+    device_id = Column(String, primary_key=True)
+    location = Column(String, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False)
+    temperature_sum = Column(Float, nullable=False)
+    temperature_sumsq = Column(Float, nullable=False)
+    temperature_min = Column(Float, nullable=False)
+    temperature_max = Column(Float, nullable=False)
+    humidity_sum = Column(Float, nullable=False)
+    humidity_sumsq = Column(Float, nullable=False)
+    humidity_min = Column(Float, nullable=False)
+    humidity_max = Column(Float, nullable=False)
+    motion_count = Column(Integer, nullable=False)
+
+
+class AnomalyState(Base):
+    """Checkpoint of one device's rolling windows (see app/anomaly.py)."""
+
+    __tablename__ = "anomaly_state"
+
+    device_id = Column(String, primary_key=True)
+    state = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
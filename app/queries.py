@@ -0,0 +1,128 @@
+"""Query builders for the list endpoints.
+
+Kept separate from the route handlers so the query-plan tests check exactly
+the SQL the API runs.
+
+Paging is keyset-based: ``before_id`` walks back through history and
+``after_id`` fetches rows newer than the last one seen, so every page is an
+index range scan no matter how deep it is. Alerts also change in place, so
+``updated_since`` fetches the ones created or changed since a watermark.
+"""
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import Response
+from sqlalchemy import String, type_coerce
+from sqlalchemy.orm import Query, Session
+
+from . import models
+
+
+def utc_text(value: datetime) -> str:
+    """Format a datetime the way SQLite's CURRENT_TIMESTAMP stores it."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _window(
+    query: Query,
+    model,
+    before_id: Optional[int],
+    after_id: Optional[int],
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> Query:
+    if before_id is not None:
+        query = query.filter(model.id < before_id)
+    if after_id is not None:
+        query = query.filter(model.id > after_id)
+    # created_at is stored as CURRENT_TIMESTAMP text; compare as text so the
+    # created_at index stays usable.
+    if since is not None:
+        query = query.filter(type_coerce(model.created_at, String) >= utc_text(since))
+    if until is not None:
+        query = query.filter(type_coerce(model.created_at, String) < utc_text(until))
+
+    # Pages after a cursor start right above it, so scan upwards from it.
+    if after_id is not None and before_id is None:
+        return query.order_by(model.id.asc())
+    return query.order_by(model.id.desc())
+
+
+def readings_query(
+    db: Session,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Query:
+    query = db.query(models.Reading)
+    if device_id:
+        query = query.filter(models.Reading.device_id == device_id)
+    if location:
+        query = query.filter(models.Reading.location == location)
+    return _window(query, models.Reading, before_id, after_id, since, until)
+
+
+def alerts_query(
+    db: Session,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    alert_type: Optional[str] = None,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    updated_since: Optional[datetime] = None,
+) -> Query:
+    query = db.query(models.Alert)
+    if updated_since is not None:
+        query = query.filter(
+            type_coerce(models.Alert.updated_at, String) >= utc_text(updated_since)
+        )
+    if device_id:
+        query = query.filter(models.Alert.device_id == device_id)
+    if location:
+        query = query.filter(models.Alert.location == location)
+    if alert_type:
+        query = query.filter(models.Alert.alert_type == alert_type)
+    query = _window(query, models.Alert, before_id, after_id, since, until)
+    if updated_since is not None:
+        # Few alerts change between refreshes; walking ids newest first
+        # would scan the whole table to find them.
+        query = query.order_by(None).order_by(models.Alert.updated_at)
+    return query
+
+
+def emailed_alerts_query(db: Session) -> Query:
+    # Must stay "emailed = 1" to match the partial index ix_alerts_emailed_id
+    return (
+        db.query(models.Alert)
+        .filter(models.Alert.emailed == True)  # noqa: E712
+        .order_by(models.Alert.id.desc())
+    )
+
+
+def page(
+    response: Response,
+    rows: List,
+    limit: int,
+    before_id: Optional[int],
+    after_id: Optional[int],
+) -> List:
+    """Return rows newest first and set the ``X-Next-Cursor`` header.
+
+    The cursor is the query parameter to send for the next page:
+    ``before_id=<n>`` for older rows when the page was full, or
+    ``after_id=<n>`` for rows newer than this page when paging forward.
+    """
+    if after_id is not None and before_id is None:
+        rows = rows[::-1]
+        if rows:
+            response.headers["X-Next-Cursor"] = f"after_id={rows[0].id}"
+    elif len(rows) == limit:
+        response.headers["X-Next-Cursor"] = f"before_id={rows[-1].id}"
+    return rows
@@ -0,0 +1,125 @@
+"""Rate-limited "Reading OK" logging.
+
+Every reading that raises no alert used to produce an INFO line. At fleet
+rates that is almost all of the log volume and none of its value, so
+``reading_log_mode`` picks what is kept:
+
+* ``all``: one line per reading, as before,
+* ``sample``: the first reading of each device and then every
+  ``reading_log_sample_every``-th one,
+* ``summary``: one line per device per ``reading_log_summary_seconds`` with
+  the count and the min/max values seen,
+* ``off``: nothing.
+
+Alerts are logged by ``alerts`` itself and never go through here.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from .config import settings
+
+logger = logging.getLogger("iot_alerts")
+
+
+class _Window:
+    __slots__ = ("location", "started", "count", "t_min", "t_max", "h_min", "h_max", "motion")
+
+    def __init__(self, location: Optional[str], started: float):
+        self.location = location
+        self.started = started
+        self.count = 0
+        self.t_min = self.h_min = float("inf")
+        self.t_max = self.h_max = float("-inf")
+        self.motion = 0
+
+
+class ReadingLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._windows: Dict[str, _Window] = {}
+        self._next_sweep = 0.0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._windows.clear()
+
+    def record(self, reading) -> None:
+        mode = settings.reading_log_mode
+        if mode == "off" or not logger.isEnabledFor(logging.INFO):
+            return
+        if mode == "all":
+            self._log_one(reading)
+        elif mode == "sample":
+            every = max(1, settings.reading_log_sample_every)
+            with self._lock:
+                seen = self._counts.get(reading.device_id, 0)
+                self._counts[reading.device_id] = seen + 1
+            if seen % every == 0:
+                self._log_one(reading, every)
+        else:
+            self._aggregate(reading)
+
+    def flush(self) -> None:
+        """Write out every open summary window (e.g. on shutdown)."""
+        with self._lock:
+            windows, self._windows = self._windows, {}
+        for device_id, window in windows.items():
+            self._log_window(device_id, window)
+
+    def _log_one(self, reading, every: int = 1) -> None:
+        if every > 1:
+            logger.info(
+                "Reading OK from %s at %s: T=%.1f°C, H=%.1f%%, MOTION=%s "
+                "(1 in %d logged)",
+                reading.device_id, reading.location, reading.temperature,
+                reading.humidity, reading.motion, every,
+            )
+        else:
+            logger.info(
+                "Reading OK from %s at %s: T=%.1f°C, H=%.1f%%, MOTION=%s",
+                reading.device_id, reading.location, reading.temperature,
+                reading.humidity, reading.motion,
+            )
+
+    def _aggregate(self, reading) -> None:
+        now = time.monotonic()
+        interval = settings.reading_log_summary_seconds
+        due = []
+        with self._lock:
+            window = self._windows.get(reading.device_id)
+            if window is None:
+                window = self._windows[reading.device_id] = _Window(reading.location, now)
+            window.count += 1
+            window.t_min = min(window.t_min, reading.temperature)
+            window.t_max = max(window.t_max, reading.temperature)
+            window.h_min = min(window.h_min, reading.humidity)
+            window.h_max = max(window.h_max, reading.humidity)
+            window.motion += bool(reading.motion)
+            if now - window.started >= interval:
+                due.append((reading.device_id, self._windows.pop(reading.device_id)))
+
+            # Sweep at most once per interval, so quiet devices get their
+            # summary too without a scan on every reading.
+            if now >= self._next_sweep:
+                self._next_sweep = now + interval
+                for device_id, open_window in list(self._windows.items()):
+                    if now - open_window.started >= interval:
+                        due.append((device_id, self._windows.pop(device_id)))
+        for device_id, closed in due:
+            self._log_window(device_id, closed)
+
+    def _log_window(self, device_id: str, window: _Window) -> None:
+        logger.info(
+            "Readings OK from %s at %s: %d in %.0fs, T=%.1f..%.1f°C, "
+            "H=%.1f..%.1f%%, MOTION=%d",
+            device_id, window.location, window.count,
+            time.monotonic() - window.started, window.t_min, window.t_max,
+            window.h_min, window.h_max, window.motion,
+        )
+
+
+reading_log = ReadingLog()
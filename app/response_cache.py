@@ -0,0 +1,157 @@
+"""Response cache and ETags for the list endpoints.
+
+The dashboard polls ``/api/readings``, ``/api/alerts`` and
+``/api/email-log`` with the same parameters every few seconds, and between
+ingests the answer does not change. ``cached_json`` keeps the serialized
+body per route and query string, so a repeat request costs a dict lookup
+instead of a query and a serialization.
+
+Invalidation is by data generation: every session commit bumps
+``cache.generation`` and drops the cached bodies, and a body computed
+under an older generation is never stored. Writes made by other processes
+(``python -m app.retention run`` and friends) do not go through this
+process's sessions, so entries also expire after
+``response_cache_ttl_seconds``. Memory is bounded by
+``response_cache_max_bytes``, least recently used first.
+
+Every response carries a strong ETag (a hash of the body). A request whose
+``If-None-Match`` matches gets 304 with no body, which is what an idle
+dashboard mostly sees.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy import event
+
+from . import metrics
+from .config import settings
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+lookups = metrics.registry.counter(
+    "iot_response_cache_requests_total",
+    "Cached list endpoint requests by result (hit, miss, not_modified).",
+    ("result",),
+)
+
+
+class Entry:
+    __slots__ = ("body", "etag", "headers", "stored_at")
+
+    def __init__(self, body: bytes, headers: Dict[str, str]):
+        self.body = body
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.headers = headers
+        self.stored_at = time.monotonic()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_bytes: int = settings.response_cache_max_bytes,
+        ttl_seconds: float = settings.response_cache_ttl_seconds,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.generation = 0
+        self.size = 0
+        self._entries: "OrderedDict[Key, Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def invalidate(self) -> None:
+        """New data was committed: bump the generation, drop every body."""
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.size = 0
+
+    def get(self, key: Key) -> Optional[Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.stored_at > self.ttl_seconds:
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Key, generation: int, entry: Entry) -> None:
+        """Store ``entry`` unless data changed since ``generation`` was read."""
+        size = len(entry.body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self.size += size
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: Key) -> None:
+        self.size -= len(self._entries.pop(key).body)
+
+
+def watch(session_factory) -> None:
+    """Invalidate the cache after every commit made through ``session_factory``."""
+    event.listen(session_factory, "after_commit", lambda session: cache.invalidate())
+
+
+def _request_key(request: Request) -> Key:
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in (tag.strip() for tag in header.split(","))
+
+
+def cached_json(
+    request: Request,
+    adapter: TypeAdapter,
+    compute: Callable[[Response], object],
+) -> Response:
+    """Serve ``compute(response)`` as JSON through the cache.
+
+    ``compute`` gets a scratch Response for headers such as
+    ``X-Next-Cursor``; they are cached along with the body.
+    """
+    key = _request_key(request)
+    entry = cache.get(key) if settings.response_cache_enabled else None
+    if entry is None:
+        generation = cache.generation
+        scratch = Response()
+        data = adapter.validate_python(compute(scratch), from_attributes=True)
+        headers = {
+            name: value for name, value in scratch.headers.items()
+            if name not in ("content-length", "content-type")
+        }
+        entry = Entry(adapter.dump_json(data), headers)
+        if settings.response_cache_enabled:
+            cache.put(key, generation, entry)
+        result = "miss"
+    else:
+        result = "hit"
+
+    headers = dict(entry.headers, ETag=entry.etag)
+    if _not_modified(request, entry.etag):
+        lookups.inc("not_modified")
+        return Response(status_code=304, headers=headers)
+    lookups.inc(result)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+cache = ResponseCache()
@@ -0,0 +1,354 @@
+"""Retention: archive and purge old raw data, prune fine-grained rollups.
+
+Tiers (TTLs in ``Settings``; ``None`` keeps data forever):
+
+* raw ``readings``/``alerts`` older than their TTL are exported to gzip'd
+  CSV files partitioned by UTC day (``<archive_dir>/<table>/YYYY/MM/DD.csv.gz``)
+  and then deleted. With alert episodes an alert's age counts from when it
+  closed, so open episodes (still tracked by ``alert_state``) are never
+  purged;
+* minute rollups older than their TTL are deleted (hour rollups still cover
+  that period);
+* hour rollups are kept unless a TTL is configured.
+
+Everything is done in chunks of ``retention_chunk_rows`` rows, each in its
+own short transaction, so the purge never holds the SQLite write lock for
+long. Each delete and its commit run under ``ingest.write_lock``, so the
+in-process worker takes turns with ingest instead of racing it for the
+database lock. Export happens before delete; if a run is interrupted in
+between, the next run exports the same rows again and ``read_archive``
+drops the duplicates by id.
+
+    python -m app.retention run
+    python -m app.retention query --since 2025-01-01 --until 2025-01-02
+"""
+import argparse
+import csv
+import gzip
+import heapq
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import String, and_, select, type_coerce
+from sqlalchemy.orm import Session
+
+from . import ingest, models, rollups
+from .config import settings
+from .queries import utc_text
+
+logger = logging.getLogger("iot_alerts.retention")
+
+READING_COLUMNS = ["id", "device_id", "location", "temperature", "humidity", "motion", "created_at"]
+ALERT_COLUMNS = [
+    "id", "device_id", "location", "alert_type", "message", "emailed", "created_at",
+    "repeat_count", "last_seen_at", "closed_at",
+]
+
+TABLES = {
+    "readings": (models.Reading, READING_COLUMNS),
+    "alerts": (models.Alert, ALERT_COLUMNS),
+}
+
+
+def partition_path(archive_dir: str, table: str, day: date) -> str:
+    return os.path.join(
+        archive_dir, table, f"{day:%Y}", f"{day:%m}", f"{day:%d}.csv.gz"
+    )
+
+
+def _write_partitions(archive_dir: str, table: str, columns: List[str], rows) -> None:
+    by_day: Dict[date, list] = {}
+    for row in rows:
+        by_day.setdefault(row.created_at.date(), []).append(row)
+
+    for day, day_rows in by_day.items():
+        path = partition_path(archive_dir, table, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new_file = not os.path.exists(path)
+        # Appending adds a gzip member; readers see one continuous stream.
+        with gzip.open(path, "at", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            if new_file:
+                writer.writerow(columns)
+            for row in day_rows:
+                writer.writerow(
+                    [
+                        utc_text(value) if isinstance(value, datetime) else value
+                        for value in (getattr(row, col) for col in columns)
+                    ]
+                )
+
+
+def _expired(model, cutoff_text: str):
+    created = type_coerce(model.created_at, String)
+    if model is models.Alert and settings.alert_dedup_enabled:
+        # An episode can stay open, or be reopened within the suppression
+        # window, long after it was created
+        closed = type_coerce(model.closed_at, String)
+        return and_(created < cutoff_text, model.closed_at.is_not(None), closed < cutoff_text)
+    return created < cutoff_text
+
+
+def archive_and_purge(
+    db: Session,
+    table: str,
+    cutoff: datetime,
+    archive_dir: Optional[str] = None,
+    chunk_rows: Optional[int] = None,
+    pause_seconds: float = 0.0,
+) -> int:
+    """Export rows older than ``cutoff`` and delete them, chunk by chunk.
+
+    Returns the number of rows removed from the table.
+    """
+    model, columns = TABLES[table]
+    archive_dir = archive_dir or settings.retention_archive_dir
+    chunk_rows = chunk_rows or settings.retention_chunk_rows
+    expired = _expired(model, utc_text(cutoff))
+
+    removed = 0
+    while True:
+        rows = db.execute(
+            select(*[getattr(model, col) for col in columns])
+            .where(expired)
+            .order_by(model.id)
+            .limit(chunk_rows)
+        ).all()
+        if not rows:
+            break
+
+        _write_partitions(archive_dir, table, columns, rows)
+        with ingest.write_lock:
+            result = db.execute(
+                model.__table__.delete()
+                .where(model.id >= rows[0].id)
+                .where(model.id <= rows[-1].id)
+                .where(expired)
+            )
+            db.commit()
+        removed += result.rowcount or 0
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    return removed
+
+
+def prune_rollups(
+    db: Session,
+    granularity: int,
+    cutoff: datetime,
+    chunk_rows: Optional[int] = None,
+) -> int:
+    """Delete rollups of one granularity whose bucket starts before ``cutoff``."""
+    r = models.ReadingRollup
+    chunk_rows = chunk_rows or settings.retention_chunk_rows
+    cutoff_epoch = rollups.epoch_seconds(cutoff)
+
+    removed = 0
+    while True:
+        # Oldest chunk of buckets (uses the (granularity, bucket) index)
+        upper = db.execute(
+            select(r.bucket)
+            .where(r.granularity == granularity, r.bucket < cutoff_epoch)
+            .order_by(r.bucket)
+            .offset(chunk_rows - 1)
+            .limit(1)
+        ).scalar()
+        bound = cutoff_epoch if upper is None else upper + 1
+        with ingest.write_lock:
+            result = db.execute(
+                r.__table__.delete().where(r.granularity == granularity, r.bucket < bound)
+            )
+            db.commit()
+        removed += result.rowcount or 0
+        if upper is None:
+            break
+
+    return removed
+
+
+def run_retention(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Apply every configured TTL once; returns rows removed per tier."""
+    now = now or datetime.utcnow()
+    removed: Dict[str, int] = {}
+    pause = settings.retention_chunk_pause_seconds
+
+    if settings.retention_raw_days is not None:
+        removed["readings"] = archive_and_purge(
+            db, "readings", now - timedelta(days=settings.retention_raw_days),
+            pause_seconds=pause,
+        )
+    if settings.retention_alert_days is not None:
+        removed["alerts"] = archive_and_purge(
+            db, "alerts", now - timedelta(days=settings.retention_alert_days),
+            pause_seconds=pause,
+        )
+    if settings.retention_minute_rollup_days is not None:
+        removed["rollups_minute"] = prune_rollups(
+            db, rollups.MINUTE,
+            now - timedelta(days=settings.retention_minute_rollup_days),
+        )
+    if settings.retention_hour_rollup_days is not None:
+        removed["rollups_hour"] = prune_rollups(
+            db, rollups.HOUR,
+            now - timedelta(days=settings.retention_hour_rollup_days),
+        )
+
+    if any(removed.values()):
+        logger.info("Retention removed %s", removed)
+    return removed
+
+
+def _parse_row(table: str, row: dict) -> dict:
+    out: dict = dict(row)
+    out["id"] = int(row["id"])
+    out["created_at"] = datetime.fromisoformat(row["created_at"])
+    if table == "readings":
+        out["temperature"] = float(row["temperature"])
+        out["humidity"] = float(row["humidity"])
+        out["motion"] = row["motion"] == "True"
+    else:
+        out["emailed"] = row["emailed"] == "True"
+        # Archives written before alert episodes lack these columns
+        out["repeat_count"] = int(row.get("repeat_count") or 1)
+        for col in ("last_seen_at", "closed_at"):
+            out[col] = datetime.fromisoformat(row[col]) if row.get(col) else None
+    return out
+
+
+def read_archive(
+    table: str,
+    since: datetime,
+    until: datetime,
+    device_id: Optional[str] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[dict]:
+    """Yield archived rows with ``since <= created_at < until``, oldest first.
+
+    Only the day partitions overlapping the range are opened.
+    """
+    archive_dir = archive_dir or settings.retention_archive_dir
+    seen = set()
+    day = since.date()
+    while day <= until.date():
+        path = partition_path(archive_dir, table, day)
+        day += timedelta(days=1)
+        if not os.path.exists(path):
+            continue
+
+        with gzip.open(path, "rt", newline="", encoding="utf-8") as fh:
+            rows = [
+                _parse_row(table, raw)
+                for raw in csv.DictReader(fh)
+                if device_id is None or raw["device_id"] == device_id
+            ]
+        rows.sort(key=lambda r: r["id"])
+        for row in rows:
+            if row["id"] in seen or not since <= row["created_at"] < until:
+                continue
+            seen.add(row["id"])
+            yield row
+
+
+def query_range(
+    db: Session,
+    table: str,
+    since: datetime,
+    until: datetime,
+    device_id: Optional[str] = None,
+    archive_dir: Optional[str] = None,
+) -> Iterator[dict]:
+    """Rows in a time range from the archive and the live table, merged.
+
+    Callers do not need to know where the retention cutoff currently is.
+    """
+    model, columns = TABLES[table]
+    query = (
+        select(*[getattr(model, col) for col in columns])
+        .where(type_coerce(model.created_at, String) >= utc_text(since))
+        .where(type_coerce(model.created_at, String) < utc_text(until))
+        .order_by(model.id)
+    )
+    if device_id is not None:
+        query = query.where(model.device_id == device_id)
+    live = (dict(row._mapping) for row in db.execute(query))
+    archived = read_archive(table, since, until, device_id, archive_dir)
+
+    last_id = None
+    for row in heapq.merge(archived, live, key=lambda r: r["id"]):
+        if row["id"] != last_id:
+            yield row
+        last_id = row["id"]
+
+
+class RetentionWorker:
+    """Runs ``run_retention`` periodically on a background thread."""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _run(self) -> None:
+        from .database import SessionLocal
+
+        while not self._stop.wait(self.interval_seconds):
+            db = SessionLocal()
+            try:
+                run_retention(db)
+            except Exception as exc:
+                logger.error("Retention run failed: %s", exc)
+            finally:
+                db.close()
+
+
+def main():
+    from .database import Base, SessionLocal, engine
+    from .migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Retention and archive tools.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="Archive and purge data past its TTL")
+    query = sub.add_parser("query", help="Print rows from archive and database")
+    query.add_argument("--table", choices=sorted(TABLES), default="readings")
+    query.add_argument("--since", type=datetime.fromisoformat, required=True)
+    query.add_argument("--until", type=datetime.fromisoformat, required=True)
+    query.add_argument("--device-id")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        if args.command == "run":
+            print(run_retention(db))
+        else:
+            writer = csv.writer(sys.stdout)
+            columns = TABLES[args.table][1]
+            writer.writerow(columns)
+            for row in query_range(db, args.table, args.since, args.until, args.device_id):
+                writer.writerow([row[col] for col in columns])
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+"""Per-minute and per-hour rollups of readings.
+
+Each rollup row holds mergeable statistics (count, sum, sum of squares,
+min, max) for one device/location and time bucket, so any coarser bucket or
+range can be computed by adding rows together. Rollups are updated with an
+upsert in the same transaction as the readings they summarize. A rebuild
+recomputes them from ``readings``:
+
+    python -m app.rollups rebuild
+
+Rollups can outlive the raw readings (see app/retention.py), so a rebuild
+never reaches back past the oldest hour whose readings are all still there.
+"""
+import argparse
+import calendar
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Integer, String, cast, func, literal, select, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from . import models
+from .queries import utc_text
+
+MINUTE = 60
+HOUR = 3600
+GRANULARITIES = (MINUTE, HOUR)
+
+_STAT_COLUMNS = (
+    "count",
+    "temperature_sum", "temperature_sumsq", "temperature_min", "temperature_max",
+    "humidity_sum", "humidity_sumsq", "humidity_min", "humidity_max",
+    "motion_count",
+)
+
+
+def epoch_seconds(value: datetime) -> int:
+    return calendar.timegm(value.utctimetuple())
+
+
+def _stats_for(reading: models.Reading) -> dict:
+    t, h = reading.temperature, reading.humidity
+    return {
+        "count": 1,
+        "temperature_sum": t,
+        "temperature_sumsq": t * t,
+        "temperature_min": t,
+        "temperature_max": t,
+        "humidity_sum": h,
+        "humidity_sumsq": h * h,
+        "humidity_min": h,
+        "humidity_max": h,
+        "motion_count": 1 if reading.motion else 0,
+    }
+
+
+def _merge(into: dict, other: dict) -> None:
+    for key in ("count", "temperature_sum", "temperature_sumsq",
+                "humidity_sum", "humidity_sumsq", "motion_count"):
+        into[key] += other[key]
+    for key in ("temperature_min", "humidity_min"):
+        into[key] = min(into[key], other[key])
+    for key in ("temperature_max", "humidity_max"):
+        into[key] = max(into[key], other[key])
+
+
+def apply_readings(db: Session, readings: Iterable[models.Reading]) -> None:
+    """Fold flushed readings into the minute and hour rollups.
+
+    Readings are pre-aggregated per bucket in Python, so a batch costs one
+    upsert per (granularity, device, location, bucket) touched.
+    """
+    groups: Dict[Tuple[int, str, str, int], dict] = {}
+    for reading in readings:
+        ts = epoch_seconds(reading.created_at)
+        stats = _stats_for(reading)
+        for granularity in GRANULARITIES:
+            key = (granularity, reading.device_id, reading.location,
+                   ts - ts % granularity)
+            if key in groups:
+                _merge(groups[key], stats)
+            else:
+                groups[key] = dict(stats)
+
+    if not groups:
+        return
+
+    rows = [
+        dict(granularity=g, device_id=d, location=loc, bucket=b, **stats)
+        for (g, d, loc, b), stats in groups.items()
+    ]
+    table = models.ReadingRollup.__table__
+    stmt = sqlite_insert(table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["granularity", "device_id", "location", "bucket"],
+        set_={
+            "count": table.c.count + excluded.count,
+            "temperature_sum": table.c.temperature_sum + excluded.temperature_sum,
+            "temperature_sumsq": table.c.temperature_sumsq + excluded.temperature_sumsq,
+            "temperature_min": func.min(table.c.temperature_min, excluded.temperature_min),
+            "temperature_max": func.max(table.c.temperature_max, excluded.temperature_max),
+            "humidity_sum": table.c.humidity_sum + excluded.humidity_sum,
+            "humidity_sumsq": table.c.humidity_sumsq + excluded.humidity_sumsq,
+            "humidity_min": func.min(table.c.humidity_min, excluded.humidity_min),
+            "humidity_max": func.max(table.c.humidity_max, excluded.humidity_max),
+            "motion_count": table.c.motion_count + excluded.motion_count,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def granularity_for(bucket_seconds: int) -> Optional[int]:
+    """Coarsest rollup whose buckets tile ``bucket_seconds`` exactly."""
+    for granularity in sorted(GRANULARITIES, reverse=True):
+        if bucket_seconds % granularity == 0:
+            return granularity
+    return None
+
+
+def aggregate_series(
+    db: Session,
+    granularity: int,
+    since: datetime,
+    until: datetime,
+    bucket_seconds: int,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+) -> List[dict]:
+    """Same output as ``timeseries.raw_aggregate_series``, read from rollups.
+
+    ``since`` is effectively rounded down to the rollup granularity.
+    """
+    r = models.ReadingRollup
+    start = epoch_seconds(since)
+    start -= start % granularity
+    bucket = (r.bucket // bucket_seconds).label("bucket")
+    count = func.sum(r.count)
+
+    query = (
+        db.query(
+            bucket,
+            count,
+            func.min(r.temperature_min),
+            func.sum(r.temperature_sum),
+            func.sum(r.temperature_sumsq),
+            func.max(r.temperature_max),
+            func.min(r.humidity_min),
+            func.sum(r.humidity_sum),
+            func.sum(r.humidity_sumsq),
+            func.max(r.humidity_max),
+            func.sum(r.motion_count),
+        )
+        .filter(r.granularity == granularity)
+        .filter(r.bucket >= start)
+        .filter(r.bucket < epoch_seconds(until))
+    )
+    if device_id:
+        query = query.filter(r.device_id == device_id)
+    if location:
+        query = query.filter(r.location == location)
+
+    return [
+        bucket_from_sums(row[0] * bucket_seconds, *row[1:])
+        for row in query.group_by(bucket).order_by(bucket).all()
+    ]
+
+
+def _std(total: float, sumsq: float, count: int) -> float:
+    mean = total / count
+    return max(0.0, sumsq / count - mean * mean) ** 0.5
+
+
+def bucket_from_sums(
+    start: int, count: int,
+    t_min: float, t_sum: float, t_sumsq: float, t_max: float,
+    h_min: float, h_sum: float, h_sumsq: float, h_max: float,
+    motion: int,
+) -> dict:
+    return {
+        "start": datetime.utcfromtimestamp(start),
+        "count": count,
+        "temperature_min": t_min,
+        "temperature_avg": t_sum / count,
+        "temperature_max": t_max,
+        "temperature_std": _std(t_sum, t_sumsq, count),
+        "humidity_min": h_min,
+        "humidity_avg": h_sum / count,
+        "humidity_max": h_max,
+        "humidity_std": _std(h_sum, h_sumsq, count),
+        "motion_count": motion or 0,
+    }
+
+
+def rebuild_statements(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List:
+    """DELETE + INSERT ... SELECT statements that recompute the rollups.
+
+    With ``since``/``until`` only the buckets inside that range are rebuilt
+    (bounds are rounded down to whole hours).
+    """
+    r = models.Reading
+    table = models.ReadingRollup.__table__
+    epoch = cast(func.strftime("%s", r.created_at), Integer)
+
+    start = end = None
+    if since is not None:
+        start = epoch_seconds(since)
+        start -= start % HOUR
+    if until is not None:
+        end = epoch_seconds(until)
+        end -= end % HOUR
+
+    statements = []
+    for granularity in GRANULARITIES:
+        delete = table.delete().where(table.c.granularity == granularity)
+        if start is not None:
+            delete = delete.where(table.c.bucket >= start)
+        if end is not None:
+            delete = delete.where(table.c.bucket < end)
+        statements.append(delete)
+
+        bucket = (epoch // granularity) * granularity
+        source = select(
+            literal(granularity),
+            r.device_id,
+            r.location,
+            bucket,
+            func.count(r.id),
+            func.sum(r.temperature),
+            func.sum(r.temperature * r.temperature),
+            func.min(r.temperature),
+            func.max(r.temperature),
+            func.sum(r.humidity),
+            func.sum(r.humidity * r.humidity),
+            func.min(r.humidity),
+            func.max(r.humidity),
+            func.sum(cast(r.motion, Integer)),
+        ).where(r.device_id.is_not(None), r.location.is_not(None))
+        if start is not None:
+            source = source.where(
+                type_coerce(r.created_at, String)
+                >= utc_text(datetime.utcfromtimestamp(start))
+            )
+        if end is not None:
+            source = source.where(
+                type_coerce(r.created_at, String)
+                < utc_text(datetime.utcfromtimestamp(end))
+            )
+        source = source.group_by(r.device_id, r.location, bucket)
+        statements.append(
+            table.insert().from_select(
+                ["granularity", "device_id", "location", "bucket", *_STAT_COLUMNS],
+                source,
+            )
+        )
+    return statements
+
+
+def backfill(conn: Connection) -> None:
+    """Migration step: build rollups for a database that predates them."""
+    for statement in rebuild_statements():
+        conn.execute(statement)
+
+
+def retained_since(db: Session) -> Optional[datetime]:
+    """Start of the oldest hour that ``readings`` still fully covers.
+
+    None when there are no readings at all. Rollups older than the oldest
+    reading mean retention has purged raw data, and possibly part of that
+    reading's hour too, so in that case the hour after it is returned.
+    """
+    oldest = db.scalar(select(func.min(models.Reading.created_at)))
+    if oldest is None:
+        return None
+    exact = epoch_seconds(oldest)
+    start = exact - exact % HOUR
+    r = models.ReadingRollup
+    purged = db.scalar(select(r.bucket).where(r.bucket < start).limit(1))
+    if purged is not None and start != exact:
+        start += HOUR
+    return datetime.utcfromtimestamp(start)
+
+
+def rebuild(
+    db: Session,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> int:
+    """Recompute rollups from ``readings``; returns the rollup rows written.
+
+    ``since`` is clamped to ``retained_since``: rollups older than that
+    cannot be recomputed and are left as they are.
+    """
+    floor = retained_since(db)
+    if floor is None:
+        return 0
+    if since is None or since < floor:
+        since = floor
+    if until is not None and until <= since:
+        return 0
+    written = 0
+    for statement in rebuild_statements(since, until):
+        result = db.execute(statement)
+        if statement.is_insert:
+            written += result.rowcount or 0
+    db.commit()
+    return written
+
+
+def main():
+    from .database import Base, SessionLocal, engine
+    from .migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Maintain reading rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("rebuild", help="Backfill rollups from the readings table")
+    cmd.add_argument("--since", type=datetime.fromisoformat)
+    cmd.add_argument("--until", type=datetime.fromisoformat)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    db = SessionLocal()
+    try:
+        floor = retained_since(db)
+        written = rebuild(db, args.since, args.until)
+    finally:
+        db.close()
+    if floor is None:
+        print("No readings to rebuild from; rollups left as they are.")
+        return
+    if args.since is None or args.since < floor:
+        print(f"Rollups before {floor.isoformat()} kept as they are "
+              f"(no complete raw readings for them).")
+    print(f"Rebuilt {written} rollup rows.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Data-driven alert rules compiled into a per-scope evaluation plan.
+
+A rule is data: a metric, an operator and threshold, an optional
+device/location scope, an optional schedule window (UTC hours) and a
+message template. The built-in rules are generated from the thresholds in
+``Settings``; more can be loaded from a JSON file (``RULES_FILE``)
+containing a list of rule objects, e.g.
+
+    [{"alert_type": "FREEZER_WARM", "metric": "temperature", "operator": ">",
+      "threshold": -15, "location": "freezer",
+      "message": "Freezer at {value:.1f}°C ({device_id})"}]
+
+``RulePlan`` compiles the rules once: each becomes a closure over its
+threshold, and the rules that apply to a (device_id, location) pair are
+resolved on first sight of that pair and cached. Evaluating a reading is
+then a single pass over only the rules in its scope.
+
+Besides the reading's own fields, a rule's metric can be one of the rolling
+metrics from ``app/anomaly.py`` (``temperature_rate``, ``humidity_zscore``,
+``temperature_stuck``, ...); the built-in rules over those are enabled with
+``ANOMALY_RULES_ENABLED``.
+"""
+import json
+import operator
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Literal, Optional, Sequence, Set, Tuple, Union
+
+from pydantic import BaseModel, model_validator
+
+from . import anomaly
+from .config import settings
+
+Operator = Literal[">", ">=", "<", "<=", "==", "!=", "outside", "between"]
+# Raw reading fields plus the rolling metrics derived in app/anomaly.py
+Metric = Literal[
+    "temperature", "humidity", "motion",
+    "temperature_rate", "temperature_zscore", "temperature_stuck",
+    "humidity_rate", "humidity_zscore", "humidity_stuck",
+]
+
+_COMPARISONS: Dict[str, Callable] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class Rule(BaseModel):
+    alert_type: str
+    metric: Metric
+    operator: Operator
+    threshold: Union[float, Tuple[float, float]]
+    message: str
+    device_id: Optional[str] = None
+    location: Optional[str] = None
+    # Active when start_hour <= hour < end_hour (UTC); may wrap midnight
+    start_hour: Optional[int] = None
+    end_hour: Optional[int] = None
+    # An open alert only clears once the value is this far back inside the
+    # threshold (outside the hour window the rule always counts as clear)
+    hysteresis: float = 0.0
+
+    @model_validator(mode="after")
+    def _check_threshold(self) -> "Rule":
+        is_range = self.operator in ("outside", "between")
+        if is_range != isinstance(self.threshold, tuple):
+            raise ValueError(
+                f"operator {self.operator!r} needs "
+                f"{'a [low, high] pair' if is_range else 'a single number'}"
+            )
+        if (self.start_hour is None) != (self.end_hour is None):
+            raise ValueError("start_hour and end_hour must be set together")
+        return self
+
+
+def default_rules() -> List[Rule]:
+    """The built-in rules, from the thresholds in settings."""
+    rules = [
+        Rule(
+            alert_type="HIGH_TEMP",
+            metric="temperature",
+            operator=">",
+            threshold=settings.temp_high_threshold,
+            hysteresis=settings.temp_hysteresis,
+            message="High temperature {value:.1f}°C at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="HUMIDITY",
+            metric="humidity",
+            operator="outside",
+            threshold=(settings.humidity_low_threshold, settings.humidity_high_threshold),
+            hysteresis=settings.humidity_hysteresis,
+            message="Abnormal humidity {value:.1f}% at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="MOTION_NIGHT",
+            metric="motion",
+            operator="==",
+            threshold=1,
+            start_hour=settings.night_start_hour,
+            end_hour=settings.night_end_hour,
+            message="Motion detected at night at {location} ({device_id})",
+        ),
+    ]
+    if settings.anomaly_rules_enabled:
+        rules.extend(anomaly_rules())
+    return rules
+
+
+def anomaly_rules() -> List[Rule]:
+    """Built-in rules over the rolling metrics from app/anomaly.py."""
+    z = settings.anomaly_zscore_threshold
+    temp_rate = settings.anomaly_temp_rate_per_minute
+    humidity_rate = settings.anomaly_humidity_rate_per_minute
+    return [
+        Rule(
+            alert_type="RAPID_TEMP_CHANGE",
+            metric="temperature_rate",
+            operator="outside",
+            threshold=(-temp_rate, temp_rate),
+            message="Temperature changing {value:+.1f}°C/min at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="RAPID_HUMIDITY_CHANGE",
+            metric="humidity_rate",
+            operator="outside",
+            threshold=(-humidity_rate, humidity_rate),
+            message="Humidity changing {value:+.1f}%/min at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="TEMP_ANOMALY",
+            metric="temperature_zscore",
+            operator="outside",
+            threshold=(-z, z),
+            hysteresis=1.0,
+            message="Temperature {value:+.1f} std devs from its rolling mean at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="HUMIDITY_ANOMALY",
+            metric="humidity_zscore",
+            operator="outside",
+            threshold=(-z, z),
+            hysteresis=1.0,
+            message="Humidity {value:+.1f} std devs from its rolling mean at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="STUCK_TEMPERATURE",
+            metric="temperature_stuck",
+            operator=">=",
+            threshold=settings.anomaly_stuck_count,
+            message="Temperature sensor unchanged for {value:.0f} readings at {location} ({device_id})",
+        ),
+        Rule(
+            alert_type="STUCK_HUMIDITY",
+            metric="humidity_stuck",
+            operator=">=",
+            threshold=settings.anomaly_stuck_count,
+            message="Humidity sensor unchanged for {value:.0f} readings at {location} ({device_id})",
+        ),
+    ]
+
+
+def load_rules() -> List[Rule]:
+    rules = default_rules() if settings.rules_include_defaults else []
+    if settings.rules_file:
+        with open(settings.rules_file, encoding="utf-8") as fh:
+            rules.extend(Rule.model_validate(item) for item in json.load(fh))
+    return rules
+
+
+def _hours(start: int, end: int) -> frozenset:
+    if start < end:
+        return frozenset(range(start, min(end, 24)))
+    # window crosses midnight (e.g. 22–06)
+    return frozenset(h for h in range(24) if h >= start or h < end)
+
+
+class CompiledRule:
+    __slots__ = ("rule", "metric", "test", "clear", "hours")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.metric = rule.metric
+        self.hours = (
+            None if rule.start_hour is None else _hours(rule.start_hour, rule.end_hour)
+        )
+        band = rule.hysteresis
+        if rule.operator == "outside":
+            low, high = rule.threshold
+            self.test = lambda v: v < low or v > high
+            self.clear = lambda v: low + band <= v <= high - band
+        elif rule.operator == "between":
+            low, high = rule.threshold
+            self.test = lambda v: low <= v <= high
+            self.clear = lambda v: v < low - band or v > high + band
+        else:
+            compare, threshold = _COMPARISONS[rule.operator], rule.threshold
+            self.test = lambda v: compare(v, threshold)
+            if rule.operator in (">", ">="):
+                self.clear = lambda v: v < threshold - band
+            elif rule.operator in ("<", "<="):
+                self.clear = lambda v: v > threshold + band
+            else:
+                self.clear = lambda v: not compare(v, threshold)
+
+    def message(self, reading, value) -> str:
+        return self.rule.message.format(
+            value=value,
+            device_id=reading.device_id,
+            location=reading.location,
+            alert_type=self.rule.alert_type,
+            threshold=self.rule.threshold,
+        )
+
+
+class RulePlan:
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        # Readings only need to go through the anomaly tracker if some rule
+        # looks at a derived metric.
+        self.uses_derived = any(
+            rule.metric in anomaly.DERIVED_METRICS for rule in self.rules
+        )
+        # Rules keyed by scope; the position keeps evaluation in file order.
+        self._scoped: Dict[Tuple[Optional[str], Optional[str]], List[Tuple[int, CompiledRule]]] = {}
+        for position, rule in enumerate(self.rules):
+            self._scoped.setdefault((rule.device_id, rule.location), []).append(
+                (position, CompiledRule(rule))
+            )
+        self._cache: Dict[Tuple[str, str], Tuple[CompiledRule, ...]] = {}
+
+    def rules_for(self, device_id: str, location: str) -> Tuple[CompiledRule, ...]:
+        key = (device_id, location)
+        cached = self._cache.get(key)
+        if cached is None:
+            matching = []
+            for scope in ((None, None), (device_id, None), (None, location), key):
+                matching.extend(self._scoped.get(scope, ()))
+            cached = tuple(compiled for _, compiled in sorted(matching, key=lambda m: m[0]))
+            self._cache[key] = cached
+        return cached
+
+    def assess(
+        self, reading, now: datetime
+    ) -> Tuple[List[Tuple[str, str]], Set[str]]:
+        """Triggered (alert_type, message) pairs and alert types now clear.
+
+        A type is clear when none of its rules triggered and at least one is
+        back past its hysteresis band; in between it is neither.
+        """
+        hour = now.hour
+        triggered: List[Tuple[str, str]] = []
+        cleared: Set[str] = set()
+        for compiled in self.rules_for(reading.device_id, reading.location):
+            alert_type = compiled.rule.alert_type
+            if compiled.hours is not None and hour not in compiled.hours:
+                cleared.add(alert_type)
+                continue
+            value = getattr(reading, compiled.metric)
+            if value is None:
+                # Derived metric without enough history yet
+                continue
+            if compiled.test(value):
+                triggered.append((alert_type, compiled.message(reading, value)))
+            elif compiled.clear(value):
+                cleared.add(alert_type)
+        if triggered and cleared:
+            cleared.difference_update(alert_type for alert_type, _ in triggered)
+        return triggered, cleared
+
+    def evaluate(self, reading, now: datetime) -> List[Tuple[str, str]]:
+        """Triggered (alert_type, message) pairs for one reading."""
+        return self.assess(reading, now)[0]
+
+
+_plan: Optional[RulePlan] = None
+_plan_lock = threading.Lock()
+
+
+def get_plan() -> RulePlan:
+    global _plan
+    if _plan is None:
+        with _plan_lock:
+            if _plan is None:
+                _plan = RulePlan(load_rules())
+    return _plan
+
+
+def reload_plan() -> RulePlan:
+    """Recompile the rules, e.g. after changing thresholds or the rules file."""
+    global _plan
+    with _plan_lock:
+        _plan = RulePlan(load_rules())
+    return _plan
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -32,6 +32,10 @@ class AlertOut(BaseModel):
     message: str
     emailed: bool
     created_at: datetime
+    repeat_count: int = 1
+    last_seen_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -40,9 +44,100 @@ class ReadingWithAlerts(BaseModel):
     reading: ReadingOut
     alerts: List[AlertOut]
 
+
+class IngestAccepted(BaseModel):
+    sequence: int
+    count: int
+
+
+class IngestStatusOut(BaseModel):
+    mode: str
+    durability: str
+    depth: int
+    capacity: int
+    last_sequence: int
+    committed_sequence: int
+    groups_written: int
+    rejected: int
+    failed: int
+    failed_readings: int
+    recent_failures: List[int]
+
+
+class AdmissionClassOut(BaseModel):
+    in_flight: int
+    waiting: int
+    max_concurrent: int
+    rejected: Dict[str, int]
+
+
+class AdmissionOut(BaseModel):
+    enabled: bool
+    max_concurrent: int
+    max_queued: int
+    queue_timeout_seconds: float
+    device_rate_limit_per_second: Optional[float]
+    device_rate_limit_burst: float
+    classes: Dict[str, AdmissionClassOut]
+
 class EmailRecordOut(BaseModel):
     id: int
     to_address: str
     subject: str
     body: str
     sent_at: datetime
+
+
+class SeriesBucket(BaseModel):
+    start: datetime
+    count: int
+    temperature_min: float
+    temperature_avg: float
+    temperature_max: float
+    temperature_std: float
+    humidity_min: float
+    humidity_avg: float
+    humidity_max: float
+    humidity_std: float
+    motion_count: int
+
+
+class SeriesPoint(BaseModel):
+    created_at: datetime
+    temperature: float
+    humidity: float
+    motion: bool
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class SeriesOut(BaseModel):
+    device_id: Optional[str] = None
+    location: Optional[str] = None
+    since: datetime
+    until: datetime
+    mode: Literal["aggregate", "lttb"]
+    # Set in aggregate mode
+    bucket_seconds: Optional[int] = None
+    buckets: List[SeriesBucket] = []
+    # Set in lttb mode: raw readings chosen to preserve the curve's shape.
+    # truncated: the range held more than series_max_raw_rows readings and
+    # only the newest of them were used
+    points: List[SeriesPoint] = []
+    truncated: bool = False
+
+
+class DeviceOut(BaseModel):
+    device_id: str
+    location: Optional[str] = None
+    first_seen_at: datetime
+    last_seen_at: datetime
+    last_reading_id: int
+    temperature: float
+    humidity: float
+    motion: bool
+    reading_count: int
+    open_alert_count: int
+    stale: bool = False
+
+    model_config = ConfigDict(from_attributes=True)
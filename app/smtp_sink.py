@@ -0,0 +1,162 @@
+"""A tiny asyncio SMTP server that accepts and stores messages in memory.
+
+It stands in for a real mail relay so email delivery can be exercised
+offline, in tests or during local development:
+
+    python -m app.smtp_sink --port 1025
+
+then run the backend with ``ENABLE_EMAIL=true SMTP_HOST=127.0.0.1
+SMTP_PORT=1025 SMTP_STARTTLS=false``.
+"""
+import argparse
+import asyncio
+import threading
+from email import message_from_bytes
+from email.message import Message
+from typing import List, Optional, Tuple
+
+
+class SMTPSink:
+    """In-memory SMTP server running on a background event loop.
+
+    ``fail_next(n)`` makes the next ``n`` messages fail with a transient
+    error at the end of DATA, and ``delay`` slows every message down, to
+    simulate a flaky or slow relay.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.messages: List[Message] = []
+        self.connections = 0
+        self.rejected = 0
+        self._fail_remaining = 0
+        self._fail_code = 451
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def fail_next(self, count: int, code: int = 451) -> None:
+        with self._lock:
+            self._fail_remaining = count
+            self._fail_code = code
+
+    def start(self) -> Tuple[str, int]:
+        ready = threading.Event()
+
+        def run() -> None:
+            self._loop = asyncio.new_event_loop()
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.host, self.port
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "SMTPSink":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _take_failure(self) -> Optional[int]:
+        with self._lock:
+            if self._fail_remaining > 0:
+                self._fail_remaining -= 1
+                self.rejected += 1
+                return self._fail_code
+        return None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        with self._lock:
+            self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 smtp-sink ready")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command = raw.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    await reply("250-smtp-sink")
+                    await reply("250 8BITMIME")
+                elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    lines = []
+                    while True:
+                        line = await reader.readline()
+                        if not line or line == b".\r\n":
+                            break
+                        if line.startswith(b".."):
+                            line = line[1:]
+                        lines.append(line)
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                    code = self._take_failure()
+                    if code is not None:
+                        await reply(f"{code} Simulated failure")
+                    else:
+                        with self._lock:
+                            self.messages.append(message_from_bytes(b"".join(lines)))
+                        await reply("250 Message accepted")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SMTP sink for testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port)
+    host, port = sink.start()
+    print(f"SMTP sink listening on {host}:{port}. Press Ctrl+C to stop.")
+    seen = 0
+    try:
+        while True:
+            sink._thread.join(timeout=1)
+            for msg in sink.messages[seen:]:
+                print(f"[{msg['To']}] {msg['Subject']}")
+            seen = len(sink.messages)
+    except KeyboardInterrupt:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
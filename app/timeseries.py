@@ -0,0 +1,170 @@
+"""Downsampled time series for charts.
+
+``aggregate_series`` buckets readings in SQL (min/avg/max per bucket), so the
+response size depends on the number of buckets, not on how many rows fall
+in the range. Bucket widths that are whole minutes or hours are served from
+the rollup tables instead of scanning ``readings``. ``lttb`` is a shape-preserving alternative that picks
+representative raw points (Largest-Triangle-Three-Buckets).
+"""
+import math
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import Integer, String, cast, func, type_coerce
+from sqlalchemy.orm import Session
+
+from . import models, rollups
+from .config import settings
+from .queries import utc_text
+
+# Bucket widths (seconds) that line up with wall-clock minutes and hours
+NICE_WIDTHS = [
+    1, 2, 5, 10, 15, 30,
+    60, 120, 300, 600, 900, 1800,
+    3600, 7200, 10800, 21600, 43200, 86400,
+]
+
+
+def resolve_range(
+    since: Optional[datetime],
+    until: Optional[datetime],
+    default_hours: float,
+) -> tuple:
+    """Fill in defaults and normalize both ends to naive UTC."""
+    def naive_utc(value: datetime) -> datetime:
+        if value.tzinfo is None:
+            return value
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    until = naive_utc(until) if until else datetime.utcnow()
+    since = naive_utc(since) if since else until - timedelta(hours=default_hours)
+    return since, until
+
+
+def choose_bucket_seconds(since: datetime, until: datetime, points: int) -> int:
+    """Smallest "nice" bucket width giving at most ``points`` buckets."""
+    span = max(1.0, (until - since).total_seconds())
+    target = span / max(1, points)
+    for width in NICE_WIDTHS:
+        if width >= target:
+            return width
+    return int(math.ceil(target / 86400)) * 86400
+
+
+def aggregate_series(
+    db: Session,
+    since: datetime,
+    until: datetime,
+    bucket_seconds: int,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+) -> List[dict]:
+    """Bucketed stats, read from the coarsest rollup that fits when possible."""
+    granularity = rollups.granularity_for(bucket_seconds)
+    if settings.rollups_enabled and granularity is not None:
+        return rollups.aggregate_series(
+            db, granularity, since, until, bucket_seconds, device_id, location
+        )
+    return raw_aggregate_series(db, since, until, bucket_seconds, device_id, location)
+
+
+def raw_aggregate_series(
+    db: Session,
+    since: datetime,
+    until: datetime,
+    bucket_seconds: int,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+) -> List[dict]:
+    r = models.Reading
+    epoch = cast(func.strftime("%s", r.created_at), Integer)
+    bucket = (epoch // bucket_seconds).label("bucket")
+
+    query = (
+        db.query(
+            bucket,
+            func.count(r.id),
+            func.min(r.temperature),
+            func.sum(r.temperature),
+            func.sum(r.temperature * r.temperature),
+            func.max(r.temperature),
+            func.min(r.humidity),
+            func.sum(r.humidity),
+            func.sum(r.humidity * r.humidity),
+            func.max(r.humidity),
+            func.sum(cast(r.motion, Integer)),
+        )
+        .filter(type_coerce(r.created_at, String) >= utc_text(since))
+        .filter(type_coerce(r.created_at, String) < utc_text(until))
+    )
+    if device_id:
+        query = query.filter(r.device_id == device_id)
+    if location:
+        query = query.filter(r.location == location)
+
+    return [
+        rollups.bucket_from_sums(row[0] * bucket_seconds, *row[1:])
+        for row in query.group_by(bucket).order_by(bucket).all()
+    ]
+
+
+def raw_series(
+    db: Session,
+    since: datetime,
+    until: datetime,
+    device_id: Optional[str] = None,
+    location: Optional[str] = None,
+    max_rows: int = 200_000,
+) -> Tuple[List[models.Reading], bool]:
+    """Readings in the range, oldest first, and whether it was cut short.
+
+    Over ``max_rows`` the newest ``max_rows`` are kept, since the recent end
+    of the range is the part being looked at.
+    """
+    r = models.Reading
+    query = (
+        db.query(r)
+        .filter(type_coerce(r.created_at, String) >= utc_text(since))
+        .filter(type_coerce(r.created_at, String) < utc_text(until))
+    )
+    if device_id:
+        query = query.filter(r.device_id == device_id)
+    if location:
+        query = query.filter(r.location == location)
+    rows = query.order_by(r.id.desc()).limit(max_rows + 1).all()
+    truncated = len(rows) > max_rows
+    return rows[:max_rows][::-1], truncated
+
+
+def lttb(xs: Sequence[float], ys: Sequence[float], threshold: int) -> List[int]:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets."""
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        avg_start = int(math.floor((i + 1) * every)) + 1
+        avg_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        count = avg_end - avg_start
+        avg_x = sum(xs[avg_start:avg_end]) / count
+        avg_y = sum(ys[avg_start:avg_end]) / count
+
+        range_start = int(math.floor(i * every)) + 1
+        range_end = int(math.floor((i + 1) * every)) + 1
+        ax, ay = xs[a], ys[a]
+        best, best_area = range_start, -1.0
+        for j in range(range_start, range_end):
+            area = abs(
+                (ax - avg_x) * (ys[j] - ay) - (ax - xs[j]) * (avg_y - ay)
+            )
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+
+    selected.append(n - 1)
+    return selected
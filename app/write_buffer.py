@@ -0,0 +1,220 @@
+"""Write-behind ingest buffer with group commit (``INGEST_MODE=buffered``).
+
+The ingest endpoints validate the payload and append it to a bounded
+in-process buffer; a single writer thread drains the buffer in groups of up
+to ``ingest_flush_max_rows`` readings, or whatever arrived within
+``ingest_flush_interval_ms`` of the first one, and stores each group with
+one ``ingest_readings`` call: one transaction, one commit, rules evaluated
+for the whole batch. Under load that turns one fsync per request into one
+per group.
+
+Every request gets a sequence number, and groups commit in sequence order.
+``committed_sequence`` is the newest request that is on disk; it only moves
+forward over requests that were written. A request that cannot be stored
+(a failed group is retried request by request first) is counted in
+``failed``/``failed_readings`` and its number kept in ``recent_failures``,
+so a request at or below the watermark is on disk unless it is listed
+there.
+
+``ingest_durability`` decides when the client is answered:
+
+* ``enqueue``: right away with 202 and the sequence number. Anything still
+  in the buffer is lost if the process dies; a clean shutdown drains it.
+  Requests that fail to store are dropped and logged.
+* ``commit``: once the request's group has committed, with the usual
+  response. Concurrent requests still share commits.
+
+The writer starts with the app, or with the first request if it was not
+running. Once ``stop`` has begun draining, new requests are refused with
+``BufferClosed`` until the writer is started again.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+from . import ingest, models, schemas
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger("iot_alerts.ingest")
+
+RECENT_FAILURES = 100
+
+
+class BufferFull(Exception):
+    """The buffer has no room for the request; retry later."""
+
+
+class BufferClosed(Exception):
+    """The writer is shutting down and takes no more requests."""
+
+
+class Entry:
+    """One request's readings and, once written, its outcome."""
+
+    __slots__ = ("sequence", "payloads", "results", "error", "_done")
+
+    def __init__(self, sequence: int, payloads: Sequence[schemas.ReadingCreate]):
+        self.sequence = sequence
+        self.payloads = payloads
+        self.results: Optional[List[Tuple[models.Reading, List[models.Alert]]]] = None
+        self.error: Optional[BaseException] = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def finish(self, results=None, error: Optional[BaseException] = None) -> None:
+        self.results = results
+        self.error = error
+        self._done.set()
+
+
+class WriteBuffer:
+    def __init__(
+        self,
+        capacity: int = settings.ingest_buffer_rows,
+        flush_interval_ms: float = settings.ingest_flush_interval_ms,
+        flush_max_rows: int = settings.ingest_flush_max_rows,
+    ):
+        self.capacity = capacity
+        self.flush_interval = flush_interval_ms / 1000
+        self.flush_max_rows = flush_max_rows
+        self.last_sequence = 0
+        self.committed_sequence = 0
+        self.groups_written = 0
+        self.rejected = 0
+        self.failed = 0
+        self.failed_readings = 0
+        self.recent_failures: Deque[int] = deque(maxlen=RECENT_FAILURES)
+        self._entries: Deque[Entry] = deque()
+        self._rows = 0
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def depth(self) -> int:
+        """Readings waiting to be written."""
+        return self._rows
+
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._run, name="ingest-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Write everything still buffered, then stop the writer."""
+        with self._cond:
+            thread = self._thread
+            if thread is None:
+                return
+            self._stopping = True
+            self._cond.notify_all()
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.error("Ingest writer did not drain within %.0fs", timeout)
+        self._thread = None
+
+    def submit(self, payloads: Sequence[schemas.ReadingCreate]) -> Entry:
+        """Queue readings; raises ``BufferFull`` instead of blocking, and
+        ``BufferClosed`` once ``stop`` was called."""
+        with self._cond:
+            if self._stopping:
+                raise BufferClosed()
+            if self._thread is None:
+                self.start()
+            if self._rows + len(payloads) > self.capacity:
+                self.rejected += 1
+                raise BufferFull()
+            self.last_sequence += 1
+            entry = Entry(self.last_sequence, payloads)
+            self._entries.append(entry)
+            self._rows += len(payloads)
+            self._cond.notify()
+        return entry
+
+    def _take_group(self) -> List[Entry]:
+        with self._cond:
+            while not self._entries:
+                if self._stopping:
+                    return []
+                self._cond.wait()
+            # Give the group up to flush_interval to fill up, unless it is
+            # already big enough or we are draining for shutdown.
+            deadline = time.monotonic() + self.flush_interval
+            while self._rows < self.flush_max_rows and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            group, rows = [], 0
+            while self._entries:
+                entry = self._entries[0]
+                if group and rows + len(entry.payloads) > self.flush_max_rows:
+                    break
+                self._entries.popleft()
+                group.append(entry)
+                rows += len(entry.payloads)
+            self._rows -= rows
+            return group
+
+    def _run(self) -> None:
+        while True:
+            group = self._take_group()
+            if not group:
+                return
+            self._write(group)
+            self.groups_written += 1
+            for entry in group:
+                if entry.error is None:
+                    self.committed_sequence = entry.sequence
+                    continue
+                self.failed += 1
+                self.failed_readings += len(entry.payloads)
+                self.recent_failures.append(entry.sequence)
+
+    def _write(self, group: List[Entry]) -> None:
+        db = None
+        try:
+            payloads = [p for entry in group for p in entry.payloads]
+            try:
+                db = SessionLocal()
+                results = ingest.ingest_readings(db, payloads)
+            except Exception as exc:
+                if len(group) == 1:
+                    logger.error("Buffered ingest of request %d failed, "
+                                 "%d readings not stored: %s", group[0].sequence,
+                                 len(group[0].payloads), exc)
+                    group[0].finish(error=exc)
+                    return
+                # Retry request by request so one bad request does not take
+                # the rest of the group down with it
+                logger.warning("Group commit of %d requests failed (%s); "
+                               "retrying one by one", len(group), exc)
+                for entry in group:
+                    self._write([entry])
+                return
+
+            start = 0
+            for entry in group:
+                end = start + len(entry.payloads)
+                entry.finish(results[start:end])
+                start = end
+        finally:
+            if db is not None:
+                db.close()
+
+
+buffer = WriteBuffer()
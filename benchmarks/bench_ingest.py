@@ -0,0 +1,80 @@
+"""Compare ingest throughput of POST /api/readings and /api/readings/batch.
+
+Runs the FastAPI app in-process against a throwaway SQLite database:
+
+    python benchmarks/bench_ingest.py --readings 2000 --batch-size 50
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def generate_reading(device_id: str, location: str) -> dict:
+    return {
+        "device_id": device_id,
+        "location": location,
+        "temperature": round(random.uniform(20.0, 35.0), 2),
+        "humidity": round(random.uniform(25.0, 80.0), 2),
+        "motion": random.random() < 0.3,
+    }
+
+
+def make_readings(count: int, devices: int) -> list:
+    return [
+        generate_reading(f"sensor-{i % devices + 1}", f"room-{i % devices + 1}")
+        for i in range(count)
+    ]
+
+
+def bench_single(client, readings: list) -> float:
+    start = time.perf_counter()
+    for reading in readings:
+        resp = client.post("/api/readings", json=reading)
+        resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def bench_batch(client, readings: list, batch_size: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(readings), batch_size):
+        resp = client.post("/api/readings/batch", json=readings[i:i + batch_size])
+        resp.raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--devices", type=int, default=10)
+    args = parser.parse_args()
+
+    # The app creates its database and log file relative to the working
+    # directory, so run it inside a scratch directory.
+    workdir = tempfile.mkdtemp(prefix="iot-bench-")
+    os.chdir(workdir)
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    readings = make_readings(args.readings, args.devices)
+
+    with TestClient(app) as client:
+        single = bench_single(client, readings)
+        batch = bench_batch(client, readings, args.batch_size)
+
+    print(f"readings: {args.readings}, batch size: {args.batch_size}")
+    print(f"single: {args.readings / single:10.1f} readings/s ({single:.2f}s)")
+    print(f"batch:  {args.readings / batch:10.1f} readings/s ({batch:.2f}s)")
+    print(f"speedup: {single / batch:.1f}x")
+    print(f"scratch directory: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Rule evaluation cost against the number of configured rules.
+
+Compares the compiled, scope-indexed RulePlan with a naive loop that checks
+every rule's scope and condition for every reading:
+
+    python benchmarks/bench_rules.py --readings 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_rules(count: int, devices: int):
+    from app import rules
+
+    generated = rules.default_rules()
+    for i in range(max(0, count - len(generated))):
+        scope = {"device_id": f"sensor-{i % devices}"} if i % 2 else {"location": f"room-{i % 20}"}
+        generated.append(rules.Rule(
+            alert_type=f"CUSTOM_{i}",
+            metric=random.choice(["temperature", "humidity"]),
+            operator=random.choice([">", "<"]),
+            threshold=random.uniform(20, 80),
+            message="{alert_type} {value:.1f} at {location} ({device_id})",
+            **scope,
+        ))
+    return generated
+
+
+def naive_evaluate(rule_list, reading, now):
+    triggered = []
+    for rule in rule_list:
+        if rule.device_id is not None and rule.device_id != reading.device_id:
+            continue
+        if rule.location is not None and rule.location != reading.location:
+            continue
+        if rule.start_hour is not None:
+            start, end = rule.start_hour, rule.end_hour
+            in_window = start <= now.hour < end if start < end else (now.hour >= start or now.hour < end)
+            if not in_window:
+                continue
+        value = getattr(reading, rule.metric)
+        if rule.operator == "outside":
+            hit = value < rule.threshold[0] or value > rule.threshold[1]
+        elif rule.operator == "between":
+            hit = rule.threshold[0] <= value <= rule.threshold[1]
+        else:
+            hit = {
+                ">": value > rule.threshold, ">=": value >= rule.threshold,
+                "<": value < rule.threshold, "<=": value <= rule.threshold,
+                "==": value == rule.threshold, "!=": value != rule.threshold,
+            }[rule.operator]
+        if hit:
+            triggered.append((rule.alert_type, rule.message.format(
+                value=value, device_id=reading.device_id, location=reading.location,
+                alert_type=rule.alert_type, threshold=rule.threshold)))
+    return triggered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readings", type=int, default=50000)
+    parser.add_argument("--devices", type=int, default=200)
+    parser.add_argument("--rule-counts", default="3,30,300,3000")
+    args = parser.parse_args()
+
+    from app.rules import RulePlan
+
+    random.seed(1)
+    readings = [
+        SimpleNamespace(
+            device_id=f"sensor-{i % args.devices}",
+            location=f"room-{i % 20}",
+            temperature=random.uniform(15, 35),
+            humidity=random.uniform(20, 90),
+            motion=random.random() < 0.3,
+        )
+        for i in range(args.readings)
+    ]
+    now = datetime(2025, 1, 1, 23, 0)
+
+    print(f"{args.readings} readings, {args.devices} devices")
+    print(f"{'rules':>6}{'compile ms':>12}{'plan us/reading':>18}{'naive us/reading':>19}")
+    for count in (int(c) for c in args.rule_counts.split(",")):
+        rule_list = make_rules(count, args.devices)
+
+        start = time.perf_counter()
+        plan = RulePlan(rule_list)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for reading in readings:
+            plan.evaluate(reading, now)
+        plan_us = (time.perf_counter() - start) / len(readings) * 1e6
+
+        start = time.perf_counter()
+        for reading in readings:
+            naive_evaluate(rule_list, reading, now)
+        naive_us = (time.perf_counter() - start) / len(readings) * 1e6
+
+        print(f"{count:>6}{compile_ms:>12.2f}{plan_us:>18.2f}{naive_us:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Mixed reader/writer load against the default and tuned SQLite profiles.
+
+Writers insert readings one transaction at a time (like POST /api/readings)
+while readers run the list_readings query. Each profile gets a fresh
+database file:
+
+    python benchmarks/bench_sqlite_concurrency.py --writers 4 --readers 8
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_profile(tuned: bool, args) -> dict:
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+
+    from app import models
+    from app.database import Base, create_db_engine
+
+    path = os.path.join(tempfile.mkdtemp(prefix="iot-bench-"), "bench.db")
+    engine = create_db_engine(f"sqlite:///{path}", tuned=tuned)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+    with Session() as db:
+        db.add_all(
+            models.Reading(
+                device_id=f"sensor-{i % args.devices}",
+                location="lab",
+                temperature=22.0,
+                humidity=50.0,
+                motion=False,
+            )
+            for i in range(args.seed_rows)
+        )
+        db.commit()
+
+    stop = threading.Event()
+    write_lat, read_lat = [], []
+    errors = [0]
+    lock = threading.Lock()
+
+    def writer():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.add(models.Reading(
+                        device_id=f"sensor-{random.randrange(args.devices)}",
+                        location="lab",
+                        temperature=random.uniform(20, 35),
+                        humidity=random.uniform(25, 80),
+                        motion=False,
+                    ))
+                    db.commit()
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                write_lat.append(time.perf_counter() - start)
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    (
+                        db.query(models.Reading)
+                        .filter(models.Reading.device_id == f"sensor-{random.randrange(args.devices)}")
+                        .order_by(models.Reading.id.desc())
+                        .limit(50)
+                        .all()
+                    )
+            except OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                read_lat.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=writer) for _ in range(args.writers)]
+    threads += [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    engine.dispose()
+
+    return {
+        "writes/s": len(write_lat) / args.seconds,
+        "reads/s": len(read_lat) / args.seconds,
+        "write p50 ms": statistics.median(write_lat) * 1000 if write_lat else 0.0,
+        "write p95 ms": percentile(write_lat, 95) * 1000,
+        "read p50 ms": statistics.median(read_lat) * 1000 if read_lat else 0.0,
+        "read p95 ms": percentile(read_lat, 95) * 1000,
+        "lock errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--devices", type=int, default=20)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Keep the app's import-time database and log file out of the tree.
+    os.chdir(tempfile.mkdtemp(prefix="iot-bench-"))
+
+    results = {
+        "default": run_profile(False, args),
+        "tuned": run_profile(True, args),
+    }
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:.0f}s per profile")
+    print(f"{'':14}{'default':>12}{'tuned':>12}")
+    for key in results["default"]:
+        print(f"{key:14}{results['default'][key]:12.1f}{results['tuned'][key]:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
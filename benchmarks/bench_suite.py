@@ -0,0 +1,330 @@
+"""End-to-end benchmarks for the hot paths, with stored baselines.
+
+Runs the FastAPI app in-process (TestClient) against a throwaway SQLite
+database and measures:
+
+* POST /api/readings with readings that raise 0, 1 and 3 alerts
+* alerts.evaluate_reading on its own, for an OK reading and a 3-alert one
+* GET /api/readings and /api/alerts at each table size, with and without
+  a device_id filter
+* GET /api/email-log
+* the same list requests answered from the response cache, as a hit and as
+  a 304 revalidation (the query benchmarks above run with the cache off)
+
+Results are written as JSON; ``compare`` checks a run against a baseline and
+exits non-zero when a benchmark got slower than the tolerance allows:
+
+    python benchmarks/bench_suite.py run --output benchmarks/baseline.json
+    python benchmarks/bench_suite.py run --output run.json --compare benchmarks/baseline.json
+    python benchmarks/bench_suite.py compare run.json --baseline benchmarks/baseline.json
+
+``--quick`` only seeds 10k rows and uses fewer iterations, for a smoke run.
+"""
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+SEED_DEVICES = 100
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples) -> dict:
+    total = sum(samples)
+    return {
+        "n": len(samples),
+        "ops_per_sec": len(samples) / total if total else 0.0,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+    }
+
+
+def timed(fn, iterations: int, warmup: int = 5) -> dict:
+    for i in range(warmup):
+        fn(-1 - i)
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def make_reading(device_id: str, alerts: int) -> dict:
+    """A reading that raises ``alerts`` alerts (0, 1 or 3) under night_always."""
+    return {
+        "device_id": device_id,
+        "location": "bench",
+        "temperature": 35.0 if alerts >= 1 else 22.0,
+        "humidity": 90.0 if alerts >= 3 else 50.0,
+        "motion": alerts >= 3,
+    }
+
+
+def reset_state():
+    from app import alert_state, anomaly
+    from app.database import Base, engine
+
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    alert_state.table.clear()
+    anomaly.tracker.clear()
+
+
+def seed(rows: int, chunk: int = 50_000):
+    """Bulk-insert ``rows`` readings and alerts (1% of alerts emailed)."""
+    from sqlalchemy import insert
+
+    from app import models
+    from app.database import engine
+
+    with engine.begin() as conn:
+        for start in range(0, rows, chunk):
+            count = min(chunk, rows - start)
+            conn.execute(insert(models.Reading), [
+                {
+                    "device_id": f"sensor-{(start + i) % SEED_DEVICES}",
+                    "location": f"room-{(start + i) % 20}",
+                    "temperature": 22.0,
+                    "humidity": 50.0,
+                    "motion": False,
+                }
+                for i in range(count)
+            ])
+            conn.execute(insert(models.Alert), [
+                {
+                    "device_id": f"sensor-{(start + i) % SEED_DEVICES}",
+                    "location": f"room-{(start + i) % 20}",
+                    "alert_type": "HIGH_TEMP",
+                    "message": "High temperature",
+                    "emailed": (start + i) % 100 == 0,
+                    "closed_at": datetime.utcnow(),
+                }
+                for i in range(count)
+            ])
+
+
+def bench_ingest(client, iterations: int, results: dict):
+    for alerts in (0, 1, 3):
+        # A fresh device per reading, so every alert opens a new episode
+        # instead of being folded into an open one.
+        def post(i, alerts=alerts):
+            resp = client.post("/api/readings",
+                               json=make_reading(f"ingest-{alerts}-{i}", alerts))
+            resp.raise_for_status()
+            assert len(resp.json()["alerts"]) == alerts
+
+        results[f"ingest.create_reading.alerts_{alerts}"] = timed(post, iterations)
+
+
+def bench_evaluate(iterations: int, results: dict):
+    from app import alerts, models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        for count in (0, 3):
+            def evaluate(i, count=count):
+                reading = models.Reading(**make_reading(f"eval-{count}-{i}", count))
+                db.add(reading)
+                db.flush()
+                assert len(alerts.evaluate_reading(db, reading)) == count
+
+            results[f"rules.evaluate_reading.alerts_{count}"] = timed(evaluate, iterations)
+        db.rollback()
+    finally:
+        db.close()
+    reset_state()
+
+
+def bench_queries(client, size: int, iterations: int, results: dict):
+    label = f"{size // 1000}k" if size < 1_000_000 else f"{size // 1_000_000}m"
+    for path, name in (("/api/readings", "list_readings"), ("/api/alerts", "list_alerts")):
+        for params, variant in (({}, "all"), ({"device_id": "sensor-7"}, "device")):
+            def get(_, path=path, params=params):
+                client.get(path, params=params).raise_for_status()
+
+            results[f"query.{name}.{label}.{variant}"] = timed(get, iterations)
+
+    def email_log(_):
+        client.get("/api/email-log").raise_for_status()
+
+    results[f"query.list_email_log.{label}"] = timed(email_log, iterations)
+
+
+def bench_cache(client, iterations: int, results: dict):
+    from app.config import settings
+
+    settings.response_cache_enabled = True
+    try:
+        for path, name in (("/api/readings", "list_readings"), ("/api/alerts", "list_alerts")):
+            etag = client.get(path).headers["etag"]
+
+            def hit(_, path=path):
+                client.get(path).raise_for_status()
+
+            def revalidate(_, path=path, etag=etag):
+                assert client.get(path, headers={"If-None-Match": etag}).status_code == 304
+
+            results[f"cache.{name}.hit"] = timed(hit, iterations)
+            results[f"cache.{name}.not_modified"] = timed(revalidate, iterations)
+    finally:
+        settings.response_cache_enabled = False
+
+
+def run(args) -> dict:
+    from fastapi.testclient import TestClient
+
+    from app import rules
+    from app.config import settings
+    from app.main import app
+
+    # Every hour counts as night, so motion raises MOTION_NIGHT
+    settings.night_start_hour, settings.night_end_hour = 0, 24
+    rules.reload_plan()
+    # query.* measure the database path; bench_cache measures the cache
+    settings.response_cache_enabled = False
+
+    iterations = 50 if args.quick else args.iterations
+    sizes = [10_000] if args.quick else [int(s) for s in args.sizes.split(",")]
+    results = {}
+    with TestClient(app) as client:
+        reset_state()
+        print("ingest...", flush=True)
+        bench_ingest(client, iterations, results)
+        reset_state()
+        print("evaluate_reading...", flush=True)
+        bench_evaluate(iterations, results)
+        for size in sizes:
+            reset_state()
+            print(f"seeding {size} rows...", flush=True)
+            seed(size)
+            print(f"queries at {size} rows...", flush=True)
+            bench_queries(client, size, iterations, results)
+            if size == sizes[0]:
+                print("response cache...", flush=True)
+                bench_cache(client, iterations, results)
+        reset_state()
+
+    if args.only:
+        results = {k: v for k, v in results.items() if fnmatch.fnmatch(k, args.only)}
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "sizes": sizes,
+        },
+        "results": results,
+    }
+
+
+def print_results(run_data: dict):
+    print(f"{'benchmark':<44}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, r in sorted(run_data["results"].items()):
+        print(f"{name:<44}{r['ops_per_sec']:>10.1f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Print a comparison table and return the names of regressed benchmarks.
+
+    Throughput (ops/s) is the deciding metric; a benchmark regresses when it
+    drops by more than ``tolerance`` (a fraction) against the baseline.
+    """
+    regressions = []
+    print(f"{'benchmark':<44}{'base ops/s':>12}{'ops/s':>10}{'change':>9}")
+    for name, r in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<44}{'-':>12}{r['ops_per_sec']:>10.1f}{'new':>9}")
+            continue
+        change = r["ops_per_sec"] / base["ops_per_sec"] - 1 if base["ops_per_sec"] else 0.0
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<44}{base['ops_per_sec']:>12.1f}{r['ops_per_sec']:>10.1f}"
+              f"{change:>+9.1%}{flag}")
+    missing = sorted(set(baseline["results"]) - set(current["results"]))
+    for name in missing:
+        print(f"{name:<44}{'(not run)':>12}")
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="run the benchmarks and write a JSON result file")
+    run_parser.add_argument("--output", default=DEFAULT_BASELINE)
+    run_parser.add_argument("--iterations", type=int, default=300)
+    run_parser.add_argument("--sizes", default="10000,1000000",
+                            help="comma-separated table sizes for the query benchmarks")
+    run_parser.add_argument("--quick", action="store_true")
+    run_parser.add_argument("--only", help="glob of benchmark names to keep, e.g. 'query.*'")
+    run_parser.add_argument("--compare", metavar="BASELINE",
+                            help="compare against this baseline after the run")
+    run_parser.add_argument("--tolerance", type=float, default=0.15)
+
+    cmp_parser = sub.add_parser("compare", help="compare a result file against a baseline")
+    cmp_parser.add_argument("current")
+    cmp_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    cmp_parser.add_argument("--tolerance", type=float, default=0.15,
+                            help="allowed throughput drop as a fraction (default 0.15)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        regressions = compare(load(args.current), load(args.baseline), args.tolerance)
+    else:
+        output = os.path.abspath(args.output)
+        baseline = load(os.path.abspath(args.compare)) if args.compare else None
+
+        # The app creates its database and log file relative to the working
+        # directory, so run it inside a scratch directory.
+        os.environ.setdefault("ENABLE_EMAIL", "false")
+        os.chdir(tempfile.mkdtemp(prefix="iot-bench-"))
+
+        run_data = run(args)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(run_data, f, indent=2, sort_keys=True)
+        print()
+        print_results(run_data)
+        print(f"\nwritten to {output}")
+        if baseline is None:
+            return
+        print()
+        regressions = compare(run_data, baseline, args.tolerance)
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than "
+              f"{args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nno regressions")
+
+
+if __name__ == "__main__":
+    main()
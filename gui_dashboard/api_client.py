@@ -1,13 +1,34 @@
+import threading
+from collections import OrderedDict
 import requests
-from typing import List, Dict, Optional
+import requests.adapters
+from datetime import datetime, timedelta
+from typing import Callable, List, Dict, Optional, Tuple
 
 
 class APIClient:
+    # Responses kept for If-None-Match revalidation
+    CONDITIONAL_CACHE_SIZE = 64
+    # Alert changes are fetched from a little before the newest updated_at
+    # seen, so a change committed late with an older timestamp is not missed
+    WATERMARK_OVERLAP = timedelta(seconds=5)
     
-    def __init__(self, base_url: str = "http://127.0.0.1:9000"):
+    def __init__(self, base_url: str = "http://127.0.0.1:9000", pool_size: int = 8):
         self.base_url = base_url
         self.session = requests.Session()
         self.session.headers.update({"Content-Type": "application/json"})
+        # The dashboard fetches in parallel from a thread pool; keep enough
+        # keep-alive connections around for all of its workers.
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # Highest id seen per (view, device filter), for delta sync
+        self._last_ids: Dict[Tuple[str, Optional[str]], int] = {}
+        # Newest alert updated_at seen per device filter
+        self._watermarks: Dict[Optional[str], str] = {}
+        # Last ETag and body per (path, params); a 304 answers from here
+        self._conditional: OrderedDict = OrderedDict()
+        self._conditional_lock = threading.Lock()
     
     def check_connection(self) -> bool:
         try:
@@ -16,41 +37,178 @@ class APIClient:
         except requests.exceptions.RequestException:
             return False
     
-    def get_readings(self, limit: Optional[int] = None, device_id: Optional[str] = None) -> List[Dict]:
+    def _get_json(self, path: str, params: Dict):
+        """GET a list endpoint conditionally.
+        
+        Sends the ETag of the last response for the same path and params;
+        when nothing changed the server answers 304 without a body and the
+        copy kept here is returned. The returned rows are shared between
+        calls and must not be modified.
+        """
+        key = (path, tuple(sorted(params.items())))
+        with self._conditional_lock:
+            cached = self._conditional.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        response = self.session.get(f"{self.base_url}{path}", params=params,
+                                    headers=headers, timeout=5)
+        if response.status_code == 304 and cached:
+            with self._conditional_lock:
+                if key in self._conditional:
+                    self._conditional.move_to_end(key)
+            return cached[1]
+        response.raise_for_status()
+        data = response.json()
+        etag = response.headers.get('ETag')
+        if etag:
+            with self._conditional_lock:
+                self._conditional[key] = (etag, data)
+                self._conditional.move_to_end(key)
+                while len(self._conditional) > self.CONDITIONAL_CACHE_SIZE:
+                    self._conditional.popitem(last=False)
+        return data
+    
+    def get_readings(self, limit: Optional[int] = None, device_id: Optional[str] = None,
+                   after_id: Optional[int] = None,
+                   before_id: Optional[int] = None) -> List[Dict]:
         try:
             params = {}
             if limit:
                 params['limit'] = limit
             if device_id:
                 params['device_id'] = device_id
+            if after_id is not None:
+                params['after_id'] = after_id
+            if before_id is not None:
+                params['before_id'] = before_id
                 
-            response = self.session.get(f"{self.base_url}/api/readings", params=params, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json("/api/readings", params)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching readings: {e}")
             return []
     
-    def get_alerts(self, limit: Optional[int] = None, device_id: Optional[str] = None) -> List[Dict]:
+    def get_alerts(self, limit: Optional[int] = None, device_id: Optional[str] = None,
+                   after_id: Optional[int] = None,
+                   before_id: Optional[int] = None,
+                   updated_since: Optional[str] = None) -> List[Dict]:
         try:
             params = {}
             if limit:
                 params['limit'] = limit
             if device_id:
                 params['device_id'] = device_id
+            if after_id is not None:
+                params['after_id'] = after_id
+            if before_id is not None:
+                params['before_id'] = before_id
+            if updated_since is not None:
+                params['updated_since'] = updated_since
                 
-            response = self.session.get(f"{self.base_url}/api/alerts", params=params, timeout=5)
+            return self._get_json("/api/alerts", params)
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching alerts: {e}")
+            return []
+    
+    def get_series(self, device_id: Optional[str] = None, hours: float = 24,
+                   points: int = 300, since: Optional[datetime] = None,
+                   bucket_seconds: Optional[int] = None) -> Optional[Dict]:
+        try:
+            params = {'points': points}
+            if device_id:
+                params['device_id'] = device_id
+            if bucket_seconds:
+                params['bucket_seconds'] = bucket_seconds
+            since = since or datetime.utcnow() - timedelta(hours=hours)
+            params['since'] = since.isoformat()
+
+            response = self.session.get(f"{self.base_url}/api/readings/series", params=params, timeout=5)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Error fetching alerts: {e}")
+            print(f"Error fetching series: {e}")
+            return None
+    
+    def get_new_readings(self, limit: int, device_id: Optional[str] = None,
+                         last_id: Optional[int] = None) -> Tuple[List[Dict], bool]:
+        """Readings newer than ``last_id``, newest first.
+        
+        The flag is True when the rows are a full page that should replace
+        the table (no ``last_id`` yet, or more than ``limit`` rows arrived
+        since). Does not touch the sync state: callers pass the result to
+        ``mark_seen`` once the rows are shown, so a refresh that is thrown
+        away does not skip rows.
+        """
+        return self._get_new(self.get_readings, limit, device_id, last_id)
+    
+    def get_new_alerts(self, limit: int, device_id: Optional[str] = None,
+                       watermark: Optional[str] = None) -> Tuple[List[Dict], bool]:
+        """Alerts created or changed since ``watermark``, newest first.
+        
+        Alerts change in place (repeats, clears, emails), so they are synced
+        by ``updated_at`` rather than by id. Rows already shown come back
+        with their new values; the flag means the same as for
+        ``get_new_readings``.
+        """
+        if watermark is None:
+            return self.get_alerts(limit=limit, device_id=device_id), True
+        since = datetime.fromisoformat(watermark) - self.WATERMARK_OVERLAP
+        rows = self.get_alerts(limit=limit, device_id=device_id,
+                               updated_since=since.isoformat())
+        if len(rows) >= limit:
+            return self.get_alerts(limit=limit, device_id=device_id), True
+        return rows, False
+    
+    def last_seen(self, view: str, device_id: Optional[str]):
+        """Sync position for a view: an id for readings, a watermark for alerts."""
+        if view == 'alerts':
+            return self._watermarks.get(device_id)
+        return self._last_ids.get((view, device_id))
+    
+    def mark_seen(self, view: str, device_id: Optional[str], rows: List[Dict]):
+        if not rows:
+            return
+        if view == 'alerts':
+            stamps = [row['updated_at'] for row in rows if row.get('updated_at')]
+            if stamps:
+                self._watermarks[device_id] = max(
+                    self._watermarks.get(device_id, ''), *stamps
+                )
+            return
+        key = (view, device_id)
+        self._last_ids[key] = max(self._last_ids.get(key, 0), rows[0]['id'])
+    
+    def reset_sync(self):
+        self._last_ids.clear()
+        self._watermarks.clear()
+    
+    def _get_new(self, fetch: Callable, limit: int, device_id: Optional[str],
+                 last_id: Optional[int]) -> Tuple[List[Dict], bool]:
+        if last_id is None:
+            return fetch(limit=limit, device_id=device_id), True
+        rows = fetch(limit=limit, device_id=device_id, after_id=last_id)
+        if len(rows) >= limit:
+            # Gap larger than the table: reload the newest page instead
+            return fetch(limit=limit, device_id=device_id), True
+        return rows, False
+    
+    def get_devices(self, location: Optional[str] = None,
+                    stale: Optional[bool] = None) -> List[Dict]:
+        try:
+            params = {}
+            if location:
+                params['location'] = location
+            if stale is not None:
+                params['stale'] = str(stale).lower()
+
+            response = self.session.get(f"{self.base_url}/api/devices", params=params, timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error fetching devices: {e}")
             return []
     
     def get_unique_device_ids(self) -> List[str]:
         try:
-            readings = self.get_readings(limit=1000)
-            device_ids = list(set(reading.get('device_id', '') for reading in readings))
-            return sorted([d for d in device_ids if d])
+            return [device['device_id'] for device in self.get_devices()]
         except Exception as e:
             print(f"Error getting device IDs: {e}")
             return []
@@ -61,9 +219,7 @@ class APIClient:
             if limit:
                 params['limit'] = limit
                 
-            response = self.session.get(f"{self.base_url}/api/email-log", params=params, timeout=5)
-            response.raise_for_status()
-            return response.json()
+            return self._get_json("/api/email-log", params)
         except requests.exceptions.RequestException as e:
             print(f"Error fetching email log: {e}")
             return []
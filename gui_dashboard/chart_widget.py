@@ -1,17 +1,65 @@
 from PySide6.QtWidgets import QWidget, QVBoxLayout
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from datetime import datetime
-from typing import List, Dict
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Sequence, Tuple
 import matplotlib.dates as mdates
+import numpy as np
+
+
+SERIES = (
+    ('temperature', 'r', 'Temperature', '°C'),
+    ('humidity', 'b', 'Humidity', '%'),
+)
+
+
+def parse_timestamps(values: Sequence[str]) -> np.ndarray:
+    """ISO timestamps to matplotlib date numbers, parsed in one numpy call."""
+    # numpy only parses naive timestamps; values from one response share a
+    # format, so checking the first one is enough.
+    if values and (values[0].endswith('Z') or '+' in values[0][19:] or '-' in values[0][19:]):
+        values = [
+            datetime.fromisoformat(value.replace('Z', '+00:00'))
+            .astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+            for value in values
+        ]
+    return mdates.date2num(np.array(values, dtype='datetime64[ms]'))
+
+
+def decimate(x: np.ndarray, lo: np.ndarray, hi: np.ndarray,
+             columns: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Reduce sorted samples to at most one min/max pair per pixel column.
+
+    Returns the x position of each column with the lowest ``lo`` and highest
+    ``hi`` in it, so spikes survive even when thousands of samples share a
+    column.
+    """
+    if columns < 1 or len(x) <= 2 * columns or x[-1] <= x[0]:
+        return x, lo, hi
+    bins = ((x - x[0]) * ((columns - 1) / (x[-1] - x[0]))).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    return x[starts], np.fmin.reduceat(lo, starts), np.fmax.reduceat(hi, starts)
 
 
 class ChartWidget(QWidget):
-    
+    """Temperature and humidity charts.
+
+    Artists are created once and only get new data afterwards. Appends that
+    stay inside the current axis limits are blitted onto the cached
+    background instead of redrawing the whole figure; anything else
+    (rescaling, resizing, full reloads) falls back to one full draw.
+    """
+
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.window_hours = 24
+        self.series_buckets: List[Dict] = []
+        self.series_bucket_seconds: Optional[int] = None
+        # Per key: x, avg, min, max arrays of the loaded series
+        self.series_data: Dict[str, Tuple[np.ndarray, ...]] = {}
+        self._backgrounds = None
         self.setup_ui()
-        
+
     def setup_ui(self):
         layout = QVBoxLayout(self)
         self.figure = Figure(figsize=(10, 8))
@@ -19,67 +67,202 @@ class ChartWidget(QWidget):
         self.ax_temp = self.figure.add_subplot(2, 1, 1)
         self.ax_humidity = self.figure.add_subplot(2, 1, 2)
         layout.addWidget(self.canvas)
+
+        self.lines = {}
+        self.bands = {}
+        self.placeholders = {}
+        for ax, (key, color, label, unit) in zip(self.axes(), SERIES):
+            # Animated artists are left out of normal draws and painted on
+            # top of the cached background in _on_draw / blit.
+            self.bands[key] = ax.fill_between([], [], [], color=color, alpha=0.15,
+                                              label='Min / Max', animated=True)
+            self.lines[key], = ax.plot([], [], f'{color}-', linewidth=2,
+                                       label=label, animated=True)
+            self.placeholders[key] = ax.text(0.5, 0.5, 'No data available',
+                                             ha='center', va='center',
+                                             transform=ax.transAxes)
+            ax.set_xlabel('Time')
+            ax.set_ylabel(f'{label} ({unit})', color=color)
+            ax.set_title(f'{label} Over Time')
+            ax.tick_params(axis='y', labelcolor=color)
+            ax.grid(True, alpha=0.3)
+            ax.legend(loc='upper left')
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+            ax.tick_params(axis='x', rotation=45)
+
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+        self.canvas.mpl_connect('resize_event', self._on_resize)
         self.figure.tight_layout(pad=3.0)
-        
+
+    def axes(self):
+        return (self.ax_temp, self.ax_humidity)
+
     def update_charts(self, readings: List[Dict]):
-        self.ax_temp.clear()
-        self.ax_humidity.clear()
-        
+        """Plot raw readings (one point each) instead of a bucketed series."""
+        self.reset_series()
+        readings = [r for r in readings if r.get('created_at')]
         if not readings:
-            self.ax_temp.text(0.5, 0.5, 'No data available', 
-                            ha='center', va='center', transform=self.ax_temp.transAxes)
-            self.ax_humidity.text(0.5, 0.5, 'No data available',
-                                ha='center', va='center', transform=self.ax_humidity.transAxes)
-            self.canvas.draw()
+            self._show({})
             return
-        
-        sorted_readings = sorted(readings, key=lambda x: x.get('created_at', ''))
-        timestamps = []
-        temperatures = []
-        humidities = []
-        
-        for reading in sorted_readings:
-            try:
-                ts_str = reading.get('created_at', '')
-                if ts_str:
-                    if '.' in ts_str:
-                        ts = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-                    else:
-                        ts = datetime.fromisoformat(ts_str.replace('Z', '+00:00'))
-                    timestamps.append(ts)
-                    temperatures.append(reading.get('temperature', 0))
-                    humidities.append(reading.get('humidity', 0))
-            except (ValueError, TypeError) as e:
-                print(f"Error parsing timestamp: {e}")
-                continue
-        
-        if not timestamps:
-            self.ax_temp.text(0.5, 0.5, 'No valid data to display',
-                            ha='center', va='center', transform=self.ax_temp.transAxes)
-            self.ax_humidity.text(0.5, 0.5, 'No valid data to display',
-                                ha='center', va='center', transform=self.ax_humidity.transAxes)
-            self.canvas.draw()
+
+        x = parse_timestamps([r['created_at'] for r in readings])
+        order = np.argsort(x, kind='stable')
+        x = x[order]
+        data = {}
+        for key, *_ in SERIES:
+            y = np.array([r.get(key, 0) for r in readings], dtype=float)[order]
+            data[key] = (x, y, y, y)
+        self._show(data, title='')
+
+    def reset_series(self):
+        """Forget the loaded series so the next refresh reloads it."""
+        self.series_buckets = []
+        self.series_bucket_seconds = None
+        self.series_data = {}
+
+    def series_resume_point(self):
+        """(since, bucket_seconds) to fetch only buckets from the last one on,
+        or (None, None) when the series has to be loaded in full."""
+        if not self.series_buckets or not self.series_bucket_seconds:
+            return None, None
+        return (datetime.fromisoformat(self.series_buckets[-1]['start']),
+                self.series_bucket_seconds)
+
+    def update_series(self, series: Optional[Dict]):
+        buckets = (series or {}).get('buckets', [])
+        if not buckets:
+            self.reset_series()
+            self._show({})
             return
-        
-        self.ax_temp.plot(timestamps, temperatures, 'r-', marker='o', markersize=4, linewidth=2, label='Temperature')
-        self.ax_temp.set_xlabel('Time')
-        self.ax_temp.set_ylabel('Temperature (°C)', color='r')
-        self.ax_temp.set_title('Temperature Over Time')
-        self.ax_temp.tick_params(axis='y', labelcolor='r')
-        self.ax_temp.grid(True, alpha=0.3)
-        self.ax_temp.legend(loc='upper left')
-        self.ax_temp.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-        self.ax_temp.tick_params(axis='x', rotation=45)
-        
-        self.ax_humidity.plot(timestamps, humidities, 'b-', marker='s', markersize=4, linewidth=2, label='Humidity')
-        self.ax_humidity.set_xlabel('Time')
-        self.ax_humidity.set_ylabel('Humidity (%)', color='b')
-        self.ax_humidity.set_title('Humidity Over Time')
-        self.ax_humidity.tick_params(axis='y', labelcolor='b')
-        self.ax_humidity.grid(True, alpha=0.3)
-        self.ax_humidity.legend(loc='upper left')
-        self.ax_humidity.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-        self.ax_humidity.tick_params(axis='x', rotation=45)
-        
+
+        self.series_buckets = list(buckets)
+        self.series_bucket_seconds = series.get('bucket_seconds')
+        self.series_data = self._bucket_arrays(self.series_buckets)
+        self._show(self.series_data,
+                   title=f' ({self.series_bucket_seconds or 0}s buckets)')
+
+    def append_series(self, series: Optional[Dict]):
+        """Merge buckets fetched from the last known bucket onwards.
+
+        The last bucket is usually still filling up, so it is replaced; older
+        buckets that fell out of the time window are dropped.
+        """
+        new = (series or {}).get('buckets', [])
+        if not new:
+            return
+        first_new = new[0]['start']
+        cutoff = (datetime.utcnow() - timedelta(hours=self.window_hours)).isoformat()
+        old = self.series_buckets
+        # Buckets are sorted by start: keep old[begin:end]
+        end = sum(1 for b in old if b['start'] < first_new)
+        begin = sum(1 for b in old[:end] if b['start'] < cutoff)
+        self.series_buckets = old[begin:end] + list(new)
+
+        # Only the new buckets are parsed; the kept arrays are sliced
+        fresh = self._bucket_arrays(new)
+        if self.series_data:
+            self.series_data = {
+                key: tuple(np.concatenate([kept[begin:end], added])
+                           for kept, added in zip(self.series_data[key], fresh[key]))
+                for key in fresh
+            }
+        else:
+            self.series_data = self._bucket_arrays(self.series_buckets)
+
+        if not self._fits(fresh):
+            self._show(self.series_data)
+            return
+        self._set_artist_data(self.series_data)
+        self.blit()
+
+    def _bucket_arrays(self, buckets: List[Dict]) -> Dict[str, Tuple[np.ndarray, ...]]:
+        x = parse_timestamps([b['start'] for b in buckets])
+        data = {}
+        for key, *_ in SERIES:
+            values = np.array(
+                [(b[f'{key}_avg'], b[f'{key}_min'], b[f'{key}_max']) for b in buckets],
+                dtype=float,
+            ).reshape(-1, 3)
+            data[key] = (x, values[:, 0], values[:, 1], values[:, 2])
+        return data
+
+    def _set_artist_data(self, data: Dict[str, Tuple[np.ndarray, ...]]):
+        for ax, (key, *_) in zip(self.axes(), SERIES):
+            line, band = self.lines[key], self.bands[key]
+            if key not in data:
+                line.set_data([], [])
+                band.set_verts([])
+                continue
+            x, avg, lo, hi = data[key]
+            columns = int(ax.bbox.width)
+            if len(x) > 2 * columns > 0:
+                line.set_data(*self._interleave(x, avg, columns))
+            else:
+                line.set_data(x, avg)
+            bx, blo, bhi = decimate(x, lo, hi, columns)
+            band.set_verts([np.column_stack([np.r_[bx, bx[::-1]], np.r_[bhi, blo[::-1]]])]
+                           if len(bx) else [])
+
+    @staticmethod
+    def _interleave(x: np.ndarray, y: np.ndarray, columns: int):
+        # Line through each column's min then max, so the trace keeps its
+        # envelope after decimation.
+        cx, lo, hi = decimate(x, y, y, columns)
+        return np.repeat(cx, 2), np.column_stack([lo, hi]).ravel()
+
+    def _fits(self, data: Dict[str, Tuple[np.ndarray, ...]]) -> bool:
+        """Whether new points lie inside the current limits (blittable)."""
+        for ax, (key, *_) in zip(self.axes(), SERIES):
+            if key not in data or not len(data[key][0]):
+                continue
+            x, _, lo, hi = data[key]
+            x0, x1 = ax.get_xlim()
+            y0, y1 = ax.get_ylim()
+            if (x.min() < x0 or x.max() > x1
+                    or np.nanmin(lo) < y0 or np.nanmax(hi) > y1):
+                return False
+        return self._backgrounds is not None
+
+    def _show(self, data: Dict[str, Tuple[np.ndarray, ...]], title: Optional[str] = None):
+        """Full redraw: new data, new limits, new background."""
+        self._set_artist_data(data)
+        for ax, (key, color, label, unit) in zip(self.axes(), SERIES):
+            self.placeholders[key].set_visible(key not in data)
+            if title is not None:
+                ax.set_title(f'{label} Over Time{title}')
+            if key not in data:
+                continue
+            x, _, lo, hi = data[key]
+            # Leave headroom so the next appends can be blitted
+            span = max(x[-1] - x[0], 1 / 1440)
+            ax.set_xlim(x[0], x[-1] + span * 0.05)
+            y0, y1 = np.nanmin(lo), np.nanmax(hi)
+            pad = max((y1 - y0) * 0.1, 0.5)
+            ax.set_ylim(y0 - pad, y1 + pad)
+        self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes()]
+        self._draw_animated()
+
+    def _on_resize(self, event):
+        self._backgrounds = None
         self.figure.tight_layout(pad=3.0)
-        self.canvas.draw()
+        # Pixel width changed: decimate again for the new column count
+        if self.series_data:
+            self._set_artist_data(self.series_data)
+
+    def _draw_animated(self):
+        for ax, (key, *_) in zip(self.axes(), SERIES):
+            ax.draw_artist(self.bands[key])
+            ax.draw_artist(self.lines[key])
+
+    def blit(self):
+        if self._backgrounds is None:
+            self.canvas.draw_idle()
+            return
+        for ax, background in zip(self.axes(), self._backgrounds):
+            self.canvas.restore_region(background)
+        self._draw_animated()
+        for ax in self.axes():
+            self.canvas.blit(ax.bbox)
@@ -0,0 +1,93 @@
+from typing import Callable, Dict
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+
+class _JobSignals(QObject):
+    done = Signal(int, str, object)
+    failed = Signal(int, str, str)
+
+
+class _FetchJob(QRunnable):
+
+    def __init__(self, fetcher: "RefreshFetcher", generation: int, name: str,
+                 fn: Callable):
+        super().__init__()
+        self.fetcher = fetcher
+        self.generation = generation
+        self.name = name
+        self.fn = fn
+
+    def run(self):
+        # Superseded while waiting in the queue: skip the HTTP call entirely
+        if self.generation != self.fetcher.generation:
+            return
+        try:
+            result = self.fn()
+        except Exception as e:
+            self.fetcher._signals.failed.emit(self.generation, self.name, str(e))
+        else:
+            self.fetcher._signals.done.emit(self.generation, self.name, result)
+
+
+class RefreshFetcher(QObject):
+    """Runs the API calls of one dashboard refresh in parallel on a thread pool.
+
+    Every ``submit`` starts a new generation; results of older generations are
+    dropped, so a refresh superseded by a filter change never reaches the UI.
+    ``finished`` fires on the GUI thread once all jobs of the current
+    generation are done, with their results keyed by job name.
+    """
+
+    finished = Signal(dict)
+    failed = Signal(str, str)
+
+    def __init__(self, max_threads: int = 6, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self.generation = 0
+        self._pending = set()
+        self._results: Dict[str, object] = {}
+        # Lives on the GUI thread, so worker emits are queued to it
+        self._signals = _JobSignals()
+        self._signals.done.connect(self._on_done)
+        self._signals.failed.connect(self._on_failed)
+
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def submit(self, jobs: Dict[str, Callable]) -> int:
+        self.cancel()
+        self._pending = set(jobs)
+        self._results = {}
+        for name, fn in jobs.items():
+            self.pool.start(_FetchJob(self, self.generation, name, fn))
+        return self.generation
+
+    def cancel(self):
+        """Drop queued jobs and ignore results of those already running."""
+        self.pool.clear()
+        self.generation += 1
+        self._pending = set()
+        self._results = {}
+
+    def wait(self, msecs: int = 3000) -> bool:
+        return self.pool.waitForDone(msecs)
+
+    def _on_done(self, generation: int, name: str, result):
+        if generation != self.generation or name not in self._pending:
+            return
+        self._results[name] = result
+        self._complete(name)
+
+    def _on_failed(self, generation: int, name: str, error: str):
+        if generation != self.generation or name not in self._pending:
+            return
+        self.failed.emit(name, error)
+        self._complete(name)
+
+    def _complete(self, name: str):
+        self._pending.discard(name)
+        if not self._pending:
+            self.finished.emit(self._results)
@@ -5,13 +5,16 @@ from typing import List, Dict, Optional
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QLabel, QPushButton, QComboBox, QSpinBox, QCheckBox, QTableWidget,
-    QTableWidgetItem, QTabWidget, QMessageBox, QHeaderView, QGroupBox
+    QTableWidgetItem, QTableView, QTabWidget, QHeaderView, QGroupBox
 )
-from PySide6.QtCore import QTimer, Qt
+from PySide6.QtCore import QTimer
 from PySide6.QtGui import QColor, QFont
 
 from gui_dashboard.api_client import APIClient
 from gui_dashboard.chart_widget import ChartWidget
+from gui_dashboard.fetcher import RefreshFetcher
+from gui_dashboard.stream_client import StreamListener
+from gui_dashboard.table_models import AlertsTableModel, ReadingsTableModel
 
 
 class MainWindow(QMainWindow):
@@ -19,11 +22,37 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.api_client = APIClient()
+        self.shown_email_ids = None
+        # Dashboard HTTP runs off the GUI thread; results arrive via signals
+        self.fetcher = RefreshFetcher()
+        self.fetcher.finished.connect(self.on_refresh_finished)
+        self.fetcher.failed.connect(self.on_refresh_failed)
+        self.refresh_pending = False
+        self.refresh_context = (None, 0, None)
+        # Readings and alerts are virtual tables; older pages are fetched
+        # when the view scrolls to the bottom.
+        self.readings_model = ReadingsTableModel()
+        self.alerts_model = AlertsTableModel()
+        self.more_fetchers = {}
+        self.more_context = {}
+        for view, model in (('readings', self.readings_model), ('alerts', self.alerts_model)):
+            fetcher = RefreshFetcher(max_threads=1, parent=self)
+            fetcher.finished.connect(lambda results, view=view: self.on_more_loaded(view, results))
+            model.more_requested.connect(lambda before_id, view=view: self.load_more(view, before_id))
+            self.more_fetchers[view] = fetcher
         self.auto_refresh_timer = QTimer()
         self.auto_refresh_timer.timeout.connect(self.refresh_data)
+        # Live updates: stream events are coalesced into one refresh
+        self.live_refresh_timer = QTimer()
+        self.live_refresh_timer.setSingleShot(True)
+        self.live_refresh_timer.timeout.connect(self.refresh_data)
+        self.stream_listener = None
+        # Stopped listeners whose thread has not returned yet
+        self.stopping_listeners = set()
         
         self.setup_ui()
         self.refresh_data()
+        self.start_stream()
     
     def setup_ui(self):
         self.setWindowTitle("IoT Alert System Dashboard")
@@ -69,7 +98,7 @@ class MainWindow(QMainWindow):
         
         self.limit_spinbox = QSpinBox()
         self.limit_spinbox.setMinimum(10)
-        self.limit_spinbox.setMaximum(200)
+        self.limit_spinbox.setMaximum(500)
         self.limit_spinbox.setValue(50)
         self.limit_spinbox.setSuffix(" records")
         self.limit_spinbox.valueChanged.connect(self.on_filter_changed)
@@ -78,7 +107,7 @@ class MainWindow(QMainWindow):
         layout.addSpacing(20)
         
         self.refresh_button = QPushButton("🔄 Refresh Now")
-        self.refresh_button.clicked.connect(self.refresh_data)
+        self.refresh_button.clicked.connect(lambda: self.refresh_data())
         layout.addWidget(self.refresh_button)
         
         layout.addSpacing(10)
@@ -92,6 +121,17 @@ class MainWindow(QMainWindow):
         auto_refresh_info.setStyleSheet("color: gray; font-size: 9pt;")
         layout.addWidget(auto_refresh_info)
         
+        layout.addSpacing(10)
+        
+        self.live_checkbox = QCheckBox("Live Updates")
+        self.live_checkbox.setChecked(True)
+        self.live_checkbox.stateChanged.connect(self.toggle_live_updates)
+        layout.addWidget(self.live_checkbox)
+        
+        self.live_status_label = QLabel("(Stream: connecting...)")
+        self.live_status_label.setStyleSheet("color: gray; font-size: 9pt;")
+        layout.addWidget(self.live_status_label)
+        
         layout.addStretch()
         
         connection_group = QGroupBox("Connection Info")
@@ -131,14 +171,8 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.tab_widget)
         return panel
     
-    def create_readings_table(self) -> QTableWidget:
-        table = QTableWidget()
-        table.setColumnCount(7)
-        table.setHorizontalHeaderLabels([
-            "ID", "Device ID", "Location", "Temperature (°C)", 
-            "Humidity (%)", "Motion", "Created At"
-        ])
-        
+    def create_readings_table(self) -> QTableView:
+        table = self.create_model_view(self.readings_model)
         header = table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
@@ -147,21 +181,10 @@ class MainWindow(QMainWindow):
         header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
-        
-        table.setAlternatingRowColors(True)
-        table.setEditTriggers(QTableWidget.NoEditTriggers)
-        table.setSelectionBehavior(QTableWidget.SelectRows)
-        
         return table
     
-    def create_alerts_table(self) -> QTableWidget:
-        table = QTableWidget()
-        table.setColumnCount(7)
-        table.setHorizontalHeaderLabels([
-            "ID", "Device ID", "Location", "Alert Type", 
-            "Message", "Emailed", "Created At"
-        ])
-        
+    def create_alerts_table(self) -> QTableView:
+        table = self.create_model_view(self.alerts_model)
         header = table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(1, QHeaderView.ResizeToContents)
@@ -170,11 +193,19 @@ class MainWindow(QMainWindow):
         header.setSectionResizeMode(4, QHeaderView.Stretch)
         header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
         header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
-        
+        header.setSectionResizeMode(7, QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(8, QHeaderView.ResizeToContents)
+        return table
+    
+    def create_model_view(self, model) -> QTableView:
+        table = QTableView()
+        table.setModel(model)
         table.setAlternatingRowColors(True)
-        table.setEditTriggers(QTableWidget.NoEditTriggers)
-        table.setSelectionBehavior(QTableWidget.SelectRows)
-        
+        table.setEditTriggers(QTableView.NoEditTriggers)
+        table.setSelectionBehavior(QTableView.SelectRows)
+        # Fixed row heights: the view never has to measure rows it doesn't show
+        table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        table.verticalHeader().setVisible(False)
         return table
     
     def create_emails_table(self) -> QTableWidget:
@@ -199,45 +230,101 @@ class MainWindow(QMainWindow):
         return table
     
     def refresh_data(self):
-        is_connected = self.api_client.check_connection()
+        # A refresh is already in flight: run one more when it lands instead
+        # of piling up requests behind a slow backend.
+        if self.fetcher.busy():
+            self.refresh_pending = True
+            return
+        self.refresh_pending = False
+        
+        device_id = self.device_combo.currentData()
+        limit = self.limit_spinbox.value()
+        
+        # Snapshot everything the jobs need here: they run on worker threads
+        # and must not touch widgets. Readings never change once stored, so
+        # only newer ones are fetched; alerts are fetched by updated_at, which
+        # also brings back the ones changed in place.
+        client = self.api_client
+        readings_after = client.last_seen('readings', device_id)
+        alerts_watermark = client.last_seen('alerts', device_id)
+        since, bucket_seconds = self.chart_widget.series_resume_point()
+        jobs = {
+            'connected': client.check_connection,
+            'readings': lambda: client.get_new_readings(limit, device_id, readings_after),
+            'alerts': lambda: client.get_new_alerts(limit, device_id, alerts_watermark),
+            'emails': lambda: client.get_email_log(limit=limit),
+            'series': lambda: client.get_series(device_id=device_id, since=since,
+                                                bucket_seconds=bucket_seconds),
+        }
+        if self.device_combo.currentIndex() == 0:
+            jobs['device_ids'] = client.get_unique_device_ids
+        
+        self.refresh_context = (device_id, limit, since)
+        self.refresh_button.setEnabled(False)
+        self.fetcher.submit(jobs)
+    
+    def on_refresh_finished(self, results: Dict):
+        self.refresh_button.setEnabled(True)
+        device_id, limit, since = self.refresh_context
+        
+        is_connected = results.get('connected', False)
         self.update_connection_status(is_connected)
         
         if not is_connected:
-            QMessageBox.warning(
-                self, 
-                "Connection Error",
-                "Unable to connect to the API at http://127.0.0.1:9000\n\n"
-                "Please ensure the FastAPI backend is running:\n"
+            self.statusBar().showMessage(
+                "Unable to connect to the API at http://127.0.0.1:9000 - "
+                "start the backend with: "
                 "uvicorn app.main:app --reload --host 127.0.0.1 --port 9000"
             )
-            return
+        else:
+            try:
+                self.apply_results(results, device_id, limit, since)
+            except Exception as e:
+                self.statusBar().showMessage(f"Error while updating the dashboard: {e}")
+            else:
+                self.statusBar().clearMessage()
+                current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.last_refresh_label.setText(f"Last refresh: {current_time}")
         
-        device_id = self.device_combo.currentData()
-        limit = self.limit_spinbox.value()
+        if self.refresh_pending:
+            self.refresh_data()
+    
+    def on_refresh_failed(self, job: str, error: str):
+        self.statusBar().showMessage(f"Error fetching {job}: {error}")
+    
+    def apply_results(self, results: Dict, device_id: Optional[str], limit: int,
+                      since: Optional[datetime]):
+        if 'readings' in results:
+            readings, full = results['readings']
+            if full:
+                self.update_readings_table(readings, limit)
+            elif readings:
+                self.prepend_readings(readings)
+            self.api_client.mark_seen('readings', device_id, readings)
+        
+        if 'alerts' in results:
+            alerts, full = results['alerts']
+            if full:
+                self.update_alerts_table(alerts, limit)
+            elif alerts:
+                self.merge_alerts(alerts)
+            self.api_client.mark_seen('alerts', device_id, alerts)
+        
+        if 'emails' in results:
+            emails = results['emails']
+            email_ids = [email.get('id') for email in emails]
+            if email_ids != self.shown_email_ids:
+                self.update_emails_table(emails)
+                self.shown_email_ids = email_ids
+        
+        if 'series' in results:
+            if since is None:
+                self.chart_widget.update_series(results['series'])
+            else:
+                self.chart_widget.append_series(results['series'])
         
-        try:
-            readings = self.api_client.get_readings(limit=limit, device_id=device_id)
-            alerts = self.api_client.get_alerts(limit=limit, device_id=device_id)
-            emails = self.api_client.get_email_log(limit=limit)
-            
-            self.update_readings_table(readings)
-            self.update_alerts_table(alerts)
-            self.update_emails_table(emails)
-            
-            self.chart_widget.update_charts(readings)
-            
-            if self.device_combo.currentIndex() == 0:
-                self.update_device_combo()
-            
-            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            self.last_refresh_label.setText(f"Last refresh: {current_time}")
-            
-        except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"An error occurred while fetching data:\n{str(e)}"
-            )
+        if 'device_ids' in results and self.device_combo.currentIndex() == 0:
+            self.update_device_combo(results['device_ids'])
     
     def update_connection_status(self, is_connected: bool):
         if is_connected:
@@ -251,9 +338,8 @@ class MainWindow(QMainWindow):
             self.status_label.setText("Status: Offline")
             self.status_label.setStyleSheet("color: red;")
     
-    def update_device_combo(self):
+    def update_device_combo(self, device_ids: List[str]):
         current_device = self.device_combo.currentData()
-        device_ids = self.api_client.get_unique_device_ids()
         
         self.device_combo.blockSignals(True)
         
@@ -270,103 +356,33 @@ class MainWindow(QMainWindow):
         
         self.device_combo.blockSignals(False)
     
-    def update_readings_table(self, readings: List[Dict]):
-        self.readings_table.setRowCount(0)
-        
-        for row_idx, reading in enumerate(readings):
-            self.readings_table.insertRow(row_idx)
-            
-            self.readings_table.setItem(row_idx, 0, 
-                QTableWidgetItem(str(reading.get('id', ''))))
-            
-            self.readings_table.setItem(row_idx, 1,
-                QTableWidgetItem(str(reading.get('device_id', ''))))
-            
-            self.readings_table.setItem(row_idx, 2,
-                QTableWidgetItem(str(reading.get('location', ''))))
-            
-            temp = reading.get('temperature', 0)
-            temp_item = QTableWidgetItem(f"{temp:.1f}")
-            temp_item.setTextAlignment(Qt.AlignCenter)
-            self.readings_table.setItem(row_idx, 3, temp_item)
-            
-            humidity = reading.get('humidity', 0)
-            humidity_item = QTableWidgetItem(f"{humidity:.1f}")
-            humidity_item.setTextAlignment(Qt.AlignCenter)
-            self.readings_table.setItem(row_idx, 4, humidity_item)
-            
-            motion = reading.get('motion', False)
-            motion_item = QTableWidgetItem("●" if motion else "○")
-            motion_item.setTextAlignment(Qt.AlignCenter)
-            motion_item.setFont(QFont("Arial", 12, QFont.Bold))
-            if motion:
-                motion_item.setForeground(QColor(200, 0, 0))
-            else:
-                motion_item.setForeground(QColor(150, 150, 150))
-            self.readings_table.setItem(row_idx, 5, motion_item)
-            
-            created_at = reading.get('created_at', '')
-            self.readings_table.setItem(row_idx, 6,
-                QTableWidgetItem(str(created_at)))
+    def update_readings_table(self, readings: List[Dict], limit: int):
+        self.more_fetchers['readings'].cancel()
+        self.readings_model.set_rows(readings, limit)
     
-    def update_alerts_table(self, alerts: List[Dict]):
-        self.alerts_table.setRowCount(0)
-        
-        for row_idx, alert in enumerate(alerts):
-            self.alerts_table.insertRow(row_idx)
-            
-            alert_type = alert.get('alert_type', '')
-            
-            if alert_type == 'HIGH_TEMP':
-                bg_color = QColor(255, 180, 180)
-                text_color = QColor(139, 0, 0)
-            elif alert_type == 'HUMIDITY':
-                bg_color = QColor(255, 200, 120)
-                text_color = QColor(139, 69, 0)
-            elif alert_type == 'MOTION':
-                bg_color = QColor(255, 240, 150)
-                text_color = QColor(139, 115, 0)
-            else:
-                bg_color = QColor(200, 200, 240)
-                text_color = QColor(0, 0, 139)
-            id_item = QTableWidgetItem(str(alert.get('id', '')))
-            id_item.setBackground(bg_color)
-            id_item.setForeground(text_color)
-            self.alerts_table.setItem(row_idx, 0, id_item)
-            
-            device_item = QTableWidgetItem(str(alert.get('device_id', '')))
-            device_item.setBackground(bg_color)
-            device_item.setForeground(text_color)
-            self.alerts_table.setItem(row_idx, 1, device_item)
-            
-            location_item = QTableWidgetItem(str(alert.get('location', '')))
-            location_item.setBackground(bg_color)
-            location_item.setForeground(text_color)
-            self.alerts_table.setItem(row_idx, 2, location_item)
-            
-            type_item = QTableWidgetItem(alert_type)
-            type_item.setBackground(bg_color)
-            type_item.setForeground(text_color)
-            type_item.setFont(QFont("Arial", 9, QFont.Bold))
-            self.alerts_table.setItem(row_idx, 3, type_item)
-            
-            message_item = QTableWidgetItem(str(alert.get('message', '')))
-            message_item.setBackground(bg_color)
-            message_item.setForeground(text_color)
-            self.alerts_table.setItem(row_idx, 4, message_item)
-            
-            emailed = alert.get('emailed', False)
-            emailed_item = QTableWidgetItem("✓" if emailed else "✗")
-            emailed_item.setTextAlignment(Qt.AlignCenter)
-            emailed_item.setBackground(bg_color)
-            emailed_item.setForeground(text_color)
-            emailed_item.setFont(QFont("Arial", 10, QFont.Bold))
-            self.alerts_table.setItem(row_idx, 5, emailed_item)
-            
-            created_item = QTableWidgetItem(str(alert.get('created_at', '')))
-            created_item.setBackground(bg_color)
-            created_item.setForeground(text_color)
-            self.alerts_table.setItem(row_idx, 6, created_item)
+    def prepend_readings(self, readings: List[Dict]):
+        self.readings_model.prepend_rows(readings)
+    
+    def update_alerts_table(self, alerts: List[Dict], limit: int):
+        self.more_fetchers['alerts'].cancel()
+        self.alerts_model.set_rows(alerts, limit)
+    
+    def merge_alerts(self, alerts: List[Dict]):
+        self.alerts_model.merge_rows(alerts)
+    
+    def load_more(self, view: str, before_id: int):
+        """Fetch the page of rows older than ``before_id`` for a table."""
+        device_id = self.device_combo.currentData()
+        limit = self.limit_spinbox.value()
+        fetch = self.api_client.get_readings if view == 'readings' else self.api_client.get_alerts
+        self.more_fetchers[view].submit({
+            'rows': lambda: fetch(limit=limit, device_id=device_id, before_id=before_id),
+        })
+        self.more_context[view] = limit
+    
+    def on_more_loaded(self, view: str, results: Dict):
+        model = self.readings_model if view == 'readings' else self.alerts_model
+        model.append_older(results.get('rows', []), self.more_context[view])
     
     def update_emails_table(self, emails: List[Dict]):
         self.emails_table.setRowCount(0)
@@ -443,10 +459,74 @@ class MainWindow(QMainWindow):
         self.emails_table.resizeRowsToContents()
     
     def on_filter_changed(self):
+        # Results for the old filter are no longer wanted
+        self.fetcher.cancel()
+        for view, model in (('readings', self.readings_model), ('alerts', self.alerts_model)):
+            self.more_fetchers[view].cancel()
+            model.cancel_fetch()
+        self.refresh_pending = False
+        self.api_client.reset_sync()
+        self.chart_widget.reset_series()
         self.refresh_data()
+        if self.stream_listener is not None:
+            self.start_stream()
+    
+    def start_stream(self):
+        self.stop_stream()
+        if not self.live_checkbox.isChecked():
+            return
+        self.stream_listener = StreamListener(
+            self.api_client.base_url, device_id=self.device_combo.currentData()
+        )
+        self.stream_listener.reading_received.connect(self.on_stream_event)
+        self.stream_listener.alert_received.connect(self.on_stream_event)
+        self.stream_listener.alert_updated.connect(self.on_stream_event)
+        self.stream_listener.reset_received.connect(self.on_stream_event)
+        self.stream_listener.connection_changed.connect(self.on_stream_connection)
+        self.stream_listener.start()
+    
+    def stop_stream(self):
+        listener = self.stream_listener
+        if listener is not None:
+            self.stream_listener = None
+            # stop() returns at once; hold on to the thread until it ends
+            self.stopping_listeners.add(listener)
+            listener.finished.connect(self.on_listener_finished)
+            listener.stop()
+        self.live_status_label.setText("(Stream: off)")
+    
+    def on_listener_finished(self):
+        self.stopping_listeners = {
+            listener for listener in self.stopping_listeners if not listener.isFinished()
+        }
+    
+    def on_stream_event(self, _event=None):
+        if not self.live_refresh_timer.isActive():
+            self.live_refresh_timer.start(500)
+    
+    def on_stream_connection(self, connected: bool):
+        self.live_status_label.setText(
+            "(Stream: live)" if connected else "(Stream: reconnecting...)"
+        )
+    
+    def toggle_live_updates(self, _state=None):
+        # stateChanged passes an int, which never equals Qt.Checked in PySide6
+        if self.live_checkbox.isChecked():
+            self.start_stream()
+        else:
+            self.stop_stream()
+    
+    def closeEvent(self, event):
+        self.stop_stream()
+        for fetcher in (self.fetcher, *self.more_fetchers.values()):
+            fetcher.cancel()
+            fetcher.wait()
+        for listener in self.stopping_listeners:
+            listener.wait(1000)
+        super().closeEvent(event)
     
-    def toggle_auto_refresh(self, state):
-        if state == Qt.Checked:
+    def toggle_auto_refresh(self, _state=None):
+        if self.auto_refresh_checkbox.isChecked():
             self.auto_refresh_timer.start(7000)
             self.auto_refresh_checkbox.setText("Auto Refresh (ON)")
         else:
@@ -0,0 +1,114 @@
+import json
+import socket
+import threading
+from typing import Optional
+
+import requests
+from PySide6.QtCore import QThread, Signal
+
+
+class StreamListener(QThread):
+    """Follows the server's /api/stream feed on a background thread.
+
+    Reconnects with the last event id, so nothing is missed across network
+    hiccups or server restarts; the server sends ``reset`` when the gap is
+    too large to replay.
+
+    ``stop`` never blocks: it shuts the connection's socket down, which
+    wakes a read in progress, and the thread winds down on its own. Keep a
+    reference until ``finished``; a QThread must not be destroyed while it
+    runs.
+    """
+
+    reading_received = Signal(dict)
+    alert_received = Signal(dict)
+    alert_updated = Signal(dict)
+    reset_received = Signal()
+    connection_changed = Signal(bool)
+
+    def __init__(self, base_url: str, device_id: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url
+        self.device_id = device_id
+        self.last_event_id: Optional[str] = None
+        self._stopped = threading.Event()
+        self._response = None
+
+    def stop(self):
+        self._stopped.set()
+        response = self._response
+        if response is None:
+            return
+        try:
+            response.raw.connection.sock.shutdown(socket.SHUT_RDWR)
+        except (AttributeError, OSError):
+            # Already released or closed: the thread is on its way out
+            pass
+
+    def run(self):
+        retry_seconds = 3.0
+        session = requests.Session()
+        while not self._stopped.is_set():
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            params = {"device_id": self.device_id} if self.device_id else {}
+            try:
+                with session.get(f"{self.base_url}/api/stream", params=params,
+                                 headers=headers, stream=True,
+                                 timeout=(3, 60)) as response:
+                    response.raise_for_status()
+                    self._response = response
+                    if self._stopped.is_set():
+                        break
+                    self.connection_changed.emit(True)
+                    retry_seconds = self._consume(response, retry_seconds)
+            except Exception:
+                pass
+            finally:
+                self._response = None
+            if self._stopped.is_set():
+                break
+            self.connection_changed.emit(False)
+            self._stopped.wait(retry_seconds)
+        session.close()
+
+    def _consume(self, response, retry_seconds: float) -> float:
+        event, data, event_id = "message", [], None
+        for line in response.iter_lines(decode_unicode=True):
+            if self._stopped.is_set():
+                break
+            if line is None:
+                continue
+            if line == "":
+                if data or event_id:
+                    self._dispatch(event, "\n".join(data), event_id)
+                event, data, event_id = "message", [], None
+            elif line.startswith(":"):
+                continue
+            else:
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event = value
+                elif field == "data":
+                    data.append(value)
+                elif field == "id":
+                    event_id = value
+                elif field == "retry" and value.isdigit():
+                    retry_seconds = int(value) / 1000
+        return retry_seconds
+
+    def _dispatch(self, event: str, data: str, event_id: Optional[str]):
+        if self._stopped.is_set():
+            return
+        if event_id:
+            self.last_event_id = event_id
+        if event == "reading":
+            self.reading_received.emit(json.loads(data))
+        elif event == "alert":
+            self.alert_received.emit(json.loads(data))
+        elif event == "alert_update":
+            self.alert_updated.emit(json.loads(data))
+        elif event == "reset":
+            self.reset_received.emit()
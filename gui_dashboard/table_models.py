@@ -0,0 +1,259 @@
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QBrush, QColor, QFont
+
+
+# Styles are shared by every cell that uses them instead of being created
+# per item; Qt only keeps references to them.
+
+@lru_cache(maxsize=None)
+def _brush(r: int, g: int, b: int) -> QBrush:
+    return QBrush(QColor(r, g, b))
+
+
+@lru_cache(maxsize=None)
+def _bold_font(size: int) -> QFont:
+    return QFont("Arial", size, QFont.Bold)
+
+
+ALERT_COLORS = {
+    'HIGH_TEMP': ((255, 180, 180), (139, 0, 0)),
+    'HUMIDITY': ((255, 200, 120), (139, 69, 0)),
+    'MOTION': ((255, 240, 150), (139, 115, 0)),
+}
+DEFAULT_ALERT_COLORS = ((200, 200, 240), (0, 0, 139))
+
+
+class ColumnTableModel(QAbstractTableModel):
+    """Read-only table model that keeps rows as one compact array per field.
+
+    Numeric fields live in ``array`` buffers, strings in plain lists, so a
+    row costs a few machine words rather than a dict plus one item object
+    per cell. Rows are stored oldest first, which makes the common case,
+    new rows arriving at the top of the view, an append; view row ``r`` is
+    storage index ``len - 1 - r``.
+
+    Older rows are loaded on demand: when the view scrolls to the bottom,
+    Qt calls ``fetchMore`` and the model emits ``more_requested`` with the
+    oldest id it holds. Whoever owns the API client answers with
+    ``append_older``.
+    """
+
+    more_requested = Signal(int)
+
+    # (header, row key, array typecode or None for a list)
+    COLUMNS: List[Tuple[str, str, Optional[str]]] = []
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.row_limit = 0
+        self.has_more = False
+        self._fetching = False
+        self._columns: Dict[str, object] = {}
+        self._clear_columns()
+
+    def _clear_columns(self):
+        self._columns = {
+            key: array(typecode) if typecode else []
+            for _, key, typecode in self.COLUMNS
+        }
+
+    def _size(self) -> int:
+        return len(self._columns['id'])
+
+    def _field(self, row: int, key: str):
+        return self._columns[key][self._size() - 1 - row]
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._size()
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        return self.cell(index.row(), index.column(), role)
+
+    def cell(self, row: int, column: int, role):
+        if role == Qt.DisplayRole:
+            value = self._field(row, self.COLUMNS[column][1])
+            return "" if value is None else str(value)
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self.has_more and not self._fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent) and self._size():
+            self._fetching = True
+            self.more_requested.emit(self._columns['id'][0])
+
+    def oldest_id(self) -> Optional[int]:
+        return self._columns['id'][0] if self._size() else None
+
+    def set_rows(self, rows: List[Dict], limit: int):
+        """Replace everything with ``rows`` (newest first)."""
+        self.beginResetModel()
+        self._clear_columns()
+        self._extend(reversed(rows))
+        self.row_limit = limit
+        self.has_more = len(rows) >= limit
+        self._fetching = False
+        self.endResetModel()
+
+    def prepend_rows(self, rows: List[Dict]):
+        """Add newer rows (newest first) at the top and trim to ``row_limit``."""
+        if not rows:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(rows) - 1)
+        self._extend(reversed(rows))
+        self.endInsertRows()
+
+        excess = self._size() - self.row_limit
+        if excess > 0:
+            size = self._size()
+            self.beginRemoveRows(QModelIndex(), size - excess, size - 1)
+            for column in self._columns.values():
+                del column[:excess]
+            self.endRemoveRows()
+            self.has_more = True
+
+    def merge_rows(self, rows: List[Dict]):
+        """Apply rows (newest first) that are new or changed: rows already
+        shown are updated in place, newer ones go on top."""
+        ids = self._columns['id']
+        newest = ids[-1] if ids else 0
+        last_column = len(self.COLUMNS) - 1
+        for row in rows:
+            if row['id'] > newest:
+                continue
+            index = bisect_left(ids, row['id'])
+            if index == len(ids) or ids[index] != row['id']:
+                # Not loaded (scrolled out or never fetched)
+                continue
+            for _, key, _ in self.COLUMNS:
+                self._columns[key][index] = self.convert(key, row.get(key))
+            view_row = len(ids) - 1 - index
+            self.dataChanged.emit(self.index(view_row, 0), self.index(view_row, last_column))
+        self.prepend_rows([row for row in rows if row['id'] > newest])
+    
+    def append_older(self, rows: List[Dict], page_size: int):
+        """Add a page of older rows (newest first) below the current ones."""
+        self._fetching = False
+        self.has_more = len(rows) >= page_size
+        if not rows:
+            return
+        size = self._size()
+        self.beginInsertRows(QModelIndex(), size, size + len(rows) - 1)
+        older = {key: [] for _, key, _ in self.COLUMNS}
+        for row in reversed(rows):
+            for _, key, _ in self.COLUMNS:
+                older[key].append(self.convert(key, row.get(key)))
+        for _, key, typecode in self.COLUMNS:
+            values = older[key]
+            self._columns[key] = (array(typecode, values) if typecode else values) + self._columns[key]
+        self.row_limit = size + len(rows)
+        self.endInsertRows()
+
+    def cancel_fetch(self):
+        self._fetching = False
+
+    def _extend(self, rows):
+        columns = self._columns
+        for row in rows:
+            for _, key, _ in self.COLUMNS:
+                columns[key].append(self.convert(key, row.get(key)))
+
+    def convert(self, key: str, value):
+        return value
+
+
+class ReadingsTableModel(ColumnTableModel):
+
+    COLUMNS = [
+        ("ID", 'id', 'q'),
+        ("Device ID", 'device_id', None),
+        ("Location", 'location', None),
+        ("Temperature (°C)", 'temperature', 'd'),
+        ("Humidity (%)", 'humidity', 'd'),
+        ("Motion", 'motion', 'b'),
+        ("Created At", 'created_at', None),
+    ]
+
+    def convert(self, key: str, value):
+        if key in ('temperature', 'humidity'):
+            return float(value or 0)
+        if key == 'motion':
+            return 1 if value else 0
+        return value
+
+    def cell(self, row: int, column: int, role):
+        key = self.COLUMNS[column][1]
+        if role == Qt.DisplayRole:
+            value = self._field(row, key)
+            if key in ('temperature', 'humidity'):
+                return f"{value:.1f}"
+            if key == 'motion':
+                return "●" if value else "○"
+            return "" if value is None else str(value)
+        if role == Qt.TextAlignmentRole and key in ('temperature', 'humidity', 'motion'):
+            return Qt.AlignCenter
+        if key == 'motion':
+            if role == Qt.FontRole:
+                return _bold_font(12)
+            if role == Qt.ForegroundRole:
+                return _brush(200, 0, 0) if self._field(row, key) else _brush(150, 150, 150)
+        return None
+
+
+class AlertsTableModel(ColumnTableModel):
+
+    COLUMNS = [
+        ("ID", 'id', 'q'),
+        ("Device ID", 'device_id', None),
+        ("Location", 'location', None),
+        ("Alert Type", 'alert_type', None),
+        ("Message", 'message', None),
+        ("Emailed", 'emailed', 'b'),
+        ("Repeats", 'repeat_count', 'q'),
+        ("Created At", 'created_at', None),
+        ("Closed At", 'closed_at', None),
+    ]
+
+    def convert(self, key: str, value):
+        if key == 'emailed':
+            return 1 if value else 0
+        if key == 'repeat_count':
+            return int(value or 1)
+        return value
+
+    def cell(self, row: int, column: int, role):
+        key = self.COLUMNS[column][1]
+        if role == Qt.DisplayRole:
+            value = self._field(row, key)
+            if key == 'emailed':
+                return "✓" if value else "✗"
+            return "" if value is None else str(value)
+        if role in (Qt.BackgroundRole, Qt.ForegroundRole):
+            background, foreground = ALERT_COLORS.get(
+                self._field(row, 'alert_type'), DEFAULT_ALERT_COLORS
+            )
+            return _brush(*(background if role == Qt.BackgroundRole else foreground))
+        if role == Qt.FontRole:
+            if key == 'alert_type':
+                return _bold_font(9)
+            if key == 'emailed':
+                return _bold_font(10)
+        if role == Qt.TextAlignmentRole and key in ('emailed', 'repeat_count'):
+            return Qt.AlignCenter
+        return None
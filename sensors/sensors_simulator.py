@@ -1,10 +1,30 @@
+"""Virtual sensors for the IoT Alert System.
+
+Without arguments it behaves like a small home setup: three sensors posting
+a reading every 5 seconds. ``--load`` turns it into a load generator for
+fleet-sized tests:
+
+    python sensors/sensors_simulator.py --load --devices 5000 --rate 500 --duration 60
+    python sensors/sensors_simulator.py --load --devices 5000 --rate 2000 --batch-size 50
+
+Load mode is open-loop: requests are scheduled at fixed times derived from
+``--rate`` and latency is measured from the scheduled time, so a slow
+backend shows up as latency instead of silently lowering the send rate.
+"""
+import argparse
+import math
 import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import requests
+import requests.adapters
 
 API_URL = "http://127.0.0.1:9000/api/readings"
+# Busy answers (429/503) a demo reading is retried after before it is dropped
+MAX_RETRIES = 3
 
 DEVICES = [
     ("sensor-1", "living_room"),
@@ -12,6 +32,11 @@ DEVICES = [
     ("sensor-3", "kitchen"),
 ]
 
+LOCATIONS = [
+    "living_room", "bedroom", "kitchen", "garage", "office",
+    "hallway", "basement", "attic", "bathroom", "server_room",
+]
+
 
 def generate_reading(device_id: str, location: str) -> dict:
     temperature = random.uniform(20.0, 35.0)
@@ -27,17 +52,228 @@ def generate_reading(device_id: str, location: str) -> dict:
     }
 
 
-def main():
+class VirtualDevice:
+    """A sensor whose values drift around its own baseline.
+
+    Temperature and humidity follow a mean-reverting random walk, with a
+    rare excursion so the alert rules fire at a realistic rate rather than
+    on every other reading.
+    """
+
+    def __init__(self, device_id: str, location: str, rng: random.Random):
+        self.device_id = device_id
+        self.location = location
+        self.rng = rng
+        self.base_temperature = rng.uniform(19.0, 26.0)
+        self.base_humidity = rng.uniform(35.0, 60.0)
+        self.temperature = self.base_temperature
+        self.humidity = self.base_humidity
+        self.motion_rate = rng.uniform(0.01, 0.2)
+
+    def next_reading(self) -> dict:
+        rng = self.rng
+        self.temperature += (0.1 * (self.base_temperature - self.temperature)
+                             + rng.gauss(0, 0.3))
+        self.humidity += (0.1 * (self.base_humidity - self.humidity)
+                          + rng.gauss(0, 0.8))
+        if rng.random() < 0.002:
+            self.temperature += rng.uniform(8.0, 15.0)
+        if rng.random() < 0.002:
+            self.humidity += rng.choice((-1, 1)) * rng.uniform(20.0, 35.0)
+        temperature = self.temperature
+        humidity = min(100.0, max(0.0, self.humidity))
+        return {
+            "device_id": self.device_id,
+            "location": self.location,
+            "temperature": round(temperature, 2),
+            "humidity": round(humidity, 2),
+            "motion": rng.random() < self.motion_rate,
+        }
+
+
+def make_fleet(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [
+        VirtualDevice(
+            f"vsensor-{i + 1:05d}",
+            f"{LOCATIONS[i % len(LOCATIONS)]}-{i // len(LOCATIONS) + 1}",
+            rng,
+        )
+        for i in range(count)
+    ]
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def latency_histogram(samples, buckets_per_decade: int = 4) -> list:
+    """(upper bound in ms, count) for log-spaced buckets covering the samples."""
+    if not samples:
+        return []
+    edges = []
+    low = min(samples) * 1000
+    high = max(samples) * 1000
+    exponent = math.floor(math.log10(max(low, 0.01)) * buckets_per_decade)
+    while True:
+        edge = 10 ** (exponent / buckets_per_decade)
+        edges.append(edge)
+        if edge >= high:
+            break
+        exponent += 1
+    counts = [0] * len(edges)
+    for sample in samples:
+        ms = sample * 1000
+        for i, edge in enumerate(edges):
+            if ms <= edge:
+                counts[i] += 1
+                break
+    return list(zip(edges, counts))
+
+
+class LoadGenerator:
+    """Sends readings for a virtual fleet at a fixed aggregate rate."""
+
+    def __init__(self, url: str, devices: list, rate: float, duration: float,
+                 concurrency: int, batch_size: int = 1, timeout: float = 10.0):
+        self.url = url
+        self.devices = devices
+        self.rate = rate
+        self.duration = duration
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.readings_sent = 0
+        self.late_starts = 0
+
+    def _session(self) -> requests.Session:
+        # One keep-alive connection per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def _send(self, scheduled: float, readings: list):
+        url = self.url if self.batch_size == 1 else f"{self.url}/batch"
+        body = readings[0] if self.batch_size == 1 else readings
+        status = None
+        try:
+            resp = self._session().post(url, json=body, timeout=self.timeout)
+            status = resp.status_code
+        except requests.exceptions.RequestException:
+            pass
+        latency = time.perf_counter() - scheduled
+        with self._lock:
+            if status is None:
+                self.errors += 1
+                return
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if 200 <= status < 300:
+                self.latencies.append(latency)
+                self.readings_sent += len(readings)
+
+    def run(self) -> dict:
+        interval = self.batch_size / self.rate
+        total = max(1, int(self.duration / interval))
+        rng = random.Random()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            start = time.perf_counter()
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                elif delay < -interval:
+                    self.late_starts += 1
+                readings = [rng.choice(self.devices).next_reading()
+                            for _ in range(self.batch_size)]
+                pool.submit(self._send, scheduled, readings)
+            send_window = time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+        return {
+            "requests": total,
+            "send_window": send_window,
+            "elapsed": elapsed,
+            "throughput": self.readings_sent / elapsed if elapsed else 0.0,
+        }
+
+
+def report(gen: LoadGenerator, result: dict):
+    latencies = gen.latencies
+    print()
+    print(f"Target rate:     {gen.rate:.0f} readings/s "
+          f"({len(gen.devices)} devices, batch size {gen.batch_size}, "
+          f"{gen.concurrency} connections)")
+    print(f"Requests:        {result['requests']} scheduled, "
+          f"{sum(gen.statuses.values())} answered, {gen.errors} failed")
+    print(f"Status codes:    {dict(sorted(gen.statuses.items()))}")
+    print(f"Achieved:        {result['throughput']:.1f} readings/s accepted "
+          f"over {result['elapsed']:.1f}s")
+    if gen.late_starts:
+        print(f"Scheduler lag:   {gen.late_starts} requests started late "
+              f"(increase --concurrency or lower --rate)")
+    if not latencies:
+        return
+    print(f"Latency (ms):    p50={percentile(latencies, 50) * 1000:.1f} "
+          f"p95={percentile(latencies, 95) * 1000:.1f} "
+          f"p99={percentile(latencies, 99) * 1000:.1f} "
+          f"max={max(latencies) * 1000:.1f}")
+    print()
+    histogram = latency_histogram(latencies)
+    peak = max(count for _, count in histogram) or 1
+    for edge, count in histogram:
+        print(f"  <= {edge:9.1f} ms {count:8d} {'#' * round(40 * count / peak)}")
+
+
+def post_with_retry(session: requests.Session, reading: dict):
+    """POST a reading, waiting out Retry-After when the backend sheds load.
+
+    Returns the final response, or None if the reading was dropped after
+    MAX_RETRIES busy answers.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        resp = session.post(API_URL, json=reading, timeout=5)
+        if resp.status_code not in (429, 503):
+            return resp
+        if attempt == MAX_RETRIES:
+            break
+        delay = float(resp.headers.get("Retry-After", 1))
+        print(f"Backend busy ({resp.status_code}), retrying {reading['device_id']} "
+              f"in {delay:.0f}s")
+        time.sleep(delay)
+    print(f"Backend still busy, dropped reading from {reading['device_id']}")
+    return None
+
+
+def run_simulator():
     print("Starting virtual sensor simulator. Press Ctrl+C to stop.")
+    session = requests.Session()
     while True:
         for device_id, location in DEVICES:
             reading = generate_reading(device_id, location)
             try:
-                resp = requests.post(API_URL, json=reading, timeout=5)
-                if resp.status_code == 200:
+                resp = post_with_retry(session, reading)
+                if resp is None:
+                    continue
+                timestamp = datetime.now().isoformat(timespec="seconds")
+                if resp.status_code == 202:
+                    # INGEST_MODE=buffered: stored later, alerts not known yet
+                    print(f"[{timestamp}] Queued #{resp.json()['sequence']}:", reading)
+                elif 200 <= resp.status_code < 300:
                     data = resp.json()
                     alerts = data.get("alerts", [])
-                    timestamp = datetime.now().isoformat(timespec="seconds")
                     if alerts:
                         print(f"[{timestamp}] ALERTS:", alerts)
                     else:
@@ -47,7 +283,41 @@ def main():
             except Exception as exc:
                 print("Failed to send reading:", exc)
 
-        time.sleep(5) 
+        time.sleep(5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Virtual IoT sensors and load generator.")
+    parser.add_argument("--load", action="store_true",
+                        help="run as a load generator instead of three demo sensors")
+    parser.add_argument("--url", default=API_URL)
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=200.0,
+                        help="aggregate readings per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="worker threads, each with one keep-alive connection")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="readings per request; >1 uses /api/readings/batch")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.load:
+        run_simulator()
+        return
+
+    gen = LoadGenerator(
+        args.url, make_fleet(args.devices, args.seed), args.rate, args.duration,
+        args.concurrency, args.batch_size,
+    )
+    print(f"Sending {args.rate:.0f} readings/s from {args.devices} virtual devices "
+          f"for {args.duration:.0f}s...")
+    try:
+        result = gen.run()
+    except KeyboardInterrupt:
+        print("Interrupted.")
+        return
+    report(gen, result)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The app creates its SQLite database and logs/ relative to the working
+# directory at import time; keep both out of the source tree.
+os.chdir(tempfile.mkdtemp(prefix="iot-tests-"))
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import alert_state, anomaly, response_cache, rules  # noqa: E402
+from app.reading_log import reading_log  # noqa: E402
+from app.config import settings  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    yield
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    alert_state.table.clear()
+    anomaly.tracker.clear()
+    reading_log.clear()
+    response_cache.cache.invalidate()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def reading():
+    """A valid payload that raises no alert; vary it with dict(reading, ...)."""
+    return {
+        "device_id": "sensor-1",
+        "location": "lab",
+        "temperature": 22.0,
+        "humidity": 50.0,
+        "motion": False,
+    }
+
+
+@pytest.fixture
+def night_always(monkeypatch):
+    """Make every hour count as night so MOTION_NIGHT always fires."""
+    monkeypatch.setattr(settings, "night_start_hour", 0)
+    monkeypatch.setattr(settings, "night_end_hour", 24)
+    rules.reload_plan()
+    yield
+    monkeypatch.undo()
+    rules.reload_plan()
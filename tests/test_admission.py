@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app import admission
+from app.config import settings
+
+
+def test_classify():
+    assert admission.classify("POST", "/api/readings/batch") == admission.INGEST
+    assert admission.classify("GET", "/api/alerts") == admission.READ
+    assert admission.classify("GET", "/api/stream") is None
+    assert admission.classify("GET", "/metrics") is None
+
+
+def test_waiting_ingest_goes_before_reads():
+    controller = admission.AdmissionController(
+        max_concurrent=1, read_max_concurrent=1, max_queued=2, queue_timeout=1.0
+    )
+    order = []
+
+    async def request(cls):
+        assert await controller.acquire(cls) is None
+        order.append(cls)
+        await asyncio.sleep(0.01)
+        controller.release(cls)
+
+    async def main():
+        assert await controller.acquire(admission.INGEST) is None
+        tasks = [asyncio.create_task(request(admission.READ))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(request(admission.INGEST)))
+        await asyncio.sleep(0)
+        assert controller.waiting(admission.READ) == controller.waiting(admission.INGEST) == 1
+        controller.release(admission.INGEST)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == [admission.INGEST, admission.READ]
+    assert controller.in_flight == {admission.INGEST: 0, admission.READ: 0}
+
+
+def test_queue_full_and_timeout_are_rejected():
+    controller = admission.AdmissionController(
+        max_concurrent=1, read_max_concurrent=1, max_queued=1, queue_timeout=0.01
+    )
+
+    async def main():
+        assert await controller.acquire(admission.INGEST) is None
+        waiter = asyncio.create_task(controller.acquire(admission.INGEST))
+        await asyncio.sleep(0)
+        assert await controller.acquire(admission.INGEST) == "queue_full"
+        assert await waiter == "timeout"
+        assert controller.waiting(admission.INGEST) == 0
+
+    asyncio.run(main())
+
+
+def test_overload_returns_429(client, monkeypatch, reading):
+    monkeypatch.setattr(admission.controller, "max_concurrent", 0)
+    monkeypatch.setattr(admission.controller, "max_queued", 0)
+    before = admission.rejections.value(admission.INGEST, "queue_full")
+
+    resp = client.post("/api/readings", json=reading)
+    assert resp.status_code == 429
+    assert resp.headers["retry-after"] == str(settings.admission_retry_after_seconds)
+    # Status endpoints stay reachable
+    status = client.get("/api/admission").json()
+    assert status["classes"]["ingest"]["rejected"]["queue_full"] == before + 1
+
+
+@pytest.fixture
+def device_limit(monkeypatch):
+    monkeypatch.setattr(settings, "device_rate_limit_per_second", 0.5)
+    monkeypatch.setattr(settings, "device_rate_limit_burst", 2.0)
+    admission.device_limiter.clear()
+    yield
+    admission.device_limiter.clear()
+
+
+def test_device_rate_limit(client, device_limit, reading):
+    assert client.post("/api/readings/batch", json=[reading, reading]).status_code == 200
+
+    resp = client.post("/api/readings", json=reading)
+    assert resp.status_code == 429
+    assert int(resp.headers["retry-after"]) == 2
+    # Other devices have their own bucket
+    assert client.post("/api/readings", json=dict(reading, device_id="sensor-2")).status_code == 200
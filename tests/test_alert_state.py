@@ -0,0 +1,139 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+from app import alert_state, migrations, models, rules
+from app.config import settings
+from app.database import Base
+
+HOT = {
+    "device_id": "sensor-1",
+    "location": "living_room",
+    "temperature": 35.0,
+    "humidity": 50.0,
+    "motion": False,
+}
+
+
+def _post(client, **changes):
+    resp = client.post("/api/readings", json=dict(HOT, **changes))
+    assert resp.status_code == 200
+    return resp.json()["alerts"]
+
+
+def _alerts(db):
+    db.expire_all()
+    return db.query(models.Alert).order_by(models.Alert.id).all()
+
+
+def test_sustained_excursion_is_one_alert(client, db):
+    first = _post(client)
+    assert [a["alert_type"] for a in first] == ["HIGH_TEMP"]
+    for _ in range(9):
+        assert _post(client) == []
+
+    (alert,) = _alerts(db)
+    assert alert.repeat_count == 10
+    assert alert.closed_at is None
+
+
+def test_hysteresis_band_keeps_alert_open(client, db):
+    threshold = settings.temp_high_threshold
+    _post(client)
+    # Below the threshold but inside the band: still open
+    _post(client, temperature=threshold - settings.temp_hysteresis / 2)
+    assert _alerts(db)[0].closed_at is None
+
+    _post(client, temperature=threshold - settings.temp_hysteresis - 1)
+    (alert,) = _alerts(db)
+    assert alert.closed_at is not None
+    assert alert.repeat_count == 1
+
+
+def test_retrigger_within_suppression_window_reopens(client, db):
+    _post(client)
+    _post(client, temperature=20.0)
+    assert _post(client) == []
+
+    (alert,) = _alerts(db)
+    assert alert.closed_at is None
+    assert alert.repeat_count == 2
+
+
+def test_retrigger_after_suppression_window_opens_new_episode(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "alert_suppression_seconds", 0)
+    _post(client)
+    _post(client, temperature=20.0)
+    assert [a["alert_type"] for a in _post(client)] == ["HIGH_TEMP"]
+
+    first, second = _alerts(db)
+    assert first.closed_at is not None
+    assert second.closed_at is None
+
+
+def test_episodes_are_per_device(client, db):
+    _post(client)
+    assert len(_post(client, device_id="sensor-2")) == 1
+    assert len(_alerts(db)) == 2
+
+
+def test_batch_open_repeat_and_close_in_one_insert(client, db):
+    batch = [HOT, HOT, dict(HOT, temperature=20.0)]
+    resp = client.post("/api/readings/batch", json=batch)
+    assert [len(item["alerts"]) for item in resp.json()] == [1, 0, 0]
+
+    (alert,) = _alerts(db)
+    assert alert.repeat_count == 2
+    assert alert.closed_at is not None
+
+
+def test_state_is_rebuilt_from_database(client, db):
+    _post(client)
+    alert_state.table.clear()
+
+    alert_state.table.load(db)
+    assert _post(client) == []
+    assert _alerts(db)[0].repeat_count == 2
+
+
+def test_dedup_can_be_disabled(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "alert_dedup_enabled", False)
+    _post(client)
+    _post(client)
+    assert len(_alerts(db)) == 2
+
+
+def test_schedule_window_end_clears_alert():
+    plan = rules.RulePlan(
+        [rules.Rule(alert_type="M", metric="motion", operator="==", threshold=1,
+                    start_hour=22, end_hour=6, message="m")]
+    )
+    reading = models.Reading(device_id="d", location="l", temperature=0,
+                             humidity=0, motion=True)
+    assert plan.assess(reading, datetime(2025, 1, 1, 23)) == ([("M", "m")], set())
+    assert plan.assess(reading, datetime(2025, 1, 1, 12)) == ([], {"M"})
+
+
+def test_migration_adds_episode_columns_and_closes_old_alerts(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE alerts (id INTEGER PRIMARY KEY, device_id VARCHAR, "
+            "location VARCHAR, alert_type VARCHAR, message VARCHAR, "
+            "emailed BOOLEAN, created_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO alerts (device_id, location, alert_type, message, "
+            "emailed, created_at) VALUES ('d', 'l', 'HIGH_TEMP', 'm', 0, "
+            "'2025-01-01 00:00:00')"
+        ))
+        conn.execute(text("PRAGMA user_version = 4"))
+    # As at startup: create_all adds missing tables, migrations alter old ones
+    Base.metadata.create_all(bind=engine)
+
+    assert migrations.run_migrations(engine) == migrations.LATEST_VERSION
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT repeat_count, closed_at FROM alerts")
+        ).one()
+    assert row == (1, "2025-01-01 00:00:00")
@@ -0,0 +1,178 @@
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import anomaly, models, rules
+from app.config import settings
+
+
+def _reading(device_id="sensor-1", temperature=22.0, humidity=50.0, seconds=0):
+    return models.Reading(
+        device_id=device_id,
+        location="lab",
+        temperature=temperature,
+        humidity=humidity,
+        motion=False,
+        created_at=datetime(2025, 1, 1) + timedelta(seconds=seconds),
+    )
+
+
+def test_rolling_window_matches_full_recompute():
+    rng = random.Random(7)
+    window = anomaly.RollingWindow(25)
+    values = []
+    for _ in range(1000):
+        x = rng.gauss(20, 5)
+        values.append(x)
+        window.push(x)
+
+    tail = values[-25:]
+    assert window.ordered() == tail
+    assert window.mean == pytest.approx(statistics.fmean(tail))
+    assert window.variance == pytest.approx(statistics.variance(tail))
+
+
+def test_derived_metrics(monkeypatch):
+    monkeypatch.setattr(settings, "anomaly_min_samples", 5)
+    tracker = anomaly.AnomalyTracker(window=10)
+    for i in range(10):
+        derived = tracker.observe(_reading(temperature=20.0 + (i % 2), seconds=i * 60))
+    assert derived["temperature_rate"] == pytest.approx(1.0)
+    assert abs(derived["temperature_zscore"]) < 2
+    assert derived["humidity_stuck"] == 10
+    assert derived["temperature_stuck"] == 1
+
+    spike = tracker.observe(_reading(temperature=40.0, seconds=660))
+    assert spike["temperature_zscore"] > 10
+    assert spike["temperature_rate"] == pytest.approx((40.0 - 21.0) / 2)
+
+
+def test_same_timestamp_has_no_rate():
+    tracker = anomaly.AnomalyTracker(window=10)
+    tracker.observe(_reading(temperature=20.0))
+    same = tracker.observe(_reading(temperature=21.0))
+    assert same["temperature_rate"] is None
+    later = tracker.observe(_reading(temperature=21.5, seconds=60))
+    assert later["temperature_rate"] == pytest.approx(0.5)
+
+
+def test_batch_spread_is_not_a_rapid_change(client, monkeypatch, reading):
+    monkeypatch.setattr(settings, "anomaly_rules_enabled", True)
+    rules.reload_plan()
+    try:
+        batch = [dict(reading, temperature=t) for t in (20.0, 21.0, 20.0, 21.0)]
+        body = client.post("/api/readings/batch", json=batch).json()
+    finally:
+        monkeypatch.undo()
+        rules.reload_plan()
+
+    assert [item["alerts"] for item in body] == [[]] * 4
+
+
+def test_zscore_needs_history():
+    tracker = anomaly.AnomalyTracker(window=10)
+    derived = tracker.observe(_reading())
+    assert derived["temperature_zscore"] is None
+    assert derived["temperature_rate"] is None
+
+
+def test_checkpoint_round_trip(db):
+    tracker = anomaly.AnomalyTracker(window=5)
+    for i in range(8):
+        tracker.observe(_reading(temperature=float(i), seconds=i))
+    assert tracker.checkpoint(db) == 1
+    db.commit()
+
+    restored = anomaly.AnomalyTracker(window=5)
+    assert restored.load(db) == 1
+    track = restored._devices["sensor-1"]["temperature"]
+    assert track.window.ordered() == [3.0, 4.0, 5.0, 6.0, 7.0]
+    assert track.last == 7.0
+    # Nothing changed since the checkpoint, nothing to write
+    assert restored.checkpoint(db) == 0
+
+
+def test_stuck_sensor_rule_raises_alert(client, monkeypatch, reading):
+    monkeypatch.setattr(settings, "anomaly_rules_enabled", True)
+    monkeypatch.setattr(settings, "anomaly_stuck_count", 3)
+    rules.reload_plan()
+    try:
+        types = [
+            sorted(a["alert_type"] for a in client.post("/api/readings", json=reading).json()["alerts"])
+            for _ in range(3)
+        ]
+    finally:
+        monkeypatch.undo()
+        rules.reload_plan()
+
+    assert types == [[], [], ["STUCK_HUMIDITY", "STUCK_TEMPERATURE"]]
+
+
+def test_plan_skips_tracker_without_derived_rules():
+    assert not rules.RulePlan(rules.default_rules()).uses_derived
+    assert rules.RulePlan(rules.anomaly_rules()).uses_derived
+
+
+def test_rollback_restores_touched_devices():
+    tracker = anomaly.AnomalyTracker(window=5)
+    tracker.observe(_reading(temperature=20.0))
+    tracker._dirty.clear()
+
+    tracker.begin()
+    tracker.observe(_reading(temperature=30.0, seconds=60))
+    tracker.observe(_reading(device_id="sensor-2"))
+    tracker.rollback()
+
+    track = tracker._devices["sensor-1"]["temperature"]
+    assert track.window.ordered() == [20.0]
+    assert track.last == 20.0
+    assert "sensor-2" not in tracker._devices
+    assert tracker._dirty == {"sensor-1"}
+
+
+def test_rollback_unwinds_a_full_window(db):
+    tracker = anomaly.AnomalyTracker(window=3)
+    for i in range(5):
+        tracker.observe(_reading(temperature=20.0 + i, seconds=i * 60))
+    before = tracker._devices["sensor-1"]["temperature"].to_dict()
+    window = tracker._devices["sensor-1"]["temperature"].window
+    stats = (window.pos, window.n, window.mean, window.m2)
+
+    tracker.begin()
+    for i in range(4):
+        tracker.observe(_reading(temperature=40.0 + i, seconds=600 + i * 60))
+    tracker.checkpoint(db)
+    tracker.observe(_reading(temperature=50.0, seconds=900))
+    tracker.rollback()
+
+    assert tracker._devices["sensor-1"]["temperature"].to_dict() == before
+    assert (window.pos, window.n, window.mean, window.m2) == stats
+    # The checkpoint was part of the rolled-back transaction
+    assert tracker._dirty == {"sensor-1"}
+
+
+def test_failed_ingest_leaves_no_trace(client, db, monkeypatch, reading):
+    from app import devices
+
+    monkeypatch.setattr(settings, "anomaly_rules_enabled", True)
+    monkeypatch.setattr(settings, "anomaly_stuck_count", 2)
+    rules.reload_plan()
+    try:
+        assert client.post("/api/readings", json=reading).status_code == 200
+
+        def fail(db, readings, new_alerts=()):
+            raise RuntimeError("disk full")
+
+        with monkeypatch.context() as m:
+            m.setattr(devices, "apply_readings", fail)
+            with pytest.raises(RuntimeError, match="disk full"):
+                client.post("/api/readings", json=reading)
+
+        # The rolled-back reading did not count towards the stuck run
+        assert anomaly.tracker._devices["sensor-1"]["temperature"].run == 1
+        assert db.query(models.Reading).count() == 1
+    finally:
+        monkeypatch.undo()
+        rules.reload_plan()
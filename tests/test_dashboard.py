@@ -0,0 +1,95 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip("PySide6.QtWidgets")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtCore import Qt  # noqa: E402
+from PySide6.QtWidgets import QApplication  # noqa: E402
+
+from gui_dashboard.api_client import APIClient  # noqa: E402
+from gui_dashboard.main import MainWindow  # noqa: E402
+from gui_dashboard.table_models import AlertsTableModel  # noqa: E402
+
+
+@pytest.fixture
+def window():
+    app = QApplication.instance() or QApplication([])
+    # Nothing listens here: every request fails fast
+    win = MainWindow()
+    win.api_client.base_url = "http://127.0.0.1:9"
+    yield win
+    win.close()
+    app.processEvents()
+
+
+def test_live_updates_toggle_restarts_the_stream(window):
+    window.live_checkbox.setChecked(False)
+    assert window.stream_listener is None
+
+    window.live_checkbox.setChecked(True)
+    assert window.stream_listener is not None
+    assert window.stream_listener.isRunning()
+
+
+def test_stopping_the_stream_does_not_block(window):
+    listener = window.stream_listener
+    # Let it fail to connect and back off before it is stopped
+    time.sleep(0.2)
+
+    started = time.monotonic()
+    window.stop_stream()
+    assert time.monotonic() - started < 0.5
+    assert listener in window.stopping_listeners
+    assert listener.wait(2000)
+
+
+def test_auto_refresh_toggle(window):
+    window.auto_refresh_checkbox.setChecked(True)
+    assert window.auto_refresh_timer.isActive()
+    window.auto_refresh_checkbox.setChecked(False)
+    assert not window.auto_refresh_timer.isActive()
+
+
+def _alert(id, **changes):
+    row = {"id": id, "device_id": "sensor-1", "location": "lab", "alert_type": "HIGH_TEMP",
+           "message": "hot", "emailed": False, "repeat_count": 1,
+           "created_at": "2025-01-01T10:00:00", "closed_at": None,
+           "updated_at": "2025-01-01T10:00:00"}
+    row.update(changes)
+    return row
+
+
+def test_alert_changes_are_merged_in_place():
+    QApplication.instance() or QApplication([])
+    model = AlertsTableModel()
+    model.set_rows([_alert(3), _alert(2)], 50)
+
+    # Alert 1 changed too, but is older than anything loaded
+    model.merge_rows([_alert(4), _alert(2, repeat_count=5, emailed=True), _alert(1)])
+
+    assert [model.cell(row, 0, Qt.DisplayRole) for row in range(model.rowCount())] == ["4", "3", "2"]
+    columns = [key for _, key, _ in AlertsTableModel.COLUMNS]
+    assert model.cell(2, columns.index('repeat_count'), Qt.DisplayRole) == "5"
+    assert model.cell(2, columns.index('emailed'), Qt.DisplayRole) == "✓"
+
+
+def test_alerts_sync_by_updated_at(monkeypatch):
+    client = APIClient()
+    calls = []
+
+    def get_alerts(**params):
+        calls.append(params)
+        return [_alert(7, updated_at="2025-01-01T10:00:09")]
+
+    monkeypatch.setattr(client, "get_alerts", get_alerts)
+    assert client.get_new_alerts(50)[1] is True
+    client.mark_seen('alerts', None, [_alert(7, updated_at="2025-01-01T10:00:09"),
+                                      _alert(6, updated_at="2025-01-01T10:00:30")])
+    assert client.last_seen('alerts', None) == "2025-01-01T10:00:30"
+
+    rows, full = client.get_new_alerts(50, watermark=client.last_seen('alerts', None))
+    assert not full and rows[0]['id'] == 7
+    assert calls[-1]['updated_since'] == "2025-01-01T10:00:25"
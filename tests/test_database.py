@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+from app.database import create_db_engine, engine
+
+
+def pragma(conn, name):
+    return conn.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_storage_profile_applied_to_connections():
+    with engine.connect() as conn:
+        assert pragma(conn, "journal_mode") == "wal"
+        assert pragma(conn, "synchronous") == 1  # NORMAL
+        assert pragma(conn, "temp_store") == 2  # MEMORY
+        assert pragma(conn, "busy_timeout") == 5000
+        assert pragma(conn, "cache_size") == -65536
+    assert engine.pool.size() == 10
+
+
+def test_untuned_engine_keeps_sqlite_defaults(tmp_path):
+    plain = create_db_engine(f"sqlite:///{tmp_path / 'plain.db'}", tuned=False)
+    try:
+        with plain.connect() as conn:
+            assert pragma(conn, "journal_mode") == "delete"
+            assert pragma(conn, "synchronous") == 2  # FULL
+    finally:
+        plain.dispose()
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app import devices, migrations, models
+from app.config import settings
+from app.database import Base
+
+
+def test_ingest_upserts_latest_state(client, reading):
+    client.post("/api/readings/batch", json=[
+        reading,
+        dict(reading, temperature=23.5),
+        dict(reading, device_id="sensor-2", location="garage"),
+    ])
+    client.post("/api/readings", json=dict(reading, humidity=55.0, motion=True))
+
+    body = client.get("/api/devices").json()
+    assert [d["device_id"] for d in body] == ["sensor-1", "sensor-2"]
+    first = body[0]
+    assert first["reading_count"] == 3
+    assert (first["temperature"], first["humidity"], first["motion"]) == (22.0, 55.0, True)
+    assert first["first_seen_at"] <= first["last_seen_at"]
+    assert first["stale"] is False
+
+
+def test_open_alert_count_follows_episodes(client, reading):
+    client.post("/api/readings", json=dict(reading, temperature=40.0))
+    client.post("/api/readings", json=dict(reading, temperature=40.0, humidity=90.0))
+    assert client.get("/api/devices").json()[0]["open_alert_count"] == 2
+
+    client.post("/api/readings", json=reading)
+    assert client.get("/api/devices").json()[0]["open_alert_count"] == 0
+
+
+def test_open_alert_count_without_dedup(client, monkeypatch, reading):
+    monkeypatch.setattr(settings, "alert_dedup_enabled", False)
+    client.post("/api/readings", json=dict(reading, temperature=40.0))
+    client.post("/api/readings/batch", json=[
+        dict(reading, temperature=40.0, humidity=90.0),
+        dict(reading, device_id="sensor-2"),
+    ])
+    # No episodes: alerts never close, so every alert counts
+    counts = {d["device_id"]: d["open_alert_count"] for d in client.get("/api/devices").json()}
+    assert counts == {"sensor-1": 3, "sensor-2": 0}
+
+
+def test_stale_filter(client, db, reading):
+    client.post("/api/readings", json=reading)
+    client.post("/api/readings", json=dict(reading, device_id="sensor-old"))
+    old = datetime.utcnow() - timedelta(seconds=settings.device_stale_seconds + 60)
+    db.query(models.Device).filter_by(device_id="sensor-old").update({"last_seen_at": old})
+    db.commit()
+
+    stale = client.get("/api/devices", params={"stale": True}).json()
+    assert [(d["device_id"], d["stale"]) for d in stale] == [("sensor-old", True)]
+    fresh = client.get("/api/devices", params={"stale": False}).json()
+    assert [d["device_id"] for d in fresh] == ["sensor-1"]
+
+
+def test_device_list_does_not_touch_readings(db):
+    sql = str(devices.devices_query(db, stale=True).statement.compile())
+    assert "readings" not in sql
+
+
+def test_migration_backfills_registry(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for temp in (20.0, 21.0):
+            conn.execute(text(
+                "INSERT INTO readings (device_id, location, temperature, humidity, "
+                "motion, created_at) VALUES ('d', 'l', :t, 50, 0, '2025-01-01 00:00:00')"
+            ), {"t": temp})
+        conn.execute(text("PRAGMA user_version = 5"))
+
+    migrations.run_migrations(engine)
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT device_id, temperature, reading_count FROM devices")
+        ).one()
+    assert tuple(row) == ("d", 21.0, 2)
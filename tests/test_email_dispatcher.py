@@ -0,0 +1,103 @@
+import pytest
+
+from app import models
+from app.config import settings
+from app.email_dispatcher import EmailDispatcher
+from app.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    with SMTPSink() as smtp_sink:
+        monkeypatch.setattr(settings, "smtp_host", smtp_sink.host)
+        monkeypatch.setattr(settings, "smtp_port", smtp_sink.port)
+        monkeypatch.setattr(settings, "smtp_starttls", False)
+        monkeypatch.setattr(settings, "email_from", "iot@example.com")
+        monkeypatch.setattr(settings, "email_to", "ops@example.com")
+        yield smtp_sink
+
+
+def make_alerts(db, count):
+    rows = [
+        models.Alert(
+            device_id=f"sensor-{i}",
+            location="lab",
+            alert_type="HIGH_TEMP",
+            message=f"High temperature {i}",
+        )
+        for i in range(count)
+    ]
+    db.add_all(rows)
+    db.commit()
+    return rows
+
+
+def emailed_count(db):
+    db.expire_all()
+    return db.query(models.Alert).filter(models.Alert.emailed == True).count()  # noqa: E712
+
+
+def test_delivers_over_reused_connections(db, sink):
+    dispatcher = EmailDispatcher(workers=3, queue_size=500)
+    dispatcher.start()
+    try:
+        assert dispatcher.submit(make_alerts(db, 200)) == 200
+        assert dispatcher.join(timeout=30)
+    finally:
+        dispatcher.stop()
+
+    assert len(sink.messages) == 200
+    assert sink.messages[0]["Subject"] == "IoT Alert: HIGH_TEMP"
+    assert sink.connections <= 3
+    assert dispatcher.sent == 200
+    assert emailed_count(db) == 200
+
+
+def test_retries_transient_failures(db, sink):
+    sink.fail_next(2)
+    dispatcher = EmailDispatcher(workers=1, backoff_seconds=0.01, max_retries=3)
+    dispatcher.start()
+    try:
+        dispatcher.submit(make_alerts(db, 1))
+        assert dispatcher.join(timeout=10)
+    finally:
+        dispatcher.stop()
+
+    assert sink.rejected == 2
+    assert len(sink.messages) == 1
+    assert emailed_count(db) == 1
+
+
+def test_gives_up_after_max_retries(db, sink):
+    sink.fail_next(10)
+    dispatcher = EmailDispatcher(workers=1, backoff_seconds=0.01, max_retries=2)
+    dispatcher.start()
+    try:
+        dispatcher.submit(make_alerts(db, 1))
+        assert dispatcher.join(timeout=10)
+    finally:
+        dispatcher.stop()
+
+    assert sink.rejected == 3
+    assert dispatcher.failed == 1
+    assert emailed_count(db) == 0
+
+
+def test_permanent_failure_is_not_retried(db, sink):
+    sink.fail_next(1, code=550)
+    dispatcher = EmailDispatcher(workers=1, backoff_seconds=0.01)
+    dispatcher.start()
+    try:
+        dispatcher.submit(make_alerts(db, 1))
+        assert dispatcher.join(timeout=10)
+    finally:
+        dispatcher.stop()
+
+    assert sink.rejected == 1
+    assert dispatcher.failed == 1
+
+
+def test_full_queue_drops_instead_of_blocking(db):
+    dispatcher = EmailDispatcher(workers=1, queue_size=2)
+    assert dispatcher.submit(make_alerts(db, 5)) == 2
+    assert dispatcher.dropped == 3
@@ -0,0 +1,82 @@
+from sqlalchemy import event
+
+from app.email_dispatcher import dispatcher as email_dispatcher
+from app.config import settings
+from app.database import engine
+
+ALL_RULES = {
+    "device_id": "sensor-1",
+    "location": "living_room",
+    "temperature": 35.0,
+    "humidity": 90.0,
+    "motion": True,
+}
+
+
+class CommitCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(engine, "commit", self)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine, "commit", self)
+
+
+def test_reading_with_three_alerts_commits_once(client, night_always):
+    with CommitCounter() as commits:
+        resp = client.post("/api/readings", json=ALL_RULES)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert sorted(a["alert_type"] for a in body["alerts"]) == [
+        "HIGH_TEMP", "HUMIDITY", "MOTION_NIGHT",
+    ]
+    assert body["reading"]["id"] > 0
+    assert body["reading"]["created_at"]
+    assert all(a["id"] > 0 for a in body["alerts"])
+    assert commits.count == 1
+
+
+def test_ok_reading_commits_once(client):
+    ok = dict(ALL_RULES, temperature=22.0, humidity=50.0, motion=False)
+    with CommitCounter() as commits:
+        resp = client.post("/api/readings", json=ok)
+
+    assert resp.status_code == 200
+    assert resp.json()["alerts"] == []
+    assert commits.count == 1
+
+
+def test_batch_commits_once(client, night_always):
+    batch = [ALL_RULES, dict(ALL_RULES, device_id="sensor-2", motion=False)] * 5
+    with CommitCounter() as commits:
+        resp = client.post("/api/readings/batch", json=batch)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [item["reading"]["device_id"] for item in body] == [
+        r["device_id"] for r in batch
+    ]
+    # Only the first reading per device opens alerts; the rest are repeats
+    assert [len(item["alerts"]) for item in body] == [3, 2] + [0, 0] * 4
+    assert commits.count == 1
+
+
+def test_emails_queued_after_commit(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(settings, "enable_email", True)
+    monkeypatch.setattr(email_dispatcher, "submit", queued.extend)
+
+    with CommitCounter() as commits:
+        resp = client.post("/api/readings", json=dict(ALL_RULES, motion=False))
+
+    assert resp.status_code == 200
+    assert [a["emailed"] for a in resp.json()["alerts"]] == [False, False]
+    assert [a.alert_type for a in queued] == ["HIGH_TEMP", "HUMIDITY"]
+    assert commits.count == 1
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app import models
+
+
+def seed_readings(client, count, device_id="sensor-1", location="lab"):
+    batch = [
+        {
+            "device_id": device_id,
+            "location": location,
+            "temperature": 22.0,
+            "humidity": 50.0,
+            "motion": False,
+        }
+        for _ in range(count)
+    ]
+    return [item["reading"]["id"] for item in client.post("/api/readings/batch", json=batch).json()]
+
+
+def test_before_id_pages_through_history(client):
+    ids = seed_readings(client, 25)
+
+    seen = []
+    params = {"limit": 10}
+    while True:
+        resp = client.get("/api/readings", params=params)
+        seen.extend(r["id"] for r in resp.json())
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        key, value = cursor.split("=")
+        assert key == "before_id"
+        params = {"limit": 10, key: value}
+
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_after_id_returns_only_newer_rows(client):
+    ids = seed_readings(client, 5)
+    resp = client.get("/api/readings", params={"after_id": ids[1], "limit": 2})
+    assert [r["id"] for r in resp.json()] == [ids[3], ids[2]]
+    assert resp.headers["X-Next-Cursor"] == f"after_id={ids[3]}"
+
+    resp = client.get("/api/readings", params={"after_id": ids[-1]})
+    assert resp.json() == []
+    assert "X-Next-Cursor" not in resp.headers
+
+
+def test_filters_by_location_and_time(client, db):
+    old = seed_readings(client, 3, location="attic")
+    new = seed_readings(client, 2, location="attic")
+    seed_readings(client, 2, location="cellar")
+    db.execute(
+        update(models.Reading)
+        .where(models.Reading.id.in_(old))
+        .values(created_at=datetime.utcnow() - timedelta(days=2))
+    )
+    db.commit()
+
+    since = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    resp = client.get("/api/readings", params={"location": "attic", "since": since})
+    assert [r["id"] for r in resp.json()] == new[::-1]
+
+    resp = client.get("/api/readings", params={"location": "attic", "until": since})
+    assert [r["id"] for r in resp.json()] == old[::-1]
+
+
+def test_alerts_filter_by_type(client):
+    client.post("/api/readings/batch", json=[
+        {"device_id": "s", "location": "lab", "temperature": 35.0, "humidity": 50.0, "motion": False},
+        {"device_id": "s", "location": "lab", "temperature": 20.0, "humidity": 95.0, "motion": False},
+    ])
+    resp = client.get("/api/alerts", params={"alert_type": "HUMIDITY"})
+    assert [a["alert_type"] for a in resp.json()] == ["HUMIDITY"]
+
+
+def test_updated_since_returns_alerts_changed_in_place(client, db):
+    hot = {"location": "lab", "temperature": 40.0, "humidity": 50.0, "motion": False}
+    client.post("/api/readings/batch", json=[
+        dict(hot, device_id="sensor-1"), dict(hot, device_id="sensor-2"),
+    ])
+    old = datetime.utcnow() - timedelta(hours=1)
+    db.execute(update(models.Alert).values(updated_at=old))
+    db.commit()
+
+    # A repeat on sensor-1 updates its open alert
+    client.post("/api/readings", json=dict(hot, device_id="sensor-1"))
+
+    watermark = (old + timedelta(minutes=1)).isoformat()
+    alerts = client.get("/api/alerts", params={"updated_since": watermark}).json()
+    assert [(a["device_id"], a["repeat_count"]) for a in alerts] == [("sensor-1", 2)]
+    assert alerts[0]["updated_at"] > watermark
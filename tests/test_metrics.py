@@ -0,0 +1,46 @@
+from app import metrics
+
+def test_statement_shape():
+    assert metrics.statement_shape(
+        "INSERT INTO readings (device_id, location) VALUES (?, ?) RETURNING id"
+    ) == "INSERT readings"
+    assert metrics.statement_shape(
+        "SELECT alerts.id FROM alerts WHERE alerts.device_id = ? ORDER BY alerts.id DESC"
+    ) == "SELECT alerts"
+    assert metrics.statement_shape("UPDATE devices SET reading_count=?") == "UPDATE devices"
+    assert metrics.statement_shape("PRAGMA journal_mode = WAL") == "PRAGMA"
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = metrics.Histogram("h", "test", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, "/a")
+    hist.observe(0.5, "/a")
+    hist.observe(5.0, "/a")
+
+    lines = list(hist.render())
+    assert 'h_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'h_bucket{route="/a",le="1"} 2' in lines
+    assert 'h_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'h_count{route="/a"} 3' in lines
+
+
+def test_ingest_is_measured_per_route(client, reading):
+    before_commits = metrics.commits_per_request.count("POST", "/api/readings")
+    before_high = metrics.alerts_created_total.value("HIGH_TEMP")
+
+    client.post("/api/readings", json=dict(reading, temperature=40.0))
+    client.get("/api/readings", params={"device_id": "sensor-1"})
+
+    assert metrics.commits_per_request.count("POST", "/api/readings") == before_commits + 1
+    assert metrics.alerts_created_total.value("HIGH_TEMP") == before_high + 1
+
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain")
+    body = resp.text
+    # Route templates, not raw paths with query strings
+    assert 'iot_http_request_duration_seconds_count{method="GET",route="/api/readings"}' in body
+    assert 'iot_http_requests_total{method="POST",route="/api/readings",status="200"}' in body
+    assert 'iot_db_queries_total{statement="INSERT readings"}' in body
+    assert 'iot_db_commits_per_request_bucket{method="POST",route="/api/readings",le="1"}' in body
+    assert "iot_email_queue_depth 0" in body
@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.dialects import sqlite
+
+from app import migrations, models, queries
+from app.database import Base
+
+
+def query_plan(db, query):
+    compiled = query.statement.compile(dialect=sqlite.dialect())
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return " | ".join(row[-1] for row in rows)
+
+
+@pytest.fixture
+def seeded(db):
+    db.add_all(
+        models.Reading(
+            device_id=f"sensor-{i % 5}",
+            location=f"room-{i % 3}",
+            temperature=20.0,
+            humidity=50.0,
+            motion=False,
+        )
+        for i in range(2000)
+    )
+    db.add_all(
+        models.Alert(
+            device_id=f"sensor-{i % 5}",
+            location=f"room-{i % 3}",
+            alert_type="HIGH_TEMP",
+            message="hot",
+            emailed=i % 50 == 0,
+        )
+        for i in range(2000)
+    )
+    db.commit()
+    db.execute(text("ANALYZE"))
+    return db
+
+
+def test_readings_by_device_uses_composite_index(seeded):
+    plan = query_plan(seeded, queries.readings_query(seeded, "sensor-1").limit(50))
+    assert "ix_readings_device_id_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_alerts_by_device_uses_composite_index(seeded):
+    plan = query_plan(seeded, queries.alerts_query(seeded, "sensor-1").limit(50))
+    assert "ix_alerts_device_id_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_unfiltered_lists_walk_primary_key(seeded):
+    for query in (queries.readings_query(seeded), queries.alerts_query(seeded)):
+        plan = query_plan(seeded, query.limit(50))
+        assert "TEMP B-TREE" not in plan
+
+
+def test_email_log_uses_partial_index(seeded):
+    plan = query_plan(seeded, queries.emailed_alerts_query(seeded).limit(50))
+    assert "ix_alerts_emailed_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_migrations_upgrade_existing_database(tmp_path):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old.begin() as conn:
+        # Schema as created by the original models
+        conn.execute(text(
+            "CREATE TABLE readings (id INTEGER PRIMARY KEY, device_id VARCHAR, "
+            "location VARCHAR, temperature FLOAT NOT NULL, humidity FLOAT NOT NULL, "
+            "motion BOOLEAN NOT NULL, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE alerts (id INTEGER PRIMARY KEY, device_id VARCHAR, "
+            "location VARCHAR, alert_type VARCHAR, message VARCHAR, "
+            "emailed BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        ))
+        conn.execute(text("CREATE INDEX ix_readings_device_id ON readings (device_id)"))
+        conn.execute(text("CREATE INDEX ix_alerts_device_id ON alerts (device_id)"))
+    # Startup creates tables that are missing before migrating
+    Base.metadata.create_all(bind=old)
+
+    assert migrations.run_migrations(old) == migrations.LATEST_VERSION
+    # Running again is a no-op
+    assert migrations.run_migrations(old) == migrations.LATEST_VERSION
+
+    indexes = {
+        table: {ix["name"] for ix in inspect(old).get_indexes(table)}
+        for table in ("readings", "alerts")
+    }
+    assert "ix_readings_device_id_id" in indexes["readings"]
+    assert "ix_readings_device_id" not in indexes["readings"]
+    assert {"ix_alerts_device_id_id", "ix_alerts_emailed_id"} <= indexes["alerts"]
+    old.dispose()
+
+
+def test_location_and_alert_type_filters_use_indexes(seeded):
+    plan = query_plan(seeded, queries.readings_query(seeded, location="room-1").limit(50))
+    assert "ix_readings_location_id" in plan
+    plan = query_plan(seeded, queries.alerts_query(seeded, location="room-1").limit(50))
+    assert "ix_alerts_location_id" in plan
+    plan = query_plan(seeded, queries.alerts_query(seeded, alert_type="HIGH_TEMP").limit(50))
+    assert "ix_alerts_alert_type_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_cursor_pages_are_range_scans(seeded):
+    for query in (
+        queries.readings_query(seeded, "sensor-1", before_id=1000),
+        queries.readings_query(seeded, "sensor-1", after_id=1000),
+        queries.alerts_query(seeded, "sensor-1", before_id=1000),
+    ):
+        plan = query_plan(seeded, query.limit(50))
+        assert "device_id=? AND id" in plan
+        assert "TEMP B-TREE" not in plan
+
+
+def test_updated_since_uses_index(seeded):
+    plan = query_plan(
+        seeded, queries.alerts_query(seeded, updated_since=datetime(2100, 1, 1)).limit(50)
+    )
+    assert "ix_alerts_updated_at" in plan
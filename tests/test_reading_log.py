@@ -0,0 +1,58 @@
+import logging
+
+import pytest
+
+from app.config import settings
+from app.reading_log import reading_log
+
+
+@pytest.fixture
+def log_mode(monkeypatch, caplog):
+    caplog.set_level(logging.INFO, logger="iot_alerts")
+    reading_log.clear()
+
+    def set_mode(mode, **overrides):
+        monkeypatch.setattr(settings, "reading_log_mode", mode)
+        for name, value in overrides.items():
+            monkeypatch.setattr(settings, name, value)
+
+    yield set_mode
+    reading_log.clear()
+
+
+def ok_lines(caplog):
+    return [r.getMessage() for r in caplog.records if r.getMessage().startswith("Reading")]
+
+
+def test_sample_logs_every_nth_reading_per_device(client, caplog, log_mode, reading):
+    log_mode("sample", reading_log_sample_every=3)
+    client.post("/api/readings/batch", json=[reading] * 7 + [dict(reading, device_id="sensor-2")])
+
+    lines = ok_lines(caplog)
+    assert len(lines) == 4  # readings 1, 4 and 7 of sensor-1, 1 of sensor-2
+    assert all("(1 in 3 logged)" in line for line in lines)
+
+
+def test_summary_aggregates_per_device(client, caplog, log_mode, reading):
+    log_mode("summary", reading_log_summary_seconds=3600)
+    client.post("/api/readings/batch", json=[
+        reading,
+        dict(reading, temperature=25.0, humidity=45.0),
+        dict(reading, temperature=23.0),
+    ])
+    assert ok_lines(caplog) == []
+
+    reading_log.flush()
+    [line] = ok_lines(caplog)
+    assert line.startswith("Readings OK from sensor-1 at lab: 3 in")
+    assert "T=22.0..25.0°C, H=45.0..50.0%, MOTION=0" in line
+
+
+def test_alerts_are_never_sampled(client, caplog, log_mode, reading):
+    log_mode("off")
+    client.post("/api/readings", json=reading)
+    client.post("/api/readings", json=dict(reading, device_id="sensor-2", temperature=40.0))
+
+    assert ok_lines(caplog) == []
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert [r.getMessage().split("]")[0] for r in warnings] == ["ALERT [HIGH_TEMP"]
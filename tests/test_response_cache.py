@@ -0,0 +1,55 @@
+from sqlalchemy import update
+
+from app import models, response_cache
+
+
+def test_etag_and_not_modified(client, reading):
+    client.post("/api/readings/batch", json=[reading] * 3)
+
+    first = client.get("/api/readings", params={"limit": 2})
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and first.headers["x-next-cursor"].startswith("before_id=")
+
+    hits = response_cache.lookups.value("hit")
+    again = client.get("/api/readings", params={"limit": 2}, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+    assert again.headers["x-next-cursor"] == first.headers["x-next-cursor"]
+
+    # Served from the cache, with the same body
+    assert client.get("/api/readings", params={"limit": 2}).json() == first.json()
+    assert response_cache.lookups.value("hit") == hits + 1
+
+
+def test_commits_invalidate(client, db, reading):
+    client.post("/api/readings", json=dict(reading, temperature=40.0))
+    etag = client.get("/api/alerts").headers["etag"]
+    email_log = client.get("/api/email-log")
+    assert email_log.json() == []
+
+    client.post("/api/readings", json=reading)
+    resp = client.get("/api/alerts", headers={"If-None-Match": etag})
+    # Episode updates change the body, so a new ETag
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+
+    db.execute(update(models.Alert).values(emailed=True))
+    db.commit()
+    resp = client.get("/api/email-log", headers={"If-None-Match": email_log.headers["etag"]})
+    assert resp.status_code == 200
+    assert len(resp.json()) == 1
+
+
+def test_stale_generation_is_not_stored_and_lru_is_bounded():
+    cache = response_cache.ResponseCache(max_bytes=10, ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put(("/a", ()), generation, response_cache.Entry(b"old", {}))
+    assert cache.get(("/a", ())) is None
+
+    for name in ("/a", "/b", "/c"):
+        cache.put((name, ()), cache.generation, response_cache.Entry(b"1234", {}))
+    assert cache.get(("/a", ())) is None
+    assert cache.get(("/b", ())) is not None
+    assert cache.size == 8
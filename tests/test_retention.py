@@ -0,0 +1,166 @@
+import gzip
+import threading
+from datetime import datetime, timedelta
+
+from app import ingest, models, retention, rollups, schemas
+from app.database import SessionLocal
+
+
+NOW = datetime(2025, 3, 1, 12, 0, 0)
+
+
+def add_readings(db, days_ago, count, device_id="sensor-1"):
+    start = NOW - timedelta(days=days_ago)
+    db.add_all(
+        models.Reading(
+            device_id=device_id,
+            location="lab",
+            temperature=20.0 + i,
+            humidity=50.0,
+            motion=i % 2 == 0,
+            created_at=start + timedelta(minutes=i),
+        )
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_archives_then_purges_in_chunks(db, tmp_path):
+    add_readings(db, 10, 30)
+    add_readings(db, 9, 30)
+    add_readings(db, 1, 5)
+
+    removed = retention.archive_and_purge(
+        db, "readings", NOW - timedelta(days=7), str(tmp_path), chunk_rows=7
+    )
+
+    assert removed == 60
+    assert db.query(models.Reading).count() == 5
+    day = (NOW - timedelta(days=10)).date()
+    path = retention.partition_path(str(tmp_path), "readings", day)
+    with gzip.open(path, "rt") as fh:
+        lines = fh.read().splitlines()
+    # One header, then 30 rows appended over several chunks
+    assert lines[0].startswith("id,device_id")
+    assert len(lines) == 31
+
+
+def test_query_range_merges_archive_and_live_rows(db, tmp_path):
+    add_readings(db, 8, 3)
+    add_readings(db, 6, 3)
+    retention.archive_and_purge(db, "readings", NOW - timedelta(days=7), str(tmp_path))
+
+    rows = list(retention.query_range(
+        db, "readings", NOW - timedelta(days=9), NOW, archive_dir=str(tmp_path)
+    ))
+
+    assert [r["id"] for r in rows] == sorted(r["id"] for r in rows)
+    assert len(rows) == 6
+    assert rows[0]["created_at"] == NOW - timedelta(days=8)
+    assert rows[0]["motion"] is True
+    assert rows[0]["temperature"] == 20.0
+
+
+def test_reader_drops_rows_exported_twice(db, tmp_path):
+    add_readings(db, 8, 3)
+    rows = db.query(models.Reading).all()
+    # Simulate a run interrupted between export and delete
+    retention._write_partitions(str(tmp_path), "readings", retention.READING_COLUMNS, rows)
+    retention.archive_and_purge(db, "readings", NOW, str(tmp_path))
+
+    archived = list(retention.read_archive(
+        "readings", NOW - timedelta(days=9), NOW, archive_dir=str(tmp_path)
+    ))
+    assert len(archived) == 3
+
+
+def test_run_retention_applies_tiers(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention.settings, "retention_archive_dir", str(tmp_path))
+    add_readings(db, 100, 10)
+    add_readings(db, 30, 10)
+    rollups.rebuild(db)
+
+    removed = retention.run_retention(db, now=NOW)
+
+    assert removed["readings"] == 20
+    assert removed["rollups_minute"] == 10
+    assert "rollups_hour" not in removed
+    remaining = db.query(models.ReadingRollup.granularity).all()
+    assert sorted(g for (g,) in remaining) == [60] * 10 + [3600] * 2
+
+
+def test_rebuild_after_retention_keeps_purged_rollups(db, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention.settings, "retention_archive_dir", str(tmp_path))
+    # 90 minutes that straddle the raw-data cutoff, plus recent readings
+    add_readings(db, 7.02, 90)
+    add_readings(db, 1, 5)
+    rollups.rebuild(db)
+    r = models.ReadingRollup
+    before = dict(db.query(r.bucket, r.count).filter(r.granularity == rollups.HOUR).all())
+
+    retention.run_retention(db, now=NOW)
+    assert db.query(models.Reading).count() < 95
+    rollups.rebuild(db)
+
+    after = dict(db.query(r.bucket, r.count).filter(r.granularity == rollups.HOUR).all())
+    assert after == before
+    assert sum(after.values()) == 95
+
+
+def test_alerts_age_from_when_their_episode_closed(db, tmp_path):
+    old = NOW - timedelta(days=100)
+
+    def alert(closed_at):
+        return models.Alert(
+            device_id="sensor-1", location="lab", alert_type="HIGH_TEMP",
+            message="hot", emailed=False, created_at=old, closed_at=closed_at,
+        )
+
+    db.add_all([alert(None), alert(NOW - timedelta(days=1)), alert(old)])
+    db.commit()
+
+    removed = retention.archive_and_purge(
+        db, "alerts", NOW - timedelta(days=90), str(tmp_path)
+    )
+
+    assert removed == 1
+    assert sorted(
+        a.closed_at is None for a in db.query(models.Alert).all()
+    ) == [False, True]
+
+
+def test_purge_runs_alongside_ingest(db, tmp_path):
+    add_readings(db, 10, 200)
+    stop = threading.Event()
+    errors = []
+
+    def ingest_loop():
+        session = SessionLocal()
+        payload = schemas.ReadingCreate(
+            device_id="sensor-2", location="lab", temperature=21.0, humidity=45.0, motion=False
+        )
+        try:
+            while not stop.is_set():
+                ingest.ingest_readings(session, [payload] * 5)
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            session.close()
+
+    thread = threading.Thread(target=ingest_loop)
+    thread.start()
+    try:
+        removed = retention.archive_and_purge(
+            db, "readings", NOW - timedelta(days=7), str(tmp_path), chunk_rows=10
+        )
+    finally:
+        stop.set()
+        thread.join()
+
+    assert errors == []
+    assert removed == 200
+    assert db.query(models.Reading).filter_by(device_id="sensor-1").count() == 0
+    path = retention.partition_path(str(tmp_path), "readings", (NOW - timedelta(days=10)).date())
+    with gzip.open(path, "rt") as fh:
+        # Header plus every purged row, each exported once
+        assert len(fh.read().splitlines()) == 201
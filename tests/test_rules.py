@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+
+from app import rules
+from app.config import settings
+
+DAY = datetime(2025, 1, 1, 12, 0)
+NIGHT = datetime(2025, 1, 1, 23, 0)
+
+
+def reading(**overrides):
+    values = dict(device_id="sensor-1", location="lab", temperature=22.0,
+                  humidity=50.0, motion=False)
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def alert_types(plan, r, now=DAY):
+    return [alert_type for alert_type, _ in plan.evaluate(r, now)]
+
+
+def test_default_rules_match_settings_thresholds():
+    plan = rules.RulePlan(rules.default_rules())
+
+    assert alert_types(plan, reading()) == []
+    assert alert_types(plan, reading(temperature=35.0, humidity=90.0, motion=True), NIGHT) == [
+        "HIGH_TEMP", "HUMIDITY", "MOTION_NIGHT",
+    ]
+    assert alert_types(plan, reading(motion=True), DAY) == []
+    assert plan.evaluate(reading(temperature=30.0), DAY) == [
+        ("HIGH_TEMP", "High temperature 30.0°C at lab (sensor-1)"),
+    ]
+
+
+def test_scoped_rules_apply_only_to_their_scope():
+    plan = rules.RulePlan([
+        rules.Rule(alert_type="FREEZER", metric="temperature", operator=">",
+                   threshold=-15, location="freezer", message="warm"),
+        rules.Rule(alert_type="S2", metric="humidity", operator="between",
+                   threshold=(40, 60), device_id="sensor-2", message="s2"),
+    ])
+
+    assert alert_types(plan, reading(location="freezer", temperature=-10)) == ["FREEZER"]
+    assert alert_types(plan, reading(temperature=-10)) == []
+    assert alert_types(plan, reading(device_id="sensor-2")) == ["S2"]
+    assert len(plan.rules_for("sensor-2", "freezer")) == 2
+
+
+def test_invalid_rule_is_rejected():
+    with pytest.raises(ValidationError):
+        rules.Rule(alert_type="X", metric="humidity", operator="outside",
+                   threshold=5, message="x")
+    with pytest.raises(ValidationError):
+        rules.Rule(alert_type="X", metric="pressure", operator=">",
+                   threshold=5, message="x")
+
+
+def test_rules_file_extends_defaults(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"alert_type": "COLD", "metric": "temperature", "operator": "<",
+         "threshold": 10, "message": "Cold {value:.0f} at {location}"},
+    ]))
+    monkeypatch.setattr(settings, "rules_file", str(path))
+
+    plan = rules.RulePlan(rules.load_rules())
+
+    assert [r.alert_type for r in plan.rules] == [
+        "HIGH_TEMP", "HUMIDITY", "MOTION_NIGHT", "COLD",
+    ]
+    assert plan.evaluate(reading(temperature=5.0), DAY) == [("COLD", "Cold 5 at lab")]
+
+
+def test_ingest_uses_loaded_rules(client, tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([
+        {"alert_type": "DRY_LAB", "metric": "humidity", "operator": "<",
+         "threshold": 45, "location": "lab", "message": "dry"},
+    ]))
+    monkeypatch.setattr(settings, "rules_file", str(path))
+    monkeypatch.setattr(settings, "rules_include_defaults", False)
+    rules.reload_plan()
+    try:
+        resp = client.post("/api/readings", json={
+            "device_id": "s", "location": "lab", "temperature": 40.0,
+            "humidity": 40.0, "motion": False,
+        })
+    finally:
+        monkeypatch.undo()
+        rules.reload_plan()
+
+    assert [a["alert_type"] for a in resp.json()["alerts"]] == ["DRY_LAB"]
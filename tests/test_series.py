@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import models, rollups, timeseries
+from app.config import settings
+
+
+def add_readings(db, start, count, step_seconds, device_id="sensor-1"):
+    db.add_all(
+        models.Reading(
+            device_id=device_id,
+            location="lab",
+            temperature=20.0 + i % 10,
+            humidity=40.0 + i % 5,
+            motion=i % 2 == 0,
+            created_at=start + timedelta(seconds=i * step_seconds),
+        )
+        for i in range(count)
+    )
+    db.commit()
+    # Rows inserted behind the API's back: backfill the rollups
+    rollups.rebuild(db)
+
+
+@pytest.fixture(params=[True, False], ids=["rollups", "raw"])
+def rollups_enabled(request, monkeypatch):
+    monkeypatch.setattr(settings, "rollups_enabled", request.param)
+
+
+def test_aggregates_into_buckets(client, db, rollups_enabled):
+    start = datetime(2025, 1, 1, 12, 0, 0)
+    add_readings(db, start, 120, 30)  # one hour, two readings per minute
+    add_readings(db, start, 10, 30, device_id="sensor-2")
+
+    resp = client.get("/api/readings/series", params={
+        "device_id": "sensor-1",
+        "since": start.isoformat(),
+        "until": (start + timedelta(hours=1)).isoformat(),
+        "bucket_seconds": 600,
+    })
+    body = resp.json()
+
+    assert body["bucket_seconds"] == 600
+    assert len(body["buckets"]) == 6
+    first = body["buckets"][0]
+    assert first["start"] == "2025-01-01T12:00:00"
+    assert first["count"] == 20
+    assert first["temperature_min"] == 20.0
+    assert first["temperature_max"] == 29.0
+    assert first["temperature_avg"] == 24.5
+    assert first["temperature_std"] == pytest.approx(2.8723, abs=1e-4)
+    assert first["motion_count"] == 10
+    assert sum(b["count"] for b in body["buckets"]) == 120
+
+
+def test_points_picks_nice_bucket_width(client, db, rollups_enabled):
+    start = datetime(2025, 1, 1)
+    add_readings(db, start, 2880, 30)  # one day
+
+    resp = client.get("/api/readings/series", params={
+        "since": start.isoformat(),
+        "until": (start + timedelta(days=1)).isoformat(),
+        "points": 100,
+    })
+    body = resp.json()
+
+    assert body["bucket_seconds"] == 900
+    assert len(body["buckets"]) == 96
+
+
+def test_lttb_keeps_extremes(client, db):
+    start = datetime(2025, 1, 1)
+    add_readings(db, start, 1000, 10)
+
+    resp = client.get("/api/readings/series", params={
+        "since": start.isoformat(),
+        "until": (start + timedelta(days=1)).isoformat(),
+        "mode": "lttb",
+        "points": 100,
+    })
+    points = resp.json()["points"]
+
+    assert len(points) == 100
+    assert {p["temperature"] for p in points} >= {20.0, 29.0}
+    assert points[0]["created_at"] == "2025-01-01T00:00:00"
+
+
+def test_lttb_keeps_newest_rows_when_truncated(client, db, monkeypatch):
+    monkeypatch.setattr(settings, "series_max_raw_rows", 50)
+    start = datetime(2025, 1, 1)
+    add_readings(db, start, 200, 10)
+
+    body = client.get("/api/readings/series", params={
+        "since": start.isoformat(),
+        "until": (start + timedelta(days=1)).isoformat(),
+        "mode": "lttb",
+        "points": 1000,
+    }).json()
+
+    assert body["truncated"] is True
+    assert len(body["points"]) == 50
+    assert body["points"][0]["created_at"] == (start + timedelta(seconds=150 * 10)).isoformat()
+    assert body["points"][-1]["created_at"] == (start + timedelta(seconds=199 * 10)).isoformat()
+
+
+def test_lttb_returns_all_points_below_threshold():
+    assert timeseries.lttb([1, 2, 3], [1, 5, 1], 10) == [0, 1, 2]
+
+
+def rollup_rows(db):
+    return [
+        tuple(getattr(row, col) for col in ("granularity", "device_id", "bucket", "count",
+                                             "temperature_sum", "temperature_min",
+                                             "temperature_max", "motion_count"))
+        for row in db.query(models.ReadingRollup).order_by(
+            models.ReadingRollup.granularity,
+            models.ReadingRollup.device_id,
+            models.ReadingRollup.bucket,
+        )
+    ]
+
+
+def test_ingest_maintains_rollups_incrementally(client, db):
+    reading = {"location": "lab", "humidity": 50.0, "motion": True}
+    client.post("/api/readings", json=dict(reading, device_id="a", temperature=21.0))
+    client.post("/api/readings/batch", json=[
+        dict(reading, device_id="a", temperature=25.0),
+        dict(reading, device_id="b", temperature=23.0),
+    ])
+
+    incremental = rollup_rows(db)
+    totals = {}
+    for granularity, device_id, _, count, temp_sum, *_ in incremental:
+        key = (granularity, device_id)
+        totals[key] = (totals.get(key, (0, 0.0))[0] + count,
+                       totals.get(key, (0, 0.0))[1] + temp_sum)
+    assert totals == {
+        (60, "a"): (2, 46.0), (60, "b"): (1, 23.0),
+        (3600, "a"): (2, 46.0), (3600, "b"): (1, 23.0),
+    }
+
+    rollups.rebuild(db)
+    db.expire_all()
+    assert rollup_rows(db) == incremental
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from app import events, ingest, schemas
+
+
+def _ingest(db, reading, **changes):
+    return ingest.ingest_readings(db, [schemas.ReadingCreate(**dict(reading, **changes))])
+
+
+def _parse(frame):
+    fields = {}
+    for line in frame.strip().splitlines():
+        key, _, value = line.partition(": ")
+        fields[key] = value
+    return fields
+
+
+async def _frames(gen, count, timeout=2.0):
+    out = []
+    for _ in range(count):
+        out.append(_parse(await asyncio.wait_for(gen.__anext__(), timeout)))
+    return out
+
+
+def test_cursor_round_trip():
+    assert events.parse_cursor("12.3") == (12, 3)
+    assert events.parse_cursor("12") == (12, 0)
+    assert events.format_cursor((12, 3)) == "12.3"
+    with pytest.raises(ValueError):
+        events.parse_cursor("abc")
+
+
+def test_live_events_reach_matching_subscribers(db, reading):
+    broker = events.EventBroker()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        mine = broker.subscribe(events.Subscriber(loop, {"sensor-1"}))
+        other = broker.subscribe(events.Subscriber(loop, {"sensor-9"}))
+        gen = events.sse_stream(mine, broker, (0, 0), [], keepalive_seconds=5)
+        await _frames(gen, 2)  # retry + ready
+
+        results = await asyncio.to_thread(_ingest, db, reading, temperature=40.0)
+        # Published from a worker thread, as ingest does
+        await asyncio.to_thread(broker.publish, results)
+        frames = await _frames(gen, 2)
+        await gen.aclose()
+        return results, frames, other.drain()
+
+    [(reading, [alert])], frames, other_events = asyncio.run(run())
+    assert [f["event"] for f in frames] == ["reading", "alert"]
+    assert [f["id"] for f in frames] == [f"{reading.id}.0", f"{reading.id}.{alert.id}"]
+    assert other_events == []
+    assert broker.client_count == 1
+
+
+def test_resume_replays_missed_rows_without_duplicates(db, reading):
+    first = _ingest(db, reading)
+    missed = _ingest(db, reading, temperature=40.0)
+    cursor = (first[0][0].id, 0)
+
+    async def run():
+        broker = events.EventBroker()
+        sub = broker.subscribe(events.Subscriber(asyncio.get_running_loop()))
+        backlog = events.replay(db, cursor)
+        # The same batch also arrives live (committed during subscribe)
+        broker.publish(missed)
+        gen = events.sse_stream(sub, broker, cursor, backlog, keepalive_seconds=0.05)
+        frames = await _frames(gen, 5)
+        await gen.aclose()
+        return frames
+
+    frames = asyncio.run(run())
+    reading, alert = missed[0][0], missed[0][1][0]
+    assert [f.get("event") for f in frames[1:4]] == ["reading", "alert", "ready"]
+    assert frames[3]["id"] == f"{reading.id}.{alert.id}"
+    # The live duplicates were skipped: next is a keepalive comment
+    assert "event" not in frames[4]
+
+
+def test_alert_changes_are_published_as_updates(db, reading):
+    async def run():
+        sub = events.broker.subscribe(
+            events.Subscriber(asyncio.get_running_loop(), alerts_only=True)
+        )
+        gen = events.sse_stream(sub, events.broker, (0, 0), [], keepalive_seconds=5)
+        await _frames(gen, 2)
+        opened = await asyncio.to_thread(_ingest, db, reading, temperature=40.0)
+        await asyncio.to_thread(_ingest, db, reading, temperature=41.0)
+        await asyncio.to_thread(_ingest, db, reading, temperature=20.0)
+        frames = await _frames(gen, 3)
+        await gen.aclose()
+        return opened, frames
+
+    [(_, [alert])], frames = asyncio.run(run())
+    assert [f["event"] for f in frames] == ["alert", "alert_update", "alert_update"]
+    # Updates carry the whole row but do not move the cursor
+    assert {f["id"] for f in frames} == {f"0.{alert.id}"}
+    repeat, cleared = (json.loads(f["data"]) for f in frames[1:])
+    assert repeat["id"] == cleared["id"] == alert.id
+    assert repeat["repeat_count"] == 2 and repeat["closed_at"] is None
+    assert cleared["closed_at"] is not None
+
+
+def test_replay_over_limit_returns_none(db, reading):
+    for _ in range(3):
+        _ingest(db, reading)
+    assert events.replay(db, (0, 0), limit=2) is None
+    assert len(events.replay(db, (0, 0), limit=3)) == 3
+
+
+def test_slow_consumer_is_dropped():
+    broker = events.EventBroker()
+
+    async def run():
+        sub = broker.subscribe(
+            events.Subscriber(asyncio.get_running_loop(), buffer_size=2)
+        )
+        gen = events.sse_stream(sub, broker, (0, 0), [], keepalive_seconds=5)
+        await _frames(gen, 2)
+        batch = [events.Event(events.READING, i, "d", "{}") for i in range(1, 4)]
+        threading.Thread(target=sub.offer, args=(batch,)).start()
+        frames = await _frames(gen, 1)
+        with pytest.raises(StopAsyncIteration):
+            await gen.__anext__()
+        return frames
+
+    frames = asyncio.run(run())
+    assert frames[0]["event"] == "overflow"
+    assert broker.client_count == 0
+    assert broker.dropped_clients == 1
+
+
+def test_invalid_cursor_is_rejected(client):
+    resp = client.get("/api/stream", params={"after": "not-a-cursor"})
+    assert resp.status_code == 422
@@ -0,0 +1,130 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from app import ingest, models, write_buffer
+from app.config import settings
+from app.main import app
+from app.write_buffer import buffer
+
+
+@pytest.fixture
+def buffered(monkeypatch):
+    def set_durability(durability, **overrides):
+        monkeypatch.setattr(settings, "ingest_mode", "buffered")
+        monkeypatch.setattr(settings, "ingest_durability", durability)
+        for name, value in overrides.items():
+            monkeypatch.setattr(buffer, name, value)
+        buffer.start()
+
+    yield set_durability
+    buffer.stop()
+
+
+def reading_count(db):
+    return db.scalar(select(func.count()).select_from(models.Reading))
+
+
+def test_enqueue_returns_202_and_drains_on_shutdown(db, buffered, reading):
+    # Long enough that nothing is written before the app shuts down
+    buffered("enqueue", flush_interval=60.0, flush_max_rows=1000)
+
+    with TestClient(app) as client:
+        first = client.post("/api/readings", json=reading)
+        second = client.post(
+            "/api/readings/batch", json=[reading, dict(reading, temperature=40.0)]
+        )
+        assert first.status_code == second.status_code == 202
+        assert second.json() == {"sequence": first.json()["sequence"] + 1, "count": 2}
+
+        status = client.get("/api/ingest/status").json()
+        assert status["depth"] == 3
+        assert status["committed_sequence"] < first.json()["sequence"]
+        assert reading_count(db) == 0
+
+    assert reading_count(db) == 3
+    assert buffer.committed_sequence == second.json()["sequence"]
+    assert db.scalar(select(models.Alert.alert_type)) == "HIGH_TEMP"
+
+
+def test_commit_durability_returns_results(client, buffered, reading):
+    buffered("commit", flush_interval=0.01)
+
+    resp = client.post("/api/readings/batch", json=[reading, dict(reading, temperature=40.0)])
+    assert resp.status_code == 200
+    body = resp.json()
+    assert [len(item["alerts"]) for item in body] == [0, 1]
+    assert body[1]["alerts"][0]["alert_type"] == "HIGH_TEMP"
+
+    resp = client.post("/api/readings", json=reading)
+    assert resp.status_code == 200
+    assert resp.json()["reading"]["id"] == body[1]["reading"]["id"] + 1
+
+
+def test_full_buffer_is_rejected(client, buffered, reading):
+    buffered("enqueue", flush_interval=60.0, flush_max_rows=1000, capacity=2)
+
+    assert client.post("/api/readings/batch", json=[reading, reading]).status_code == 202
+    resp = client.post("/api/readings", json=reading)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    assert client.get("/api/ingest/status").json()["rejected"] >= 1
+
+
+def test_failed_requests_do_not_advance_the_watermark(client, db, buffered, monkeypatch, reading):
+    buffered("enqueue", flush_interval=60.0, flush_max_rows=1000)
+    real_ingest = ingest.ingest_readings
+
+    def ingest_readings(db, payloads):
+        if any(p.device_id == "broken" for p in payloads):
+            raise RuntimeError("constraint failed")
+        return real_ingest(db, payloads)
+
+    monkeypatch.setattr(ingest, "ingest_readings", ingest_readings)
+    sequences = [
+        client.post("/api/readings/batch", json=batch).json()["sequence"]
+        for batch in ([reading], [dict(reading, device_id="broken")] * 2, [reading])
+    ]
+    buffer.stop()
+
+    assert reading_count(db) == 2
+    assert buffer.committed_sequence == sequences[2]
+    status = client.get("/api/ingest/status").json()
+    assert status["failed"] >= 1
+    assert status["failed_readings"] >= 2
+    assert status["recent_failures"][-1] == sequences[1]
+
+    # A group that only holds the failed request does not move it either
+    before = buffer.committed_sequence
+    buffer.start()
+    client.post("/api/readings", json=dict(reading, device_id="broken"))
+    buffer.stop()
+    assert buffer.committed_sequence == before
+
+
+def test_no_submits_after_stop(client, db, buffered, reading):
+    buffered("enqueue", flush_interval=60.0, flush_max_rows=1000)
+    assert client.post("/api/readings", json=reading).status_code == 202
+    buffer.stop()
+
+    resp = client.post("/api/readings", json=reading)
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    assert not buffer.running
+    assert reading_count(db) == 1
+
+
+def test_session_failure_fails_the_request(client, buffered, monkeypatch, reading):
+    buffered("commit", flush_interval=0.01)
+
+    def no_session():
+        raise RuntimeError("unable to open database file")
+
+    with monkeypatch.context() as m:
+        m.setattr(write_buffer, "SessionLocal", no_session)
+        with pytest.raises(RuntimeError, match="unable to open"):
+            client.post("/api/readings", json=reading)
+
+    # The writer survived and keeps storing requests
+    assert buffer.running
+    assert client.post("/api/readings", json=reading).status_code == 200